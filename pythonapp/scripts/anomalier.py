@@ -0,0 +1,197 @@
+"""Robust avvikelsedetektering för många tidsserier på en gång.
+
+Serierna ges som en lång tabell, en rad per serie och period:
+
+  mal      Typ av serie, t.ex. "larm_manad" eller "ventil_manad"
+  serie    Seriens namn inom typen (t.ex. ventil-ID)
+  period   Heltal i tidsordning, t.ex. år * 12 + månad
+  label    Text för perioden i resultatet (t.ex. "Jan")
+  varde    Mätvärdet
+
+En valfri kolumn rapport (bool) anger vilka punkter som ska rapporteras;
+övriga (t.ex. föregående års månader) används bara som baslinje.
+
+Varje metod i METHODS ger en baslinje och en skala per punkt, och punkten
+är en avvikelse när |värde − baslinje| / skala överstiger metodens
+tröskel. Metoderna körs vektoriserat på en matris serie × period per
+mal, så alla ventiler räknas i samma svep:
+
+  zscore    Seriens medelvärde och standardavvikelse (som detect_anomalies)
+  mad       Seriens median och MAD; en enstaka stor spik påverkar inte
+            skalan och döljer därför inte andra spikar
+  rullande  Median för de ROLLING_WINDOW föregående perioderna; skalan är
+            MAD för seriens avvikelser från den rullande medianen
+  sasong    Samma månad föregående år, justerat med seriens mediana
+            årsförändring; skalan är MAD för årsförändringarna
+
+Där MAD är 0 (t.ex. en ventil som nästan alltid har 100 %) används
+medelabsolutavvikelsen i stället. Även den kan bli mycket liten, så
+min_scale sätter ett golv för skalan per mal i seriens enhet, t.ex. 1
+procentenhet för tillgänglighet: en dipp från 100 % till 99,5 % ska inte
+räknas som en stor avvikelse. Fler metoder läggs till i METHODS.
+
+Resultatet har samma kolumner som trend_anomalier.csv alltid haft (index,
+label, varde, z_score, typ, mal) följt av serie, metod, baslinje och
+robust_score. robust_score är (värde − baslinje) / skala, dvs. antal
+robusta standardavvikelser från baslinjen; för metoden zscore är det en
+vanlig z-score. z_score har samma värde, så att den som läser filen som
+förut får avvikelsens storlek där. En punkt som flaggas av flera metoder
+blir en rad; metod listar metoderna och robust_score kommer från metoden
+med störst utslag.
+"""
+
+import warnings
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+SERIES_COLUMNS = ["mal", "serie", "period", "label", "varde"]
+ANOMALY_COLUMNS = ["index", "label", "varde", "z_score", "typ", "mal",
+                   "serie", "metod", "baslinje", "robust_score"]
+
+MAD_SCALE = 1.4826      # MAD -> standardavvikelse vid normalfördelning
+MEANAD_SCALE = 1.2533   # medelabsolutavvikelse -> standardavvikelse
+ROLLING_WINDOW = 6
+MIN_POINTS = 3
+SEASON = 12
+
+
+def _robust_scale(deviations: np.ndarray, axis: int = -1) -> np.ndarray:
+    """1.4826 × MAD, eller 1.2533 × medelabsolutavvikelsen där MAD är 0."""
+    absdev = np.abs(deviations)
+    mad = np.nanmedian(absdev, axis=axis, keepdims=True) * MAD_SCALE
+    meanad = np.nanmean(absdev, axis=axis, keepdims=True) * MEANAD_SCALE
+    return np.where(mad > 0, mad, meanad)
+
+
+def _enough(values: np.ndarray, axis: int = -1) -> np.ndarray:
+    return (~np.isnan(values)).sum(axis=axis, keepdims=True) >= MIN_POINTS
+
+
+def zscore_baseline(y: np.ndarray):
+    """Medelvärde och populations-std per serie."""
+    return np.nanmean(y, axis=1, keepdims=True), np.nanstd(y, axis=1, keepdims=True)
+
+
+def mad_baseline(y: np.ndarray):
+    """Median och robust skala per serie."""
+    median = np.nanmedian(y, axis=1, keepdims=True)
+    scale = _robust_scale(y - median, axis=1)
+    return np.where(_enough(y, axis=1), median, np.nan), scale
+
+
+def rolling_baseline(y: np.ndarray, window: int = ROLLING_WINDOW):
+    """Median för de `window` perioderna före varje punkt, robust skala per serie.
+
+    Skalan tas från hela seriens avvikelser och inte per fönster: ett
+    fönster med få och nästan lika värden ger annars en skala nära 0.
+    """
+    n_series, n_periods = y.shape
+    padded = np.concatenate([np.full((n_series, window), np.nan), y], axis=1)
+    # windows[:, t] = y[:, t-window:t], dvs. perioderna före t
+    windows = sliding_window_view(padded, window, axis=1)[:, :n_periods]
+    median = np.where(_enough(windows, axis=2), np.nanmedian(windows, axis=2, keepdims=True),
+                      np.nan)[..., 0]
+    return median, _robust_scale(y - median, axis=1)
+
+
+def seasonal_baseline(y: np.ndarray, season: int = SEASON):
+    """Samma period föregående säsong plus seriens mediana förändring."""
+    previous = np.full_like(y, np.nan)
+    previous[:, season:] = y[:, :-season]
+    change = y - previous
+    median_change = np.nanmedian(change, axis=1, keepdims=True)
+    scale = _robust_scale(change - median_change, axis=1)
+    baseline = np.where(_enough(change, axis=1), previous + median_change, np.nan)
+    return baseline, scale
+
+
+# namn: (funktion(matris) -> (baslinje, skala), standardtröskel)
+METHODS = {
+    "zscore": (zscore_baseline, 2.0),
+    "mad": (mad_baseline, 3.5),
+    "rullande": (rolling_baseline, 3.5),
+    "sasong": (seasonal_baseline, 3.5),
+}
+DEFAULT_METHODS = ("mad", "rullande", "sasong")
+
+
+def _matrix(series: pd.DataFrame, values: str = "varde"):
+    """Serie × period-matris (NaN där perioden saknas), med alla perioder i intervallet."""
+    names = pd.unique(series["serie"])
+    periods = np.arange(series["period"].min(), series["period"].max() + 1)
+    matrix = (series.pivot_table(index="serie", columns="period", values=values, aggfunc="last")
+              .reindex(index=names, columns=periods))
+    return names, periods, matrix.to_numpy(dtype=float)
+
+
+def _score(y: np.ndarray, method: str, threshold: float | None, min_scale: float = 0.0):
+    func, default = METHODS[method]
+    threshold = default if threshold is None else threshold
+    with warnings.catch_warnings(), np.errstate(divide="ignore", invalid="ignore"):
+        warnings.simplefilter("ignore", RuntimeWarning)
+        baseline, scale = func(y)
+        baseline = np.broadcast_to(baseline, y.shape)
+        scale = np.broadcast_to(np.fmax(scale, min_scale), y.shape)
+        score = (y - baseline) / scale
+    flagged = np.isfinite(score) & (scale > 0) & (np.abs(score) > threshold)
+    return flagged, score, baseline
+
+
+def detect_series_anomalies(series: pd.DataFrame, methods=DEFAULT_METHODS,
+                            thresholds: dict | None = None,
+                            min_scale: dict | None = None) -> pd.DataFrame:
+    """Avvikelser i alla serier, en rad per flaggad punkt.
+
+    series: lång tabell med SERIES_COLUMNS. methods: metodnamn för alla
+    serier, eller dict {mal: metodnamn} för olika metoder per typ.
+    thresholds: {metod: tröskel} som ersätter METHODS standardtrösklar.
+    min_scale: {mal: minsta skala} i seriens enhet (standard 0).
+    index är punktens plats bland seriens rapporterade punkter.
+    """
+    thresholds = thresholds or {}
+    min_scale = min_scale or {}
+    found = []
+    for mal, part in series.groupby("mal", sort=False):
+        mal_methods = methods.get(mal, DEFAULT_METHODS) if isinstance(methods, dict) else methods
+        names, periods, y = _matrix(part)
+        report = ~np.isnan(y)
+        if "rapport" in part:
+            report &= _matrix(part.astype({"rapport": float}), "rapport")[2] == 1
+        position = np.cumsum(report, axis=1) - 1
+
+        for method in mal_methods:
+            flagged, score, baseline = _score(y, method, thresholds.get(method),
+                                              min_scale.get(mal, 0.0))
+            rows, cols = np.nonzero(flagged & report)
+            if len(rows):
+                found.append(pd.DataFrame({
+                    "mal": mal, "serie": names[rows], "period": periods[cols],
+                    "index": position[rows, cols], "varde": y[rows, cols],
+                    "robust_score": score[rows, cols], "baslinje": baseline[rows, cols],
+                    "metod": method,
+                }))
+
+    if not found:
+        return pd.DataFrame(columns=ANOMALY_COLUMNS)
+
+    hits = pd.concat(found, ignore_index=True)
+    keys = ["mal", "serie", "period"]
+    hits["_styrka"] = hits["robust_score"].abs()
+    metod = hits.groupby(keys, sort=False)["metod"].agg(",".join)
+    strongest = (hits.sort_values("_styrka", ascending=False, kind="stable")
+                 .drop_duplicates(keys).set_index(keys).drop(columns=["metod", "_styrka"]))
+    result = strongest.join(metod).reset_index()
+
+    # Etiketter från indata; ordning som indata, perioder i tidsordning
+    labels = series[keys + ["label"]].drop_duplicates(keys)
+    labels["_ordning"] = np.arange(len(labels))
+    result = (result.merge(labels, on=keys)
+              .sort_values(["_ordning", "period"], kind="stable"))
+
+    result["typ"] = np.where(result["robust_score"] > 0, "hog", "lag")
+    for col in ("varde", "robust_score", "baslinje"):
+        result[col] = result[col].astype(float).round(2)
+    result["z_score"] = result["robust_score"]
+    return result[ANOMALY_COLUMNS].reset_index(drop=True)
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""Batch — kör hela analyskedjan för flera anläggningar.
+
+Varje anläggning har en egen rapportkatalog och får en egen
+output-katalog (standard output/<anläggning>/). Allt körs i en delad
+processpool med högst --jobs processer:
+
+  1. Rapportfiler som saknas i tolkningscachen delas i högst --jobs
+     lika tunga satser (största filerna först) och tolkas en sats per
+     uppgift.
+  2. Anläggningarnas pipelines (pipeline.py) körs sedan i samma pool,
+     anläggningen med flest filer först, så att en stor anläggning inte
+     blir ensam kvar på slutet.
+
+Poolen startar processerna med spawn och ger varje process en enda
+uppgift, så varje anläggning börjar i en ren process där katalogerna
+sätts innan analysskripten importeras (se common.set_directories).
+
+Varje anläggnings utskrifter sparas i <output>/pipeline.log. När allt är
+klart skrivs tid per anläggning och genomströmning ut.
+
+Användning:
+
+    python scripts/batch.py /data/Norra/rapporter /data/Sodra/rapporter
+    python scripts/batch.py --jobs 8 --output /data/resultat /data/*/rapporter
+"""
+
+import argparse
+import sys
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stdout
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import common
+import pipeline
+from katalog import open_catalog
+
+# Inställningar i common som följer med till anläggningarnas processer
+SETTINGS = ("REPORT_YEAR", "CACHE_DIR", "CACHE_ENABLED", "CSV_EXPORT", "PLOTS_ENABLED",
+            "MAX_MEMORY_MB")
+
+
+@dataclass(frozen=True)
+class Facility:
+    """En anläggning i batchen: rapportkatalog, output-katalog och rapportfiler."""
+
+    name: str
+    rapport_dir: Path
+    output_dir: Path
+    files: tuple[Path, ...] = field(default=(), compare=False)
+
+
+@dataclass
+class FacilityResult:
+    name: str
+    files: int
+    seconds: float
+    stages_run: int = 0
+    error: str | None = None
+
+
+def facility_name(rapport_dir: Path) -> str:
+    """Anläggningens namn: katalognamnet, eller föräldern för .../<namn>/rapporter."""
+    rapport_dir = Path(rapport_dir).resolve()
+    return rapport_dir.parent.name if rapport_dir.name == "rapporter" else rapport_dir.name
+
+
+def plan_facilities(rapport_dirs, output_root: Path | None = None) -> list[Facility]:
+    """Anläggningar för rapportkatalogerna, med unika output-kataloger."""
+    output_root = Path(output_root or common.OUTPUT_DIR)
+    facilities, seen = [], {}
+    for rapport_dir in rapport_dirs:
+        rapport_dir = Path(rapport_dir)
+        name = facility_name(rapport_dir)
+        seen[name] = seen.get(name, 0) + 1
+        if seen[name] > 1:
+            name = f"{name}_{seen[name]}"
+        query = open_catalog(rapport_dir).query("", year=common.REPORT_YEAR)
+        files = tuple(path for _, _, path in query)
+        facilities.append(Facility(name, rapport_dir, output_root / name, files))
+    return facilities
+
+
+def _apply_settings(settings: dict | None):
+    """Sätter huvudprocessens SETTINGS-värden i en ny (spawn-)process."""
+    for name, value in (settings or {}).items():
+        setattr(common, name, value)
+
+
+def ingest_batches(files, jobs: int) -> list[list[Path]]:
+    """Delar filerna i högst `jobs` satser med ungefär lika mycket data.
+
+    Största filen först till den hittills lättaste satsen.
+    """
+    batches = [[] for _ in range(max(1, min(jobs, len(files))))]
+    sizes = [0] * len(batches)
+    for path in sorted(files, key=lambda p: p.stat().st_size, reverse=True):
+        i = sizes.index(min(sizes))
+        batches[i].append(path)
+        sizes[i] += path.stat().st_size
+    return [b for b in batches if b]
+
+
+def _ingest_files_task(files: list[Path], settings: dict | None = None) -> int:
+    """Arbetsfunktion: tolkar rapportfilerna in i tolkningscachen.
+
+    En fil som inte går att tolka hoppas över; anläggningens pipeline
+    stöter på samma fel och rapporterar det för just den anläggningen.
+    Returnerar antalet tolkade filer.
+    """
+    _apply_settings(settings)
+    done = 0
+    for filepath in files:
+        try:
+            common.load_report_bundle(0, "", filepath)
+            done += 1
+        except Exception:
+            pass
+    return done
+
+
+def _run_facility_task(facility: Facility, stages=None, targets=None,
+                       force: bool = False, settings: dict | None = None) -> FacilityResult:
+    """Arbetsfunktion: kör pipelinen för en anläggning i dess kataloger.
+
+    Körs i en ny process per anläggning; `settings` är huvudprocessens
+    värden för SETTINGS.
+    """
+    _apply_settings(settings)
+    # Anläggningarna körs redan parallellt; ingen egen pool per anläggning
+    common.INGEST_WORKERS = 1
+    common.set_directories(facility.rapport_dir, facility.output_dir)
+    facility.output_dir.mkdir(parents=True, exist_ok=True)
+    result = FacilityResult(facility.name, len(facility.files), 0.0)
+    start = time.perf_counter()
+    with open(facility.output_dir / "pipeline.log", "w", encoding="utf-8") as log, \
+            redirect_stdout(log):
+        try:
+            timings = pipeline.run_pipeline(stages, targets=targets, force=force)
+            result.stages_run = len(timings)
+        except (Exception, SystemExit) as exc:
+            result.error = f"{type(exc).__name__}: {exc}"
+            print(f"\nFel: {result.error}")
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def run_batch(rapport_dirs, output_root: Path | None = None, jobs: int | None = None,
+              stages=None, targets=None, force: bool = False) -> list[FacilityResult]:
+    """Kör pipelinen för alla anläggningar, högst `jobs` processer åt gången.
+
+    Tolkning av nya filer och anläggningarnas pipelines delar samma pool.
+    Returnerar ett resultat per anläggning, i den ordning de blev klara.
+    """
+    facilities = plan_facilities(rapport_dirs, output_root)
+    jobs = jobs or common.INGEST_WORKERS
+    settings = {name: getattr(common, name) for name in SETTINGS}
+    results = []
+
+    # spawn och en uppgift per process: varje anläggning börjar i en ren
+    # process utan tidigare importerade analysskript
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context("spawn"),
+                             max_tasks_per_child=1) as pool:
+        if common.CACHE_ENABLED:
+            new = {p for f in facilities for p in f.files if not common._is_fully_cached(p)}
+            if new:
+                print(f"Tolkar {len(new)} nya rapportfiler...")
+                batches = ingest_batches(new, jobs)
+                list(pool.map(_ingest_files_task, batches, [settings] * len(batches)))
+
+        by_size = sorted(facilities, key=lambda f: len(f.files), reverse=True)
+        futures = [pool.submit(_run_facility_task, f, stages, targets, force, settings)
+                   for f in by_size]
+        for future in as_completed(futures):
+            result = future.result()
+            status = "FEL" if result.error else f"{result.stages_run} steg körda"
+            print(f"  {result.name}: {result.files} filer, {status}, {result.seconds:.1f} s")
+            results.append(result)
+    return results
+
+
+def print_summary(results: list[FacilityResult], wall: float):
+    """Tid per anläggning och genomströmning för hela batchen."""
+    files = sum(r.files for r in results)
+    failed = [r for r in results if r.error]
+    print("\n" + "=" * 60)
+    print(f"BATCH — {len(results)} anläggningar, {files} filer, {len(failed)} fel")
+    print("=" * 60)
+    width = max((len(r.name) for r in results), default=0)
+    for r in sorted(results, key=lambda r: r.name):
+        status = r.error or f"{r.stages_run} steg körda"
+        print(f"  {r.name:<{width}}  {r.files:4d} filer  {r.seconds:7.1f} s  {status}")
+    print(f"\n  Väggtid:          {wall:.1f} s")
+    if wall > 0:
+        print(f"  Genomströmning:   {len(results) / wall * 60:.1f} anläggningar/min, "
+              f"{files / wall:.2f} filer/s")
+    print()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Kör sopsuganalysen för flera anläggningar.")
+    parser.add_argument("rapport_dirs", nargs="+", type=Path, metavar="rapportkatalog",
+                        help="en rapportkatalog per anläggning")
+    parser.add_argument("-o", "--output", type=Path, metavar="KATALOG",
+                        help="katalog för anläggningarnas output (standard output/)")
+    parser.add_argument("-j", "--jobs", type=int, default=0, metavar="N",
+                        help="processer i den delade poolen (standard antal kärnor)")
+    parser.add_argument("-f", "--force", action="store_true",
+                        help="kör alla steg även om indata inte har ändrats")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    results = run_batch(args.rapport_dirs, args.output, args.jobs or None, force=args.force)
+    print_summary(results, time.perf_counter() - start)
+    if any(r.error for r in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
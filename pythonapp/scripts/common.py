@@ -4,15 +4,60 @@ Tillhandahåller sökvägar, fillistor och DataFrame-inläsning
 med korrekt rubrikrad för rapporterna.
 """
 
+import copy
+import hashlib
+import json
 import os
 import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 import xlrd
 
+from metadata import find_header_row
+from schema import ERROR_COLS, SHEET1_HEADER_FIELDS, SHEET_FIELDS, SheetSchema, resolve_schema
+
 RAPPORT_DIR = Path(__file__).resolve().parent.parent / "rapporter"
 OUTPUT_DIR = Path(__file__).resolve().parent.parent / "output"
+CACHE_DIR = Path(__file__).resolve().parent.parent / "cache"
+
+# Tolkningscache för .xls-ark. Nyckel: filens SHA-256 + READER_VERSION.
+# Höj READER_VERSION när tolkningen av arken ändras, så ogiltigförklaras
+# alla gamla cacheposter. SOPSUG_CACHE=0 stänger av cachen.
+READER_VERSION = 4
+CACHE_ENABLED = os.environ.get("SOPSUG_CACHE", "1") != "0"
+
+# Antal processer för parallell inläsning av rapportfiler.
+# SOPSUG_WORKERS styr; standard är antalet kärnor.
+INGEST_WORKERS = int(os.environ.get("SOPSUG_WORKERS", "0")) or os.cpu_count() or 1
+
+# Minnestak (MB) för inläsning. Med tak läses filerna i satser vars
+# uppskattade minnesbehov (filstorlek × BUNDLE_MEMORY_FACTOR) ryms under
+# taket, och inlästa bundlar sparas inte mellan tabellerna i FactStore.
+# SOPSUG_MAX_MEMORY_MB styr; 0/tomt = inget tak.
+MAX_MEMORY_MB = int(os.environ.get("SOPSUG_MAX_MEMORY_MB", "0")) or None
+BUNDLE_MEMORY_FACTOR = 6
+
+# Resultattabeller mellan stegen sparas typade som .npz (se save_table).
+# CSV-kopian för läsning i kalkylprogram är valfri; SOPSUG_CSV=0 stänger av den.
+CSV_EXPORT = os.environ.get("SOPSUG_CSV", "1") != "0"
+
+# Grafer. SOPSUG_PLOTS=0 (eller pipeline.py --no-plots) kör bara
+# beräkningarna: inga PNG-filer skrivs och matplotlib importeras aldrig.
+PLOTS_ENABLED = os.environ.get("SOPSUG_PLOTS", "1") != "0"
+
+# Delade dataset när flera analyser körs i samma process (pipeline.py).
+# None = av; annars minne för inlästa bundlar och faktatabeller, nycklat
+# på filernas fingeravtryck (sökväg, storlek, mtime). Se share_datasets().
+_SHARED: dict | None = None
+
+# Rapportår som analyserna avser
+REPORT_YEAR = 2025
 
 MANAD_NAMN = {
     1: "Jan", 2: "Feb", 3: "Mar", 4: "Apr",
@@ -20,44 +65,256 @@ MANAD_NAMN = {
     9: "Sep", 10: "Okt", 11: "Nov", 12: "Dec",
 }
 
+# Ark som analyskedjan använder, med förväntad rubrikrad per ark.
+# Raden är en ledtråd: ser den inte ut som en rubrikrad letas rubrikraden
+# upp automatiskt (se resolve_header_row). "auto" hoppar över ledtråden.
+# Sheet1 har egen struktur (nyckel-värde-par) och läses med parse_sheet1().
+REPORT_SHEETS = {
+    "Sheet3": 3,
+    "Sheet5": 3,
+    "Sheet7": 4,
+    "Sheet9": 3,
+    "Sheet11": 3,
+    "Sheet13": 7,
+}
+SHEET1_HEADER_ROW = 9
 
-def get_report_files() -> list[tuple[int, str, Path]]:
-    """Returnerar sorterad lista av (månadsnummer, månadsnamn, sökväg)."""
-    files = sorted(RAPPORT_DIR.glob("*.xls"))
-    result = []
-    for f in files:
-        m = re.search(r"_(\d{1,2})_2025\.xls$", f.name)
-        if m:
-            month = int(m.group(1))
-            result.append((month, MANAD_NAMN[month], f))
-    result.sort(key=lambda x: x[0])
-    return result
 
+def get_report_files(year: int = REPORT_YEAR, facility: str = ""):
+    """Returnerar (månadsnummer, månadsnamn, sökväg) i månadsordning.
 
-def read_sheet(filepath: Path, sheet_name: str, header_row: int) -> pd.DataFrame:
-    """Läser ett ark med angiven rubrikrad och returnerar DataFrame.
+    Hämtas ur rapportkatalogen (katalog.py), som bara skannar RAPPORT_DIR
+    när något har ändrats. Standard är rapporterna för REPORT_YEAR i
+    själva rapportkatalogen; facility väljer en anläggningskatalog.
+    """
+    from katalog import open_catalog
+    return open_catalog(RAPPORT_DIR).query(facility, year=year)
+
+
+@dataclass
+class ReportBundle:
+    """En månadsrapport där alla ark som analyserna behöver är inlästa.
 
-    Undertrycker xlrd-varningen om filstorlek.
+    Arbetsboken öppnas en gång i load_report_bundle() och varje ark
+    tolkas en gång. Alla collect_*-funktioner läser sedan från bundlen.
+    """
+
+    month_num: int
+    month_name: str
+    filepath: Path
+    sheets: dict[str, pd.DataFrame] = field(default_factory=dict)
+    sheet1: list[dict] = field(default_factory=list)
+
+    def sheet(self, sheet_name: str) -> pd.DataFrame:
+        """Returnerar arket som DataFrame (tom om arket saknas i filen)."""
+        df = self.sheets.get(sheet_name)
+        return df if df is not None else pd.DataFrame()
+
+    def schema(self, sheet_name: str) -> SheetSchema:
+        """Arkets kolumnlayout med logiska fält (se schema.SHEET_FIELDS)."""
+        return resolve_schema(sheet_name, self.sheet(sheet_name).columns,
+                              source=self.filepath.name)
+
+
+@contextmanager
+def open_workbook(filepath: Path):
+    """Öppnar en arbetsbok utan xlrd:s varningsutskrifter.
+
+    Används som context manager. Arbetsboken öppnas med on_demand=True och
+    släpps (release_resources) när blocket lämnas, även vid fel.
+    Ark som lästs klart kan släppas tidigare med wb.unload_sheet().
     """
     # xlrd skriver "file size not multiple of sector size" via print(file=logfile)
     # till stdout — undertryck genom att skicka logfile till devnull
-    wb = xlrd.open_workbook(str(filepath), logfile=open(os.devnull, "w"), on_demand=True)
+    with open(os.devnull, "w") as devnull:
+        wb = xlrd.open_workbook(str(filepath), logfile=devnull, on_demand=True)
+        try:
+            yield wb
+        finally:
+            wb.release_resources()
 
-    sheet = wb.sheet_by_name(sheet_name)
 
-    # Läs rubriker från angiven rad
-    headers = [
-        str(sheet.cell_value(header_row, col)).strip()
-        for col in range(sheet.ncols)
-    ]
+_FILE_DIGESTS: dict[tuple, str] = {}
+
+
+def file_sha256(filepath: Path) -> str:
+    """SHA-256 av filens innehåll. Memoiseras per (sökväg, storlek, mtime)."""
+    stat = Path(filepath).stat()
+    key = (str(filepath), stat.st_size, stat.st_mtime_ns)
+    digest = _FILE_DIGESTS.get(key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(filepath, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        _FILE_DIGESTS[key] = digest
+    return digest
+
+
+def _cache_path(filepath: Path, sheet_name: str, header_row) -> Path:
+    digest = file_sha256(filepath)
+    return CACHE_DIR / f"{digest}_{sheet_name}_h{header_row}_v{READER_VERSION}.npz"
+
+
+def _cache_get(filepath: Path, sheet_name: str, header_row) -> pd.DataFrame | None:
+    """Hämtar ett tolkat ark ur cachen, eller None vid miss."""
+    if not CACHE_ENABLED:
+        return None
+    path = _cache_path(filepath, sheet_name, header_row)
+    if not path.exists():
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            return _frame_from_arrays(data)
+    except Exception:
+        # Trasig cachepost (t.ex. avbruten skrivning) — tolka om filen
+        return None
+
+
+def _cache_put(filepath: Path, sheet_name: str, header_row, df: pd.DataFrame):
+    """Sparar ett tolkat ark i cachen (atomiskt via temporärfil).
+
+    Posten skrivs som pickle-fri .npz. Samma arks poster från andra
+    READER_VERSION (och gamla .pkl-poster) tas bort, eftersom de aldrig
+    kan läsas igen.
+    """
+    if not CACHE_ENABLED:
+        return
+    path = _cache_path(filepath, sheet_name, header_row)
+    _write_npz(path, _frame_arrays(df))
+    stem = f"{file_sha256(filepath)}_{sheet_name}_h{header_row}"
+    for stale in CACHE_DIR.glob(f"{stem}_v*"):
+        if stale != path and re.fullmatch(rf"{re.escape(stem)}_v\d+\.(npz|pkl)", stale.name):
+            stale.unlink(missing_ok=True)
+
+
+def discard_cached_file(digest: str) -> int:
+    """Tar bort alla tolkningscacheposter för filinnehållet digest.
+
+    Anropas när en rapportfil har ändrats eller tagits bort, så att
+    poster för dess gamla innehåll inte blir kvar. Returnerar antalet
+    borttagna filer.
+    """
+    removed = 0
+    for stale in CACHE_DIR.glob(f"{digest}_*"):
+        if stale.suffix in (".npz", ".pkl"):
+            stale.unlink(missing_ok=True)
+            removed += 1
+    return removed
+
+
+def sheet_layout_fingerprint(sheet, max_rows: int = 10) -> str:
+    """Fingeravtryck av arkets överdel: namn, bredd och celltyper per rad.
+
+    Täcker samma rader som find_header_row() söker igenom, så två ark med
+    samma fingeravtryck får samma upptäckta rubrikrad.
+    """
+    rows = ["".join(map(str, sheet.row_types(r))) for r in range(min(max_rows, sheet.nrows))]
+    key = "|".join([sheet.name, str(sheet.ncols), *rows])
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+
+
+_HEADER_ROWS: dict[str, int | None] = {}
+
+
+def detect_header_row(sheet) -> int | None:
+    """Rubrikraden enligt metadata.find_header_row(), memoiserad per layout."""
+    fingerprint = sheet_layout_fingerprint(sheet)
+    if fingerprint not in _HEADER_ROWS:
+        _HEADER_ROWS[fingerprint] = find_header_row(sheet)[0]
+    return _HEADER_ROWS[fingerprint]
+
+
+def _looks_like_header(sheet, row_idx: int) -> bool:
+    """Sant om raden ser ut som arkets rubrikrad.
+
+    Raden ska ha minst två icke-tomma celler, alla text (en datarad har
+    tal), och för kända ark minst en rubrik som något av arkets fält i
+    schema.SHEET_FIELDS känner igen.
+    """
+    if not 0 <= row_idx < sheet.nrows:
+        return False
+    cells = [(str(v).strip(), t) for v, t in zip(sheet.row_values(row_idx),
+                                                 sheet.row_types(row_idx))]
+    texts = [v for v, t in cells if v]
+    if len(texts) < 2 or any(t in _NUMBER_CELL_TYPES for v, t in cells if v):
+        return False
+    matchers = SHEET_FIELDS.get(sheet.name) or (
+        SHEET1_HEADER_FIELDS if sheet.name == "Sheet1" else {})
+    return not matchers or any(match(v) for v in texts for match in matchers.values())
+
+
+def resolve_header_row(sheet, header_row: int | str = "auto") -> int | None:
+    """Rubrikrad att använda för arket.
+
+    "auto" letar upp rubrikraden. En angiven rad används om den ser ut som
+    arkets rubrikrad (se _looks_like_header), annars letas rubrikraden upp
+    (t.ex. när en annan leverantörs rapport har förskjutna rader).
+    """
+    if header_row != "auto" and _looks_like_header(sheet, header_row):
+        return header_row
+    return detect_header_row(sheet)
+
+
+def read_sheet(filepath: Path, sheet_name: str, header_row: int | str = "auto") -> pd.DataFrame:
+    """Läser ett ark med angiven rubrikrad och returnerar DataFrame.
+
+    header_row kan vara ett radnummer eller "auto" (se resolve_header_row).
+
+    Kontrollerar tolkningscachen först. Undertrycker xlrd-varningen om filstorlek.
+    """
+    df = _cache_get(filepath, sheet_name, header_row)
+    if df is None:
+        with open_workbook(filepath) as wb:
+            df = sheet_to_frame(wb.sheet_by_name(sheet_name), header_row)
+        _cache_put(filepath, sheet_name, header_row, df)
+    return df
+
+
+_EMPTY_CELL_TYPES = (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK)
+_NUMBER_CELL_TYPES = (xlrd.XL_CELL_NUMBER, xlrd.XL_CELL_DATE)
+
+
+def _typed_column(values: list, types: list) -> np.ndarray:
+    """Bygger en typad kolumn av cellvärden och xlrd-celltyper.
+
+    Kolumner där alla icke-tomma celler är tal blir float64 med NaN för
+    tomma celler. Övriga kolumner behåller de råa cellvärdena (object).
+    """
+    types = np.asarray(types)
+    empty = np.isin(types, _EMPTY_CELL_TYPES)
+    number = np.isin(types, _NUMBER_CELL_TYPES)
+    if number.any() and (number | empty).all():
+        col = np.array(values, dtype=object)
+        col[empty] = np.nan
+        return col.astype(np.float64)
+    return np.array(values, dtype=object)
 
-    # Läs data från raden efter rubrikraden
-    data = []
-    for row_idx in range(header_row + 1, sheet.nrows):
-        row = [sheet.cell_value(row_idx, col) for col in range(sheet.ncols)]
-        data.append(row)
 
-    df = pd.DataFrame(data, columns=headers)
+def sheet_to_frame(sheet, header_row: int | str) -> pd.DataFrame:
+    """Bygger DataFrame av ett öppnat xlrd-ark med angiven rubrikrad.
+
+    Läser hela kolumner i taget (col_values/col_types) i stället för
+    cell för cell. Rent numeriska kolumner blir float64 direkt.
+    Rubrikraden löses upp med resolve_header_row(); hittas ingen blir
+    resultatet en tom DataFrame.
+    """
+    header_row = resolve_header_row(sheet, header_row)
+    if header_row is None:
+        return pd.DataFrame()
+
+    # Läs rubriker från angiven rad
+    headers = [str(v).strip() for v in sheet.row_values(header_row)]
+
+    # Läs data från raden efter rubrikraden, kolumnvis
+    start = header_row + 1
+    columns = {
+        col: _typed_column(sheet.col_values(col, start), sheet.col_types(col, start))
+        for col in range(sheet.ncols)
+    }
+    df = pd.DataFrame(columns, index=pd.RangeIndex(max(sheet.nrows - start, 0)))
+    df.columns = headers
 
     # Ta bort helt tomma rader
     df = df.dropna(how="all").reset_index(drop=True)
@@ -68,6 +325,569 @@ def read_sheet(filepath: Path, sheet_name: str, header_row: int) -> pd.DataFrame
     return df
 
 
+def parse_sheet1(sheet, header_row: int | str = SHEET1_HEADER_ROW) -> list[dict]:
+    """Tolkar Sheet1 till nyckel-värde-rader.
+
+    Sheet1 har ovanlig struktur: etiketter i sammanslagna celler (kol 0-5),
+    värden i kolumn 6 ("Value"), kommentarer i kolumn 8 ("Comment").
+    """
+    header_row = resolve_header_row(sheet, header_row)
+    if header_row is None:
+        return []
+
+    rows = []
+    for row_idx in range(header_row + 1, sheet.nrows):
+        # Hela raden på en gång: kolumn 0-5 etikett, 6 värde, 8 kommentar
+        cells = sheet.row_values(row_idx, 0, 9)
+
+        # Skanna kolumn 0-5 för etikett (sammanslagna celler)
+        label = " ".join(
+            str(val).strip() for val in cells[:6] if val and str(val).strip()
+        ).strip()
+
+        if not label:
+            continue
+
+        # Värde i kolumn 6
+        value = None
+        if len(cells) > 6:
+            raw = cells[6]
+            if raw != "" and raw is not None:
+                value = raw
+
+        # Kommentar i kolumn 8
+        comment = ""
+        if len(cells) > 8:
+            raw = cells[8]
+            if raw and str(raw).strip():
+                comment = str(raw).strip()
+
+        if value is not None or comment:
+            rows.append({
+                "Nyckel": label,
+                "Varde": value,
+                "Kommentar": comment,
+            })
+
+    return rows
+
+
+def sheet1_to_frame(sheet) -> pd.DataFrame:
+    """Sheet1-rader som DataFrame (objekttyp, så None/text/tal bevaras)."""
+    return pd.DataFrame(parse_sheet1(sheet), columns=["Nyckel", "Varde", "Kommentar"], dtype=object)
+
+
+def read_sheet1_rows(filepath: Path) -> list[dict]:
+    """Läser Sheet1 som nyckel-värde-rader, via tolkningscachen."""
+    df = _cache_get(filepath, "Sheet1", SHEET1_HEADER_ROW)
+    if df is None:
+        with open_workbook(filepath) as wb:
+            df = sheet1_to_frame(wb.sheet_by_name("Sheet1"))
+        _cache_put(filepath, "Sheet1", SHEET1_HEADER_ROW, df)
+    return df.to_dict("records")
+
+
+def load_report_bundle(month_num: int, month_name: str, filepath: Path) -> ReportBundle:
+    """Läser in alla ark analyserna använder från en rapportfil.
+
+    Ark som finns i tolkningscachen läses därifrån. Arbetsboken öppnas
+    bara om något ark saknas i cachen, och då en enda gång.
+    """
+    bundle = ReportBundle(month_num, month_name, filepath)
+
+    with ExitStack() as stack:
+        wb = None
+        for sheet_name, header_row in [("Sheet1", SHEET1_HEADER_ROW), *REPORT_SHEETS.items()]:
+            df = _cache_get(filepath, sheet_name, header_row)
+            if df is None:
+                if wb is None:
+                    wb = stack.enter_context(open_workbook(filepath))
+                if sheet_name not in wb.sheet_names():
+                    continue
+                sheet = wb.sheet_by_name(sheet_name)
+                if sheet_name == "Sheet1":
+                    df = sheet1_to_frame(sheet)
+                else:
+                    df = sheet_to_frame(sheet, header_row)
+                wb.unload_sheet(sheet_name)
+                _cache_put(filepath, sheet_name, header_row, df)
+
+            if sheet_name == "Sheet1":
+                bundle.sheet1 = df.to_dict("records")
+            else:
+                bundle.sheets[sheet_name] = df
+
+    return bundle
+
+
+def _is_fully_cached(filepath: Path) -> bool:
+    """Sant om alla ark för filen redan finns i tolkningscachen."""
+    if not CACHE_ENABLED:
+        return False
+    sheets = [("Sheet1", SHEET1_HEADER_ROW), *REPORT_SHEETS.items()]
+    return all(_cache_path(filepath, name, row).exists() for name, row in sheets)
+
+
+def _load_bundle_task(report_file: tuple[int, str, Path]) -> ReportBundle:
+    """Arbetsfunktion för processpoolen (måste ligga på modulnivå)."""
+    month_num, month_name, filepath = report_file
+    return load_report_bundle(month_num, month_name, filepath)
+
+
+def share_datasets(enabled: bool = True):
+    """Slår på (eller av) delning av inlästa dataset inom processen.
+
+    När delning är på läses varje rapportfil och varje faktatabell bara
+    en gång per process, även om flera analysers main() körs efter
+    varandra. Tabeller lämnas ut som kopior så att en analys inte kan
+    ändra en annans data. Med minnestak (MAX_MEMORY_MB) delas bara
+    faktatabellerna, inte bundlarna.
+    """
+    global _SHARED
+    _SHARED = {"bundles": {}, "tables": {}, "used": set()} if enabled else None
+
+
+def trim_shared() -> int:
+    """Släpper delade dataset som inte har använts sedan förra anropet.
+
+    En långlivad process (pipeline.py --watch) anropar den efter varje
+    körning. Nycklarna innehåller filernas storlek och mtime, så bundlar
+    för ändrade filer och tabeller för en äldre fillista används inte
+    längre och tas bort; minnet begränsas då till det en körning behöver.
+    Returnerar antalet borttagna poster.
+    """
+    if _SHARED is None:
+        return 0
+    used = _SHARED["used"]
+    removed = 0
+    for kind in ("bundles", "tables"):
+        stale = [key for key in _SHARED[kind] if key not in used]
+        for key in stale:
+            del _SHARED[kind][key]
+        removed += len(stale)
+    used.clear()
+    return removed
+
+
+def _file_key(filepath: Path) -> tuple[str, int, int]:
+    """(sökväg, storlek, mtime) — ändras filen blir det en ny nyckel."""
+    stat = Path(filepath).stat()
+    return str(filepath), stat.st_size, stat.st_mtime_ns
+
+
+def _shared_bundles() -> dict | None:
+    if _SHARED is None or MAX_MEMORY_MB:
+        return None
+    return _SHARED["bundles"]
+
+
+def load_report_bundles(report_files: list[tuple[int, str, Path]],
+                        workers: int | None = None) -> list[ReportBundle]:
+    """Läser in alla rapportfiler som ReportBundle, i samma ordning som fillistan.
+
+    Filer som måste tolkas med xlrd fördelas över en ProcessPoolExecutor
+    med `workers` processer (standard INGEST_WORKERS). Filer som redan
+    finns i tolkningscachen läses direkt i den egna processen. Resultatet
+    sätts ihop efter fillistans ordning, oavsett i vilken ordning
+    processerna blir klara. Med share_datasets() på återanvänds bundlar
+    som redan lästs in i processen.
+    """
+    report_files = list(report_files)
+    bundles: list[ReportBundle | None] = [None] * len(report_files)
+    shared = _shared_bundles()
+    keys = [(f[0], f[1], *_file_key(f[2])) for f in report_files] if shared is not None else []
+
+    pending = []
+    for i, report_file in enumerate(report_files):
+        if shared is not None and keys[i] in shared:
+            bundles[i] = shared[keys[i]]
+        elif _is_fully_cached(report_file[2]):
+            bundles[i] = _load_bundle_task(report_file)
+        else:
+            pending.append(i)
+
+    workers = min(workers or INGEST_WORKERS, len(pending))
+    if workers <= 1:
+        for i in pending:
+            bundles[i] = _load_bundle_task(report_files[i])
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parsed = pool.map(_load_bundle_task, [report_files[i] for i in pending])
+            for i, bundle in zip(pending, parsed):
+                bundles[i] = bundle
+
+    if shared is not None:
+        shared.update(zip(keys, bundles))
+        _SHARED["used"].update(keys)
+    return bundles
+
+
+def memory_batches(report_files, max_memory_mb: int | None = None) -> list[list]:
+    """Delar fillistan i satser som ryms under minnestaket.
+
+    Minnesbehovet per fil uppskattas till filstorlek × BUNDLE_MEMORY_FACTOR.
+    Varje sats innehåller minst en fil. Utan tak blir det en enda sats.
+    """
+    report_files = list(report_files)
+    max_memory_mb = max_memory_mb or MAX_MEMORY_MB
+    if not max_memory_mb:
+        return [report_files] if report_files else []
+
+    limit = max_memory_mb * 1024 * 1024
+    batches, batch, used = [], [], 0
+    for report_file in report_files:
+        need = Path(report_file[2]).stat().st_size * BUNDLE_MEMORY_FACTOR
+        if batch and used + need > limit:
+            batches.append(batch)
+            batch, used = [], 0
+        batch.append(report_file)
+        used += need
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def iter_report_bundles(report_files, max_memory_mb: int | None = None,
+                        workers: int | None = None):
+    """Ger ReportBundle en i taget, inlästa i satser under minnestaket.
+
+    Bara en sats i taget hålls i minnet (så länge anroparen inte sparar
+    bundlarna). Ordningen är fillistans.
+    """
+    for batch in memory_batches(report_files, max_memory_mb):
+        yield from load_report_bundles(batch, workers)
+
+
+def ingest_reports(report_files, max_memory_mb: int | None = None,
+                   workers: int | None = None) -> int:
+    """Tolkar alla filer in i tolkningscachen utan att hålla dem i minnet.
+
+    Avsett för stora arkiv (t.ex. tio års rapporter i en liten container).
+    Returnerar antalet inlästa filer.
+    """
+    count = 0
+    for _ in iter_report_bundles(report_files, max_memory_mb, workers):
+        count += 1
+    return count
+
+
+def as_bundles(source) -> list[ReportBundle]:
+    """ReportBundle-lista ur bundlar, en fillista eller ett katalog.CatalogQuery."""
+    items = list(source)
+    if all(isinstance(item, ReportBundle) for item in items):
+        return items
+    return load_report_bundles(items)
+
+
+def _store_key(filepath: Path) -> str:
+    """Nyckel för en rapportfil i FactStore: den fullständiga sökvägen.
+
+    Filnamnet räcker inte, eftersom samma namn (t.ex. samma månad) kan
+    finnas i flera anläggningars kataloger.
+    """
+    return str(filepath.resolve())
+
+
+def _manifest_entry(filepath: Path, previous: dict | None) -> dict:
+    """(namn, storlek, mtime, sha256) för en rapportfil.
+
+    Filen hashas bara om storlek eller mtime skiljer sig från förra
+    manifestet — annars återanvänds den sparade hashen.
+    """
+    stat = filepath.stat()
+    if (previous and previous["size"] == stat.st_size
+            and previous["mtime_ns"] == stat.st_mtime_ns):
+        return previous
+    return {
+        "name": filepath.name,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": file_sha256(filepath),
+    }
+
+
+class FactStore:
+    """Inkrementell inläsning av faktatabeller (en collect_*-funktion per tabell).
+
+    Varje tabell sparas i CACHE_DIR/fakta som en del per rapportfil
+    tillsammans med ett manifest över redan inlästa filer, båda nycklade
+    på filens fullständiga sökväg (se _store_key). Vid nästa
+    körning tolkas bara nya eller ändrade filer; övriga månader tas
+    direkt ur den sparade tabellen. Borttagna filer försvinner ur
+    tabellen. Delarna sätts ihop i fillistans (månads-)ordning.
+
+    Kräver att collect-funktionen är månadslokal, dvs. att
+    collect_fn(alla) == sammanslagning av collect_fn([b]) per bundle.
+    Höj `version` för en tabell när dess collect-funktion ändras.
+
+    Med SOPSUG_CACHE=0 sparas ingenting, men bundlarna läses ändå bara
+    en gång per FactStore. Med minnestak (MAX_MEMORY_MB) läses ändrade
+    filer i satser per tabell och sparas inte i FactStore.
+    """
+
+    def __init__(self, report_files: list[tuple[int, str, Path]]):
+        self.report_files = list(report_files)
+        self._bundles: dict[Path, ReportBundle] = {}
+        dirs = sorted({str(Path(f[2]).resolve().parent) for f in self.report_files})
+        dir_key = hashlib.sha256("\n".join(dirs).encode()).hexdigest()[:12]
+        self.store_dir = CACHE_DIR / "fakta" / dir_key
+
+    def bundles(self, report_files=None) -> list[ReportBundle]:
+        """Bundlar för report_files (standard: alla), inlästa högst en gång."""
+        report_files = self.report_files if report_files is None else list(report_files)
+        missing = [f for f in report_files if f[2] not in self._bundles]
+        for report_file, bundle in zip(missing, load_report_bundles(missing)):
+            self._bundles[report_file[2]] = bundle
+        return [self._bundles[f[2]] for f in report_files]
+
+    def _store_path(self, name: str, version: int) -> Path:
+        return self.store_dir / f"{name}_v{version}_r{READER_VERSION}.npz"
+
+    def _load_store(self, path: Path) -> dict:
+        if CACHE_ENABLED and path.exists():
+            try:
+                with np.load(path, allow_pickle=False) as data:
+                    return _store_from_arrays(data)
+            except Exception:
+                pass
+        return {"manifest": {}, "parts": {}}
+
+    def _save_store(self, path: Path, store: dict):
+        """Sparar tabellen som pickle-fri .npz och tar bort äldre versioner."""
+        if not CACHE_ENABLED:
+            return
+        _write_npz(path, _store_arrays(store))
+        name = path.name.rsplit("_v", 1)[0]
+        for stale in self.store_dir.glob(f"{name}_v*"):
+            if stale != path and re.fullmatch(rf"{re.escape(name)}_v\d+_r\d+\.(npz|pkl)",
+                                              stale.name):
+                stale.unlink(missing_ok=True)
+
+    def table(self, name: str, collect_fn, version: int = 1):
+        """Returnerar faktatabellen `name`, uppdaterad med nya/ändrade filer.
+
+        Resultatet har samma form som collect_fn(alla bundlar): DataFrame
+        eller lista, beroende på vad collect-funktionen returnerar.
+        """
+        shared_key = None
+        if _SHARED is not None:
+            shared_key = (str(self.store_dir), name, version,
+                          tuple(_file_key(f[2]) for f in self.report_files))
+            _SHARED["used"].add(shared_key)
+            if shared_key in _SHARED["tables"]:
+                return copy.deepcopy(_SHARED["tables"][shared_key])
+
+        path = self._store_path(name, version)
+        old = self._load_store(path)
+        manifest, parts = {}, {}
+        changed = []
+
+        for report_file in self.report_files:
+            filepath = Path(report_file[2])
+            key = _store_key(filepath)
+            prev = old["manifest"].get(key)
+            entry = _manifest_entry(filepath, prev)
+            manifest[key] = entry
+            if prev is not None and prev["sha256"] == entry["sha256"] and key in old["parts"]:
+                parts[key] = old["parts"][key]
+            else:
+                changed.append(report_file)
+
+        # Tolkningscacheposter för innehåll som ingen fil längre har
+        current = {entry["sha256"] for entry in manifest.values()}
+        for digest in {entry["sha256"] for entry in old["manifest"].values()} - current:
+            discard_cached_file(digest)
+
+        bundles = self.bundles(changed) if not MAX_MEMORY_MB else iter_report_bundles(changed)
+        for report_file, bundle in zip(changed, bundles):
+            parts[_store_key(Path(report_file[2]))] = collect_fn([bundle])
+
+        if changed or manifest != old["manifest"]:
+            self._save_store(path, {"manifest": manifest, "parts": parts})
+
+        ordered = [parts[_store_key(Path(f[2]))] for f in self.report_files]
+        table = _merge_parts(ordered, collect_fn)
+        if shared_key is not None:
+            _SHARED["tables"][shared_key] = copy.deepcopy(table)
+        return table
+
+
+def _json_default(value):
+    """numpy-skalärer i listdelar → Python-värden för json.dumps."""
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} kan inte sparas som JSON")
+
+
+def _store_arrays(store: dict) -> dict[str, np.ndarray]:
+    """FactStore-innehåll → npz-arrayer: manifest som JSON, delar som tabeller.
+
+    DataFrame-delar sparas med _frame_arrays() under prefixet p<j>_,
+    listdelar (collect-funktioner som returnerar listor) som JSON.
+    """
+    arrays = {"__manifest__": np.array(json.dumps(store["manifest"]))}
+    keys = []
+    for j, (key, part) in enumerate(store["parts"].items()):
+        if isinstance(part, pd.DataFrame):
+            keys.append([key, "frame"])
+            arrays.update(_frame_arrays(part, f"p{j}_"))
+        else:
+            keys.append([key, "json"])
+            arrays[f"p{j}_json"] = np.array(json.dumps(part, default=_json_default))
+    arrays["__parts__"] = np.array(json.dumps(keys))
+    return arrays
+
+
+def _store_from_arrays(data) -> dict:
+    """Återskapar FactStore-innehåll sparat med _store_arrays()."""
+    parts = {}
+    for j, (key, kind) in enumerate(json.loads(str(data["__parts__"]))):
+        if kind == "frame":
+            parts[key] = _frame_from_arrays(data, f"p{j}_")
+        else:
+            parts[key] = json.loads(str(data[f"p{j}_json"]))
+    return {"manifest": json.loads(str(data["__manifest__"])), "parts": parts}
+
+
+def _merge_parts(parts: list, collect_fn):
+    """Slår ihop per-fil-delar till en tabell med samma form som collect_fn."""
+    if parts and all(isinstance(p, list) for p in parts):
+        return [row for part in parts for row in part]
+    frames = [p for p in parts if isinstance(p, pd.DataFrame) and not p.empty]
+    if not frames:
+        return collect_fn([])
+    return pd.concat(frames, ignore_index=True)
+
+
+# ---------------------------------------------------------------------------
+# Resultattabeller (typad .npz + valfri CSV)
+# ---------------------------------------------------------------------------
+
+def _encode_column(key: str, s: pd.Series) -> dict[str, np.ndarray]:
+    """Kolumn → pickle-fria arrayer för npz, nycklade på key.
+
+    c<key>: värden (numpy-typ, text eller heltalskoder), m<key>: mask för
+    saknade värden, j<key>: JSON-text för kolumner med blandade typer.
+    Kategorikolumner sparar koder i c<key>, ordningsflaggan i q<key> och
+    kategorierna som en egen kolumn under nyckeln <key>k.
+    """
+    dtype = s.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        categories = pd.Series(dtype.categories)
+        arrays = {f"c{key}": s.cat.codes.to_numpy(),
+                  f"q{key}": np.array(dtype.ordered),
+                  f"t{key}k": np.array(str(categories.dtype))}
+        arrays.update(_encode_column(f"{key}k", categories))
+        return arrays
+    if isinstance(dtype, pd.DatetimeTZDtype):
+        return {f"c{key}": s.dt.tz_convert("UTC").dt.tz_localize(None).to_numpy()}
+    if isinstance(dtype, np.dtype) and dtype.kind in "biufcmM":
+        return {f"c{key}": s.to_numpy()}
+    mask = s.isna().to_numpy()
+    if dtype.kind in "biuf":
+        # Nullbara tal och booleaner (Int64, Float64, boolean): värden + mask
+        values = s.to_numpy(dtype=dtype.numpy_dtype, na_value=0)
+        return {f"c{key}": values, f"m{key}": mask}
+    values = s.to_numpy(dtype=object)
+    # Objektkolumner med None som saknat värde går via JSON så att None bevaras
+    nan_only = dtype != object or all(isinstance(v, float) for v in values[mask])
+    if nan_only and all(isinstance(v, str) for v in values[~mask]):
+        text = np.array(["" if m else v for v, m in zip(values, mask)], dtype=str)
+        return {f"c{key}": text, f"m{key}": mask}
+    # Blandade typer sparas som JSON per värde (int/float/str/bool/None)
+    try:
+        text = [json.dumps(v.item() if isinstance(v, np.generic) else v) for v in values]
+    except TypeError as e:
+        raise TypeError(f"Kolumnen {s.name!r} har värden som inte kan sparas: {e}") from e
+    return {f"j{key}": np.array(text, dtype=str)}
+
+
+def _decode_column(key: str, dtype: str, data) -> pd.Series:
+    """Återskapar en kolumn sparad med _encode_column() med typen dtype."""
+    target = pd.api.types.pandas_dtype(dtype)
+    if isinstance(target, pd.CategoricalDtype):
+        categories = _decode_column(f"{key}k", str(data[f"t{key}k"]), data)
+        return pd.Series(pd.Categorical.from_codes(
+            data[f"c{key}"], categories=categories, ordered=bool(data[f"q{key}"])))
+    if isinstance(target, pd.DatetimeTZDtype):
+        return pd.Series(data[f"c{key}"]).dt.tz_localize("UTC").dt.tz_convert(target.tz)
+    if f"j{key}" in data:
+        return pd.Series([json.loads(v) for v in data[f"j{key}"]], dtype=object)
+    values = data[f"c{key}"]
+    if f"m{key}" not in data:
+        return pd.Series(values)
+    values = values.astype(object)
+    mask = data[f"m{key}"]
+    values[mask] = np.nan if target == object else None
+    return pd.Series(values, dtype=target)
+
+
+def _frame_arrays(df: pd.DataFrame, prefix: str = "") -> dict[str, np.ndarray]:
+    """DataFrame → pickle-fria npz-arrayer (kolumnnamn, typer, kolumner)."""
+    arrays = {
+        f"{prefix}__columns__": np.array([str(c) for c in df.columns], dtype=str),
+        f"{prefix}__dtypes__": np.array([str(t) for t in df.dtypes], dtype=str),
+    }
+    for i in range(df.shape[1]):
+        arrays.update(_encode_column(f"{prefix}{i}", df.iloc[:, i]))
+    return arrays
+
+
+def _frame_from_arrays(data, prefix: str = "") -> pd.DataFrame:
+    """Återskapar en DataFrame sparad med _frame_arrays()."""
+    columns = [str(c) for c in data[f"{prefix}__columns__"]]
+    dtypes = [str(t) for t in data[f"{prefix}__dtypes__"]]
+    series = [_decode_column(f"{prefix}{i}", dtype, data) for i, dtype in enumerate(dtypes)]
+    df = pd.concat(series, axis=1) if series else pd.DataFrame()
+    df.columns = columns
+    return df
+
+
+def _write_npz(path: Path, arrays: dict[str, np.ndarray]):
+    """Skriver arrayerna till path atomiskt via temporärfil."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp, path)
+
+
+def save_table(df: pd.DataFrame, csv_path: Path, index: bool = False) -> Path:
+    """Sparar en resultattabell för senare steg.
+
+    Tabellen skrivs typad till csv_path med ändelsen .npz (kolumntyperna,
+    även kategorier och nullbara Int64/boolean, och saknade värden
+    bevaras; filen innehåller inga pickle-objekt) och, om CSV_EXPORT,
+    som CSV till csv_path. Med index=True blir index första kolumnen,
+    precis som i CSV:n. Returnerar sökvägen till .npz-filen.
+    """
+    path = Path(csv_path).with_suffix(".npz")
+    frame = df.reset_index() if index else df
+    _write_npz(path, _frame_arrays(frame))
+
+    if CSV_EXPORT:
+        df.to_csv(csv_path, index=index, encoding="utf-8-sig")
+    return path
+
+
+def load_table(csv_path: Path) -> pd.DataFrame | None:
+    """Läser en resultattabell sparad med save_table().
+
+    Läser .npz-filen bredvid csv_path om den finns, annars CSV:n (t.ex.
+    från en äldre körning). None om ingen av dem finns.
+    """
+    path = Path(csv_path).with_suffix(".npz")
+    if path.exists():
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                return _frame_from_arrays(data)
+        except (KeyError, ValueError):
+            pass  # Äldre fil med pickle-objekt; läs CSV:n i stället
+    if Path(csv_path).exists():
+        return pd.read_csv(csv_path)
+    return None
+
+
 def parse_valve_id(valve_id: str) -> tuple[int, int]:
     """Parsar 'XX:Y' → (grennummer, ventilnummer)."""
     parts = str(valve_id).split(":")
@@ -77,3 +897,41 @@ def parse_valve_id(valve_id: str) -> tuple[int, int]:
 def ensure_output_dir():
     """Skapar output-katalogen om den inte finns."""
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+
+
+def plots_enabled() -> bool:
+    """Sant om analyserna ska rita grafer (se PLOTS_ENABLED)."""
+    return PLOTS_ENABLED
+
+
+def pyplot():
+    """matplotlib.pyplot med Agg-backend.
+
+    Importeras först när en graf ritas, så att körningar utan grafer
+    slipper matplotlibs starttid.
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def set_directories(rapport_dir: Path | None = None, output_dir: Path | None = None):
+    """Sätter RAPPORT_DIR och OUTPUT_DIR för processen.
+
+    Analysskripten binder konstanterna vid import (`from common import
+    OUTPUT_DIR`), så katalogerna måste sättas innan något av dem har
+    importerats; annars RuntimeError. Flera anläggningar körs därför i
+    varsin ny process (se batch.py), inte efter varandra i samma.
+    """
+    global RAPPORT_DIR, OUTPUT_DIR
+    bound = sorted(name for name, module in list(sys.modules.items())
+                   if name != __name__ and (getattr(module, "RAPPORT_DIR", None) is RAPPORT_DIR
+                                            or getattr(module, "OUTPUT_DIR", None) is OUTPUT_DIR))
+    if bound:
+        raise RuntimeError("Katalogerna måste sättas innan analysskripten importeras "
+                           f"(redan importerade: {', '.join(bound)})")
+    if rapport_dir:
+        RAPPORT_DIR = Path(rapport_dir)
+    if output_dir:
+        OUTPUT_DIR = Path(output_dir)
@@ -16,23 +16,24 @@ Output:
 import sys
 
 import pandas as pd
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
 
-from common import OUTPUT_DIR, ensure_output_dir
+from common import OUTPUT_DIR, ensure_output_dir, load_table, plots_enabled, pyplot
 
 
 def load_csv(name):
-    """Läser en output-CSV om den finns."""
+    """Läser en resultattabell (output/<namn>.npz eller .csv) om den finns."""
     path = OUTPUT_DIR / name
-    if not path.exists():
+    df = load_table(path)
+    if df is None:
         print(f"Varning: {path} saknas. Kör motsvarande analysscript först.")
-        return None
-    return pd.read_csv(path)
+    return df
 
 
 def main():
+    if not plots_enabled():
+        print("Grafer avstängda (SOPSUG_PLOTS=0) — ingen dashboard.")
+        return
+    plt = pyplot()
     ensure_output_dir()
 
     energi_df = load_csv("energi_drift.csv")
@@ -15,9 +15,8 @@ import json
 
 import pandas as pd
 import numpy as np
-from scipy.stats import pearsonr
 
-from common import OUTPUT_DIR, ensure_output_dir
+from common import OUTPUT_DIR, ensure_output_dir, load_table, save_table
 
 
 # ---------------------------------------------------------------------------
@@ -25,21 +24,15 @@ from common import OUTPUT_DIR, ensure_output_dir
 # ---------------------------------------------------------------------------
 
 def load_data():
-    """Laddar alla CSV:er som behövs för korsanalys."""
+    """Laddar alla tabeller som behövs för korsanalys."""
     data = {}
     for name in ["trend_anlaggning", "trend_ventiler", "trend_grenar", "trend_anomalier"]:
-        path = OUTPUT_DIR / f"{name}.csv"
-        if path.exists():
-            data[name.replace("trend_", "")] = pd.read_csv(path)
-        else:
-            data[name.replace("trend_", "")] = pd.DataFrame()
+        df = load_table(OUTPUT_DIR / f"{name}.csv")
+        data[name.replace("trend_", "")] = df if df is not None else pd.DataFrame()
 
     for name in ["manuell_analys", "manuell_ventiler"]:
-        path = OUTPUT_DIR / f"{name}.csv"
-        if path.exists():
-            data[name] = pd.read_csv(path)
-        else:
-            data[name] = pd.DataFrame()
+        df = load_table(OUTPUT_DIR / f"{name}.csv")
+        data[name] = df if df is not None else pd.DataFrame()
 
     return data
 
@@ -50,6 +43,7 @@ def load_data():
 
 def analyze_manual_vs_errors(data):
     """Korsrefererar manuella körningar med felkoder per ventil."""
+    from scipy.stats import pearsonr
     tv = data.get("ventiler", pd.DataFrame())
     mv = data.get("manuell_ventiler", pd.DataFrame())
     if tv.empty or mv.empty:
@@ -117,6 +111,7 @@ def analyze_manual_vs_errors(data):
 
 def analyze_energy_efficiency(data):
     """Analyserar kWh/tömning-mönster och identifierar avvikelser."""
+    from scipy.stats import pearsonr
     anl = data.get("anlaggning", pd.DataFrame())
     if anl.empty or "kWh_per_tomning" not in anl.columns:
         return {}
@@ -405,7 +400,7 @@ def main():
     if manual_errors.get("risk_ventiler"):
         risk_df = pd.DataFrame(manual_errors["risk_ventiler"])
         csv_path = OUTPUT_DIR / "drifterfarenheter.csv"
-        risk_df.to_csv(csv_path, index=False, encoding="utf-8-sig")
+        save_table(risk_df, csv_path)
         print(f"  Sparad: {csv_path}")
 
     print("\n" + "=" * 60)
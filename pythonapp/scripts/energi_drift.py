@@ -13,91 +13,95 @@ Output:
 """
 
 import pandas as pd
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
 
 from common import (
     OUTPUT_DIR,
     get_report_files,
-    read_sheet,
+    load_report_bundles,
     ensure_output_dir,
+    as_bundles,
+    save_table,
+    plots_enabled,
+    pyplot,
 )
 
 
-def collect_energy_data(report_files):
+def collect_energy_data(bundles):
     """Samlar månatlig energi och drifttid från Sheet3."""
     rows = []
-    for month_num, month_name, filepath in report_files:
-        df = read_sheet(filepath, "Sheet3", header_row=3)
+    for bundle in as_bundles(bundles):
+        df = bundle.sheet("Sheet3")
+        schema = bundle.schema("Sheet3")
         # Summera numeriska kolumner
-        energy_col = [c for c in df.columns if "energy" in c.lower() or "kwh" in c.lower()]
-        time_col = [c for c in df.columns if "operation" in c.lower() or "time" in c.lower()]
+        energy_col = schema.col("energy")
+        time_col = schema.col("operation_time")
 
-        energy = pd.to_numeric(df[energy_col[0]], errors="coerce").sum() if energy_col else 0
-        op_time = pd.to_numeric(df[time_col[0]], errors="coerce").sum() if time_col else 0
+        energy = pd.to_numeric(df[energy_col], errors="coerce").sum() if energy_col else 0
+        op_time = pd.to_numeric(df[time_col], errors="coerce").sum() if time_col else 0
 
         rows.append({
-            "Månad_nr": month_num,
-            "Månad": month_name,
+            "Månad_nr": bundle.month_num,
+            "Månad": bundle.month_name,
             "Energi_kWh": round(energy, 1),
             "Drifttid_h": round(op_time, 1),
         })
     return pd.DataFrame(rows)
 
 
-def collect_fraction_data(report_files):
+def collect_fraction_data(bundles):
     """Samlar tömningar per fraktion från Sheet5."""
     rows = []
-    for month_num, month_name, filepath in report_files:
-        df = read_sheet(filepath, "Sheet5", header_row=3)
-        frac_col = [c for c in df.columns if "fraction" in c.lower()]
-        empty_col = [c for c in df.columns if "emptying" in c.lower() and "minute" not in c.lower()]
+    for bundle in as_bundles(bundles):
+        df = bundle.sheet("Sheet5")
+        schema = bundle.schema("Sheet5")
+        frac_col = schema.col("fraction")
+        empty_col = schema.col("emptyings")
 
         if not frac_col or not empty_col:
             continue
 
         for _, row in df.iterrows():
-            frac = str(row[frac_col[0]]).strip()
+            frac = str(row[frac_col]).strip()
             if not frac or frac == "nan":
                 continue
-            emptyings = pd.to_numeric(row[empty_col[0]], errors="coerce")
+            emptyings = pd.to_numeric(row[empty_col], errors="coerce")
             if pd.notna(emptyings) and emptyings > 0:
                 rows.append({
-                    "Månad_nr": month_num,
-                    "Månad": month_name,
+                    "Månad_nr": bundle.month_num,
+                    "Månad": bundle.month_name,
                     "Fraktion": frac,
                     "Tömningar": int(emptyings),
                 })
     return pd.DataFrame(rows)
 
 
-def collect_machine_data(report_files):
+def collect_machine_data(bundles):
     """Samlar maskinstatistik från Sheet7."""
     rows = []
-    for month_num, month_name, filepath in report_files:
-        df = read_sheet(filepath, "Sheet7", header_row=4)
-        name_col = [c for c in df.columns if "name" in c.lower()]
-        starts_col = [c for c in df.columns if "start" in c.lower()]
-        hours_col = [c for c in df.columns if "hour" in c.lower()]
-        kwh_col = [c for c in df.columns if "kwh" in c.lower()]
+    for bundle in as_bundles(bundles):
+        df = bundle.sheet("Sheet7")
+        schema = bundle.schema("Sheet7")
+        name_col = schema.col("name")
+        starts_col = schema.col("starts")
+        hours_col = schema.col("hours")
+        kwh_col = schema.col("kwh")
 
         if not name_col:
             continue
 
         for _, row in df.iterrows():
-            name = str(row[name_col[0]]).strip()
+            name = str(row[name_col]).strip()
             if not name or name == "nan":
                 continue
             if name.lower() == "total":
                 continue
             rows.append({
-                "Månad_nr": month_num,
-                "Månad": month_name,
+                "Månad_nr": bundle.month_num,
+                "Månad": bundle.month_name,
                 "Maskin": name,
-                "Starter": pd.to_numeric(row[starts_col[0]], errors="coerce") if starts_col else 0,
-                "Drifttimmar": pd.to_numeric(row[hours_col[0]], errors="coerce") if hours_col else 0,
-                "kWh": pd.to_numeric(row[kwh_col[0]], errors="coerce") if kwh_col else 0,
+                "Starter": pd.to_numeric(row[starts_col], errors="coerce") if starts_col else 0,
+                "Drifttimmar": pd.to_numeric(row[hours_col], errors="coerce") if hours_col else 0,
+                "kWh": pd.to_numeric(row[kwh_col], errors="coerce") if kwh_col else 0,
             })
     return pd.DataFrame(rows)
 
@@ -121,12 +125,13 @@ def create_summary_csv(energy_df, fraction_df):
 
     summary = summary.sort_values("Månad_nr")
     output_path = OUTPUT_DIR / "energi_drift.csv"
-    summary.to_csv(output_path, index=False, encoding="utf-8-sig")
+    save_table(summary, output_path)
     return summary
 
 
 def create_plots(energy_df, fraction_df):
     """Skapar graf med 3 subplots."""
+    plt = pyplot()
     fig, axes = plt.subplots(3, 1, figsize=(12, 12))
     fig.suptitle("Energi & Drift — Sopsuganläggningen 2025", fontsize=14, fontweight="bold")
 
@@ -220,16 +225,18 @@ def main():
         return
 
     print(f"Läser {len(report_files)} rapporter...")
+    bundles = load_report_bundles(report_files)
 
-    energy_df = collect_energy_data(report_files)
-    fraction_df = collect_fraction_data(report_files)
-    machine_df = collect_machine_data(report_files)
+    energy_df = collect_energy_data(bundles)
+    fraction_df = collect_fraction_data(bundles)
+    machine_df = collect_machine_data(bundles)
 
     summary = create_summary_csv(energy_df, fraction_df)
     print(f"CSV sparad: {OUTPUT_DIR / 'energi_drift.csv'}")
 
-    plot_path = create_plots(energy_df, fraction_df)
-    print(f"Graf sparad: {plot_path}")
+    if plots_enabled():
+        plot_path = create_plots(energy_df, fraction_df)
+        print(f"Graf sparad: {plot_path}")
 
     print_summary(energy_df, fraction_df, machine_df)
 
@@ -17,39 +17,42 @@ import re
 
 import numpy as np
 import pandas as pd
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
 
 from common import (
     OUTPUT_DIR,
     MANAD_NAMN,
     get_report_files,
-    read_sheet,
+    load_report_bundles,
     ensure_output_dir,
+    as_bundles,
+    save_table,
+    plots_enabled,
+    pyplot,
 )
+from sasong import SUMMER_MONTHS, season_type, seasonality
 
 
-def collect_fraction_full(report_files):
+def collect_fraction_full(bundles):
     """Samlar alla Sheet5-kolumner per fraktion per manad.
 
     Inkluderar oanvanda kolumner: Hours (fyllnadstid) och Emptying/minute.
     """
     rows = []
-    for month_num, month_name, filepath in report_files:
-        df = read_sheet(filepath, "Sheet5", header_row=3)
+    for bundle in as_bundles(bundles):
+        df = bundle.sheet("Sheet5")
+        schema = bundle.schema("Sheet5")
 
-        frac_col = [c for c in df.columns if "fraction" in c.lower()]
-        hours_col = [c for c in df.columns if c.lower().strip() == "hours"]
-        kwh_col = [c for c in df.columns if "kwh" in c.lower()]
-        empty_col = [c for c in df.columns if "emptying" in c.lower() and "minute" not in c.lower()]
-        epm_col = [c for c in df.columns if "minute" in c.lower()]
+        frac_col = schema.col("fraction")
+        hours_col = schema.col("hours")
+        kwh_col = schema.col("kwh")
+        empty_col = schema.col("emptyings")
+        epm_col = schema.col("emptyings_per_minute")
 
         if not frac_col:
             continue
 
         for _, row in df.iterrows():
-            frac = str(row[frac_col[0]]).strip()
+            frac = str(row[frac_col]).strip()
             if not frac or frac == "nan":
                 continue
 
@@ -59,16 +62,16 @@ def collect_fraction_full(report_files):
             if re.match(r"^\d{2}-\w+$", frac):
                 continue
 
-            hours = pd.to_numeric(row[hours_col[0]], errors="coerce") if hours_col else np.nan
-            kwh = pd.to_numeric(row[kwh_col[0]], errors="coerce") if kwh_col else np.nan
-            emptyings = pd.to_numeric(row[empty_col[0]], errors="coerce") if empty_col else np.nan
-            epm = pd.to_numeric(row[epm_col[0]], errors="coerce") if epm_col else np.nan
+            hours = pd.to_numeric(row[hours_col], errors="coerce") if hours_col else np.nan
+            kwh = pd.to_numeric(row[kwh_col], errors="coerce") if kwh_col else np.nan
+            emptyings = pd.to_numeric(row[empty_col], errors="coerce") if empty_col else np.nan
+            epm = pd.to_numeric(row[epm_col], errors="coerce") if epm_col else np.nan
 
             kwh_per_tomning = kwh / emptyings if pd.notna(kwh) and pd.notna(emptyings) and emptyings > 0 else np.nan
 
             rows.append({
-                "Manad_nr": month_num,
-                "Manad": month_name,
+                "Manad_nr": bundle.month_num,
+                "Manad": bundle.month_name,
                 "Fraktion": frac,
                 "Timmar_hog_fyllnad": round(hours, 2) if pd.notna(hours) else np.nan,
                 "kWh": round(kwh, 1) if pd.notna(kwh) else np.nan,
@@ -81,17 +84,21 @@ def collect_fraction_full(report_files):
 
 
 def compute_seasonal_analysis(df):
-    """H1 vs H2, sommar vs vinter per fraktion."""
+    """H1 vs H2, sommar vs vinter och autokorrelation per fraktion."""
     if df.empty:
         return {}
 
+    # Autokorrelation i tomningar for alla fraktioner i ett svep
+    acf = seasonality(df.pivot_table(index="Fraktion", columns="Manad_nr",
+                                     values="Tomningar", aggfunc="sum"))
+
     results = {}
     for frac in df["Fraktion"].unique():
         frac_data = df[df["Fraktion"] == frac]
 
         h1 = frac_data[frac_data["Manad_nr"] <= 6]
         h2 = frac_data[frac_data["Manad_nr"] > 6]
-        sommar = frac_data[frac_data["Manad_nr"].isin([6, 7, 8])]
+        sommar = frac_data[frac_data["Manad_nr"].isin(SUMMER_MONTHS)]
         vinter = frac_data[frac_data["Manad_nr"].isin([12, 1, 2])]
 
         h1_tom = h1["Tomningar"].sum()
@@ -100,6 +107,8 @@ def compute_seasonal_analysis(df):
 
         sommar_medel = sommar["Tomningar"].mean() if not sommar.empty else 0
         vinter_medel = vinter["Tomningar"].mean() if not vinter.empty else 0
+        medel = frac_data["Tomningar"].mean()
+        har_monster = bool(acf.at[frac, "har_sasongsmonster"])
 
         results[frac] = {
             "H1_tomningar": h1_tom,
@@ -107,6 +116,10 @@ def compute_seasonal_analysis(df):
             "Halvars_variation_%": round(variation, 1),
             "Sommar_medel": round(sommar_medel, 0),
             "Vinter_medel": round(vinter_medel, 0),
+            "Sasongsmonster": har_monster,
+            "Sasongstyp": season_type(har_monster, sommar_medel / medel if medel > 0 else 0),
+            "Sasong_lag": acf.at[frac, "starkast_lag"],
+            "Sasong_acf": acf.at[frac, "korrelation"],
         }
     return results
 
@@ -152,6 +165,7 @@ def compute_throughput(df):
 
 def create_plots(df):
     """Skapar 6 individuella grafer for fraktionsanalys."""
+    plt = pyplot()
     if df.empty:
         print("Ingen data att visualisera.")
         return
@@ -307,6 +321,9 @@ def print_summary(df, seasonal, fill, throughput):
             print(f"  {frac}: H1={info['H1_tomningar']:,} H2={info['H2_tomningar']:,} "
                   f"(variation {info['Halvars_variation_%']:.0f}%) "
                   f"sommar={info['Sommar_medel']:.0f} vinter={info['Vinter_medel']:.0f}")
+            if info["Sasongsmonster"]:
+                print(f"    sasongsmonster ({info['Sasongstyp']}): lag {info['Sasong_lag']:.0f}, "
+                      f"autokorrelation {info['Sasong_acf']:.2f}")
 
     # Genomstromning
     if throughput:
@@ -327,9 +344,10 @@ def main():
         return
 
     print(f"Laser {len(report_files)} rapporter for fraktionsanalys...\n")
+    bundles = load_report_bundles(report_files)
 
     # Datainsamling
-    df = collect_fraction_full(report_files)
+    df = collect_fraction_full(bundles)
     print(f"Totalt {len(df)} rader, {df['Fraktion'].nunique()} fraktioner")
 
     # Analyser
@@ -339,11 +357,12 @@ def main():
 
     # Spara CSV
     csv_path = OUTPUT_DIR / "fraktion_analys.csv"
-    df.to_csv(csv_path, index=False, encoding="utf-8-sig")
+    save_table(df, csv_path)
     print(f"CSV sparad: {csv_path}")
 
     # Graf
-    create_plots(df)
+    if plots_enabled():
+        create_plots(df)
 
     # Sammanfattning
     print_summary(df, seasonal, fill, throughput)
@@ -23,26 +23,24 @@ Output:
 
 import numpy as np
 import pandas as pd
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
 
 from common import (
     OUTPUT_DIR,
     MANAD_NAMN,
     get_report_files,
-    read_sheet,
+    FactStore,
     parse_valve_id,
     ensure_output_dir,
+    as_bundles,
+    save_table,
+    plots_enabled,
+    pyplot,
 )
+from sasong import SUMMER_MONTHS, season_type, seasonality
+from ventilfakta import build_valve_facts, total_errors
 
-ERROR_COLS = {
-    "DOES_NOT_CLOSE", "DOES_NOT_OPEN", "LEVEL_ERROR",
-    "LONG_TIME_SINCE_LAST_COLLECTION", "ERROR_FEEDBACK_FROM_USER",
-}
 
-
-def collect_valve_info(report_files):
+def collect_valve_info(bundles):
     """Extrahera "Info"-kolumn fran Sheet9/11 → ventil-ID, gren, beskrivningstext.
 
     Tar info fran forsta filen som innehaller data (info andras normalt inte
@@ -51,22 +49,23 @@ def collect_valve_info(report_files):
     info_rows = []
     seen_ids = set()
 
-    for month_num, month_name, filepath in report_files:
+    for bundle in as_bundles(bundles):
         # Prova Sheet9 forst
         for sheet_name in ["Sheet9", "Sheet11"]:
-            df = read_sheet(filepath, sheet_name, header_row=3)
-            id_col = [c for c in df.columns if c.lower().strip() == "id"]
-            info_col = [c for c in df.columns if c.lower().strip() == "info"]
+            df = bundle.sheet(sheet_name)
+            schema = bundle.schema(sheet_name)
+            id_col = schema.col("valve_id")
+            info_col = schema.col("info")
 
             if not id_col or not info_col:
                 continue
 
             for _, row in df.iterrows():
-                vid = str(row[id_col[0]]).strip()
+                vid = str(row[id_col]).strip()
                 if not vid or vid == "nan" or vid in seen_ids:
                     continue
 
-                info = str(row[info_col[0]]).strip()
+                info = str(row[info_col]).strip()
                 if info == "nan":
                     info = ""
 
@@ -93,94 +92,31 @@ def collect_valve_info(report_files):
     )
 
 
-def collect_branch_data(report_files):
-    """Aggregera per gren per manad: tillganglighet, fel, kommandon, manuell andel."""
-    rows = []
-    for month_num, month_name, filepath in report_files:
-        # Sheet11: tillganglighet + felkoder
-        df11 = read_sheet(filepath, "Sheet11", header_row=3)
-        avail_col = [c for c in df11.columns if "availability" in c.lower()]
-        id_col11 = "ID" if "ID" in df11.columns else None
-        found_error_cols = [c for c in df11.columns if c in ERROR_COLS]
-
-        if not avail_col or not id_col11:
-            continue
-
-        # Sheet9: kommandon
-        df9 = read_sheet(filepath, "Sheet9", header_row=3)
-        id_col9 = [c for c in df9.columns if c.lower().strip() == "id"]
-        cmd_map = {}
-        if id_col9:
-            for c in df9.columns:
-                cl = c.strip().upper()
-                if cl == "MAN_OPEN_CMD":
-                    cmd_map["man"] = c
-                elif cl == "AUTO_OPEN_CMD":
-                    cmd_map["auto"] = c
-
-            man_lookup = {}
-            auto_lookup = {}
-            for _, r9 in df9.iterrows():
-                vid9 = str(r9[id_col9[0]]).strip()
-                if vid9 and vid9 != "nan":
-                    m = pd.to_numeric(r9.get(cmd_map.get("man", ""), 0), errors="coerce")
-                    a = pd.to_numeric(r9.get(cmd_map.get("auto", ""), 0), errors="coerce")
-                    man_lookup[vid9] = int(m) if pd.notna(m) else 0
-                    auto_lookup[vid9] = int(a) if pd.notna(a) else 0
-
-        # Per ventil -> aggregera per gren
-        gren_data = {}
-        for _, row in df11.iterrows():
-            vid = str(row[id_col11]).strip()
-            if not vid or vid == "nan":
-                continue
-
-            try:
-                gren, _ = parse_valve_id(vid)
-            except (ValueError, IndexError):
-                continue
+def collect_branch_data(facts):
+    """Aggregera per gren per manad: tillganglighet, fel, kommandon, manuell andel.
 
-            avail = pd.to_numeric(row[avail_col[0]], errors="coerce")
-            if pd.isna(avail):
-                continue
+    Vy ur ventilfaktatabellen: ventiler i Sheet11 med tolkningsbart ID och
+    giltig tillganglighet. Grenarna kommer i ordning efter forsta forekomst.
+    """
+    v = facts[facts["I_Sheet11"] & facts["Giltigt_ID"] & facts["Tillganglighet"].notna()]
+    v = v.assign(Totala_fel=total_errors(v))
+    grouped = v.groupby(["Manad_nr", "Manad", "Gren"], sort=False)
+    branch = grouped.agg(
+        Medel_tillganglighet=("Tillganglighet", "mean"),
+        Totala_fel=("Totala_fel", "sum"),
+        MAN_CMD=("MAN_OPEN_CMD", "sum"),
+        AUTO_CMD=("AUTO_OPEN_CMD", "sum"),
+        Antal_ventiler=("Ventil_ID", "nunique"),
+    ).reset_index()
+    if branch.empty:
+        return pd.DataFrame()
 
-            total_errors = 0
-            for ec in found_error_cols:
-                ev = pd.to_numeric(row[ec], errors="coerce")
-                if pd.notna(ev) and ev > 0:
-                    total_errors += int(ev)
-
-            man_cmd = man_lookup.get(vid, 0) if cmd_map else 0
-            auto_cmd = auto_lookup.get(vid, 0) if cmd_map else 0
-
-            if gren not in gren_data:
-                gren_data[gren] = {
-                    "avail_sum": 0, "avail_count": 0,
-                    "errors": 0, "man": 0, "auto": 0, "ventiler": set()
-                }
-            gren_data[gren]["avail_sum"] += avail
-            gren_data[gren]["avail_count"] += 1
-            gren_data[gren]["errors"] += total_errors
-            gren_data[gren]["man"] += man_cmd
-            gren_data[gren]["auto"] += auto_cmd
-            gren_data[gren]["ventiler"].add(vid)
-
-        for gren, gd in gren_data.items():
-            total_cmd = gd["man"] + gd["auto"]
-            rows.append({
-                "Manad_nr": month_num,
-                "Manad": month_name,
-                "Gren": gren,
-                "Medel_tillganglighet": round(gd["avail_sum"] / gd["avail_count"], 2),
-                "Totala_fel": gd["errors"],
-                "MAN_CMD": gd["man"],
-                "AUTO_CMD": gd["auto"],
-                "Total_CMD": total_cmd,
-                "Manuell_andel_%": round(gd["man"] / total_cmd * 100, 1) if total_cmd > 0 else 0,
-                "Antal_ventiler": len(gd["ventiler"]),
-            })
-
-    return pd.DataFrame(rows)
+    branch["Medel_tillganglighet"] = branch["Medel_tillganglighet"].round(2)
+    branch["Total_CMD"] = branch["MAN_CMD"] + branch["AUTO_CMD"]
+    total = branch["Total_CMD"].where(branch["Total_CMD"] > 0)
+    branch["Manuell_andel_%"] = (branch["MAN_CMD"] / total * 100).round(1).fillna(0)
+    return branch[["Manad_nr", "Manad", "Gren", "Medel_tillganglighet", "Totala_fel",
+                   "MAN_CMD", "AUTO_CMD", "Total_CMD", "Manuell_andel_%", "Antal_ventiler"]]
 
 
 def identify_branch_characteristics(info_df, branch_df):
@@ -210,28 +146,33 @@ def identify_branch_characteristics(info_df, branch_df):
         else:
             gren_types[gren] = "Ovrigt"
 
-    # Sasongsanalys per gren
+    # Sasongsanalys per gren: autokorrelation for alla grenar i ett svep
+    cmd = branch_df.pivot_table(index="Gren", columns="Manad_nr", values="Total_CMD")
+    acf = seasonality(cmd[cmd.notna().sum(axis=1) >= 4], min_points=4)
+
     season_results = {}
-    for gren in branch_df["Gren"].unique():
+    for gren, season in acf.iterrows():
         g_data = branch_df[branch_df["Gren"] == gren].sort_values("Manad_nr")
-        if len(g_data) < 4:
-            continue
 
-        sommar = g_data[g_data["Manad_nr"].isin([6, 7, 8])]["Total_CMD"].mean()
+        sommar = g_data[g_data["Manad_nr"].isin(SUMMER_MONTHS)]["Total_CMD"].mean()
         vinter = g_data[g_data["Manad_nr"].isin([12, 1, 2])]["Total_CMD"].mean()
         medel = g_data["Total_CMD"].mean()
 
         # Variationskoefficient
         cv = g_data["Total_CMD"].std() / medel * 100 if medel > 0 else 0
 
+        # Autokorrelationen avgor om grenen ar sasongsberoende;
+        # sommarnivan anger bara riktningen
         sommar_andel = sommar / medel if medel > 0 else 0
+        typ = season_type(season["har_sasongsmonster"], sommar_andel)
 
         season_results[gren] = {
             "Sommar_CMD": round(sommar, 0),
             "Vinter_CMD": round(vinter, 0),
             "CV_%": round(cv, 1),
-            "Sasongstyp": "Sommarsvacka" if sommar_andel < 0.7 else
-                          "Sommartopp" if sommar_andel > 1.3 else "Jamn",
+            "Sasongstyp": typ,
+            "Sasong_lag": season["starkast_lag"],
+            "Sasong_acf": season["korrelation"],
         }
 
     # Bygg profil-dataframe
@@ -251,6 +192,8 @@ def identify_branch_characteristics(info_df, branch_df):
             "CV_%": season_results.get(gren, {}).get("CV_%", np.nan),
             "Sommar_CMD": season_results.get(gren, {}).get("Sommar_CMD", np.nan),
             "Vinter_CMD": season_results.get(gren, {}).get("Vinter_CMD", np.nan),
+            "Sasong_lag": season_results.get(gren, {}).get("Sasong_lag", np.nan),
+            "Sasong_acf": season_results.get(gren, {}).get("Sasong_acf", np.nan),
         })
 
     return pd.DataFrame(profiler)
@@ -258,6 +201,7 @@ def identify_branch_characteristics(info_df, branch_df):
 
 def create_plots(branch_df, profiler_df):
     """Spara 6 individuella grafer istallet for 3x2 subplot-kluster."""
+    plt = pyplot()
     if branch_df.empty:
         print("Ingen data att visualisera.")
         return
@@ -439,14 +383,18 @@ def main():
         return
 
     print(f"Laser {len(report_files)} rapporter for grendjupanalys...\n")
+    store = FactStore(report_files)
 
     # Datainsamling
     print("1. Samlar ventil-Info (Sheet9/11)...")
-    info_df = collect_valve_info(report_files)
+    # Per manad sparas varje ventils forsta Info-text; over alla manader
+    # galler forsta manaden dar ventilen har en Info-text.
+    info_df = store.table("gren_info", collect_valve_info)
+    info_df = info_df.drop_duplicates("Ventil_ID").reset_index(drop=True)
     print(f"   {len(info_df)} ventiler med Info-text")
 
     print("2. Samlar grendata (Sheet9+11)...")
-    branch_df = collect_branch_data(report_files)
+    branch_df = collect_branch_data(store.table("ventilfakta", build_valve_facts))
     print(f"   {len(branch_df)} rader, {branch_df['Gren'].nunique()} grenar")
 
     # Analys
@@ -456,16 +404,17 @@ def main():
 
     # Spara CSV:er
     csv_path = OUTPUT_DIR / "gren_djupanalys.csv"
-    branch_df.to_csv(csv_path, index=False, encoding="utf-8-sig")
+    save_table(branch_df, csv_path)
     print(f"CSV sparad: {csv_path}")
 
     if not profiler_df.empty:
         prof_path = OUTPUT_DIR / "gren_profiler.csv"
-        profiler_df.to_csv(prof_path, index=False, encoding="utf-8-sig")
+        save_table(profiler_df, prof_path)
         print(f"CSV sparad: {prof_path}")
 
     # Graf
-    create_plots(branch_df, profiler_df)
+    if plots_enabled():
+        create_plots(branch_df, profiler_df)
 
     # Sammanfattning
     print_summary(branch_df, profiler_df, info_df)
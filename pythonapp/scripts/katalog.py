@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""Katalog över rapportfiler, indexerad på (anläggning, år, månad).
+
+Katalogträdet skannas en gång och indexet sparas i CACHE_DIR/katalog
+tillsammans med filernas fingeravtryck (storlek, mtime) och katalogernas
+mtime. Nästa gång används det sparade indexet så länge ingen katalog i
+trädet och ingen indexerad fil har ändrats — då behövs ingen ny glob.
+Katalogens mtime ändras bara när filer läggs till, tas bort eller byter
+namn; en rapport som skrivs över på plats syns bara i filens egen
+storlek och mtime, så de kontrolleras också (en stat per fil).
+
+Struktur som känns igen:
+
+    rapporter/<namn>_<månad>_<år>.xls                 anläggning ""
+    rapporter/<anläggning>/**/<namn>_<månad>_<år>.xls
+
+Exempel:
+
+    katalog = open_catalog()
+    for month_num, month_name, path in katalog.query("Norra", "2021-03", "2025-12"):
+        ...
+
+Ett CatalogQuery kan ges direkt till load_report_bundles(), FactStore
+och collect_*-funktionerna i stället för en fillista. Kör skriptet direkt
+för en översikt:
+
+    python scripts/katalog.py
+"""
+
+import hashlib
+import json
+import os
+import re
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import common
+
+INDEX_VERSION = 1
+
+FILENAME_RE = re.compile(r"_(\d{1,2})_(\d{4})\.xls$")
+
+
+@dataclass(frozen=True)
+class ReportEntry:
+    """En rapportfil i katalogen."""
+
+    facility: str
+    year: int
+    month: int
+    relpath: str
+    size: int
+    mtime_ns: int
+
+    @property
+    def key(self) -> tuple[str, int, int]:
+        return self.facility, self.year, self.month
+
+
+def _period(value, default: tuple[int, int]) -> tuple[int, int]:
+    """Tolkar "ÅÅÅÅ-MM", "ÅÅÅÅ", (år, månad) eller None till (år, månad)."""
+    if value is None:
+        return default
+    if isinstance(value, tuple):
+        return int(value[0]), int(value[1])
+    text = str(value)
+    if "-" in text:
+        year, month = text.split("-", 1)
+        return int(year), int(month)
+    # Bara år: hela året
+    return int(text), default[1]
+
+
+class CatalogQuery:
+    """Resultat av en katalogfråga, i (anläggning, år, månad, filnamn)-ordning.
+
+    Itererar som fillistan från get_report_files(): (månadsnummer,
+    månadsnamn, sökväg).
+    """
+
+    def __init__(self, root: Path, entries: list[ReportEntry]):
+        self.root = root
+        self.entries = entries
+
+    def __iter__(self):
+        for e in self.entries:
+            yield e.month, common.MANAD_NAMN[e.month], self.root / e.relpath
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __bool__(self):
+        return bool(self.entries)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return CatalogQuery(self.root, self.entries[item])
+        e = self.entries[item]
+        return e.month, common.MANAD_NAMN[e.month], self.root / e.relpath
+
+    @property
+    def facilities(self) -> list[str]:
+        return sorted({e.facility for e in self.entries})
+
+    @property
+    def years(self) -> list[int]:
+        return sorted({e.year for e in self.entries})
+
+
+class Catalog:
+    """Index över alla rapportfiler under `root`."""
+
+    def __init__(self, root: Path, entries: list[ReportEntry], dir_mtimes: dict[str, int]):
+        self.root = Path(root)
+        self.entries = sorted(entries, key=lambda e: (*e.key, Path(e.relpath).name))
+        self.dir_mtimes = dir_mtimes
+
+    @classmethod
+    def scan(cls, root: Path) -> "Catalog":
+        """Skannar katalogträdet under root."""
+        root = Path(root)
+        entries, dir_mtimes = [], {}
+        if not root.is_dir():
+            return cls(root, entries, dir_mtimes)
+
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            rel_dir = Path(dirpath).relative_to(root)
+            dir_mtimes[str(rel_dir)] = os.stat(dirpath).st_mtime_ns
+            facility = rel_dir.parts[0] if rel_dir.parts else ""
+            for name in filenames:
+                m = FILENAME_RE.search(name)
+                if not m or not 1 <= int(m.group(1)) <= 12:
+                    continue
+                stat = os.stat(os.path.join(dirpath, name))
+                entries.append(ReportEntry(
+                    facility=facility,
+                    year=int(m.group(2)),
+                    month=int(m.group(1)),
+                    relpath=str(rel_dir / name),
+                    size=stat.st_size,
+                    mtime_ns=stat.st_mtime_ns,
+                ))
+        return cls(root, entries, dir_mtimes)
+
+    def is_current(self) -> bool:
+        """Sant om ingen katalog eller indexerad fil har ändrats sedan indexet byggdes."""
+        if not self.dir_mtimes:
+            return False
+        try:
+            for rel_dir, mtime_ns in self.dir_mtimes.items():
+                if os.stat(self.root / rel_dir).st_mtime_ns != mtime_ns:
+                    return False
+            for e in self.entries:
+                stat = os.stat(self.root / e.relpath)
+                if (stat.st_size, stat.st_mtime_ns) != (e.size, e.mtime_ns):
+                    return False
+        except OSError:
+            return False
+        return True
+
+    def query(self, facility: str | None = None, start=None, end=None,
+              year: int | None = None) -> CatalogQuery:
+        """Filer för en anläggning och ett intervall (inklusive ändpunkterna).
+
+        start/end anges som "ÅÅÅÅ-MM", "ÅÅÅÅ" eller (år, månad). facility=None
+        ger alla anläggningar; year är en genväg för ett helt år.
+        """
+        if year is not None:
+            start, end = (year, 1), (year, 12)
+        lo = _period(start, (0, 1))
+        hi = _period(end, (9999, 12))
+        selected = [
+            e for e in self.entries
+            if (facility is None or e.facility == facility) and lo <= (e.year, e.month) <= hi
+        ]
+        return CatalogQuery(self.root, selected)
+
+    # --- Persistens ---------------------------------------------------------
+
+    def to_json(self) -> dict:
+        return {
+            "version": INDEX_VERSION,
+            "root": str(self.root),
+            "dir_mtimes": self.dir_mtimes,
+            "entries": [asdict(e) for e in self.entries],
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "Catalog":
+        entries = [ReportEntry(**e) for e in data["entries"]]
+        return cls(Path(data["root"]), entries, data["dir_mtimes"])
+
+
+def index_path(root: Path) -> Path:
+    key = hashlib.sha256(str(Path(root).resolve()).encode()).hexdigest()[:12]
+    return common.CACHE_DIR / "katalog" / f"{key}.json"
+
+
+def _load_index(root: Path) -> Catalog | None:
+    path = index_path(root)
+    if not common.CACHE_ENABLED or not path.exists():
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != INDEX_VERSION:
+            return None
+        return Catalog.from_json(data)
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _save_index(catalog: Catalog):
+    if not common.CACHE_ENABLED:
+        return
+    path = index_path(catalog.root)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(catalog.to_json(), f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+_CATALOGS: dict[str, Catalog] = {}
+
+
+def open_catalog(root: Path | None = None, rescan: bool = False) -> Catalog:
+    """Katalogen för root (standard RAPPORT_DIR).
+
+    Återanvänder i tur och ordning: katalogen i minnet, det sparade indexet
+    och först därefter en ny skanning — så länge trädet inte har ändrats.
+    """
+    root = Path(root or common.RAPPORT_DIR)
+    key = str(root.resolve())
+    catalog = None if rescan else _CATALOGS.get(key)
+    if catalog is not None and catalog.is_current():
+        return catalog
+
+    catalog = None if rescan else _load_index(root)
+    if catalog is None or catalog.root != root or not catalog.is_current():
+        catalog = Catalog.scan(root)
+        _save_index(catalog)
+    _CATALOGS[key] = catalog
+    return catalog
+
+
+def print_catalog(catalog: Catalog):
+    """Översikt: antal filer och intervall per anläggning och år."""
+    print("=" * 60)
+    print(f"RAPPORTKATALOG — {catalog.root}")
+    print("=" * 60)
+    facilities = sorted({e.facility for e in catalog.entries})
+    for facility in facilities:
+        q = catalog.query(facility)
+        print(f"\n{facility or '(rotkatalogen)'}: {len(q)} filer")
+        for year in q.years:
+            months = [e.month for e in q.entries if e.year == year]
+            print(f"  {year}: {len(months)} filer, månad {min(months)}–{max(months)}")
+    print()
+
+
+def main():
+    print_catalog(open_catalog(rescan=True))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Korrelationer mellan alla par av nyckeltal i en tabell.
+
+Indata är en tabell månad × KPI (en kolumn per nyckeltal, NaN där
+värdet saknas). Pearson och Spearman räknas för alla par på en gång:
+
+    r, p, n = correlation_matrix(kpi, "spearman")
+    par = top_pairs(kpi, k=25)
+
+Varje par använder de månader där båda nyckeltalen har värden
+(parvis borttagning, som pandas DataFrame.corr). Alla par räknas i ett
+svep över en KPI × KPI × månad-tensor med parets gemensamma månader som
+mask; för Spearman rangordnas varje nyckeltal om inom parets månader
+(medelrang vid lika värden). Minnet växer som KPI² × månader, vilket är
+litet för några hundra nyckeltal och ett par års månader. p-värdena
+bygger på t-fördelningen med n − 2 frihetsgrader, som i
+scipy.stats.pearsonr/spearmanr.
+"""
+
+import numpy as np
+import pandas as pd
+
+MIN_PERIODS = 3
+PAIR_COLUMNS = ["KPI_1", "KPI_2", "n", "pearson_r", "pearson_p", "spearman_r",
+                "spearman_p", "q_varde", "tolkning"]
+
+
+def interpret(r: float) -> str:
+    """Styrka och riktning för en korrelationskoefficient, t.ex. "stark positiv"."""
+    if abs(r) > 0.7:
+        tolkning = "stark"
+    elif abs(r) > 0.4:
+        tolkning = "mattlig"
+    else:
+        tolkning = "svag"
+    riktning = "positiv" if r > 0 else "negativ"
+    return f"{tolkning} {riktning}"
+
+
+def _pairwise_ranks(values: np.ndarray, present: np.ndarray) -> np.ndarray:
+    """Rang för kolumn i inom de månader där kolumn j finns: (i, j, månad).
+
+    Rangen är 1 + antal mindre värden + hälften av övriga lika värden,
+    dvs. medelrang vid lika värden, räknat bland parets gemensamma månader.
+    """
+    x = values.T  # KPI × månad
+    with np.errstate(invalid="ignore"):
+        less = (x[:, None, :] < x[:, :, None]).astype(float)
+        ties = (x[:, None, :] == x[:, :, None]).astype(float)
+    smaller = less + 0.5 * ties - 0.5 * np.eye(x.shape[1])  # (i, t, s), utan s == t
+    return 1.0 + np.einsum("its,sj->ijt", smaller, present.astype(float))
+
+
+def correlation_matrix(data: pd.DataFrame, method: str = "pearson",
+                       min_periods: int = MIN_PERIODS):
+    """(r, p, n) som KPI × KPI-tabeller för method "pearson" eller "spearman".
+
+    n är antalet månader som paret delar. Par med färre än min_periods
+    månader, och nyckeltal utan variation, får r = p = NaN.
+    """
+    from scipy import special
+
+    if method not in ("pearson", "spearman"):
+        raise ValueError(f"Okänd metod: {method}")
+    values = data.to_numpy(dtype=float)
+    present = ~np.isnan(values)
+    both = present.T[:, None, :] & present.T[None, :, :]  # (i, j, månad)
+    n = both.sum(axis=2)
+
+    if method == "spearman":
+        a = _pairwise_ranks(values, present)
+        b = a.transpose(1, 0, 2)
+    else:
+        filled = np.nan_to_num(values.T)
+        a, b = filled[:, None, :], filled[None, :, :]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        da = np.where(both, a - (a * both).sum(axis=2, keepdims=True) / n[..., None], 0.0)
+        db = np.where(both, b - (b * both).sum(axis=2, keepdims=True) / n[..., None], 0.0)
+        norm = np.sqrt((da ** 2).sum(axis=2) * (db ** 2).sum(axis=2))
+        r = np.clip((da * db).sum(axis=2) / norm, -1.0, 1.0)
+        r[(norm == 0) | (n < min_periods)] = np.nan
+
+        dof = n - 2
+        t = r * np.sqrt(dof / ((1.0 - r) * (1.0 + r)))
+        p = np.where(np.abs(r) == 1, 0.0, 2 * special.stdtr(np.maximum(dof, 1), -np.abs(t)))
+    p[np.isnan(r)] = np.nan
+
+    index = data.columns
+    return (pd.DataFrame(r, index=index, columns=index),
+            pd.DataFrame(p, index=index, columns=index),
+            pd.DataFrame(n, index=index, columns=index))
+
+
+def _benjamini_hochberg(p: np.ndarray) -> np.ndarray:
+    """q-värden (false discovery rate) för p-värden som testats tillsammans."""
+    m = len(p)
+    if m == 0:
+        return p
+    order = np.argsort(p)
+    ranked = p[order] * m / np.arange(1, m + 1)
+    q = np.minimum.accumulate(ranked[::-1])[::-1]
+    result = np.empty(m)
+    result[order] = np.minimum(q, 1.0)
+    return result
+
+
+def top_pairs(data: pd.DataFrame, k: int | None = 25,
+              min_periods: int = MIN_PERIODS) -> pd.DataFrame:
+    """De k starkaste paren (störst |Pearson r|), en rad per par.
+
+    q_varde är Benjamini–Hochberg-justerat Pearson-p över alla par som
+    gick att räkna: med många nyckeltal blir några par starka av en
+    slump, och q_varde visar hur troligt det är. k=None ger alla par.
+    """
+    pearson_r, pearson_p, n = correlation_matrix(data, "pearson", min_periods)
+    spearman_r, spearman_p, _ = correlation_matrix(data, "spearman", min_periods)
+
+    i, j = np.triu_indices(len(data.columns), k=1)
+    pairs = pd.DataFrame({
+        "KPI_1": data.columns[i], "KPI_2": data.columns[j],
+        "n": n.to_numpy()[i, j],
+        "pearson_r": pearson_r.to_numpy()[i, j], "pearson_p": pearson_p.to_numpy()[i, j],
+        "spearman_r": spearman_r.to_numpy()[i, j], "spearman_p": spearman_p.to_numpy()[i, j],
+    })
+    pairs = pairs[pairs["pearson_r"].notna()].reset_index(drop=True)
+    pairs["q_varde"] = _benjamini_hochberg(pairs["pearson_p"].to_numpy())
+    pairs["tolkning"] = pairs["pearson_r"].map(interpret)
+
+    order = pairs["pearson_r"].abs().sort_values(ascending=False, kind="stable").index
+    pairs = pairs.loc[order].reset_index(drop=True)
+    if k is not None:
+        pairs = pairs.head(k)
+    for col in ("pearson_r", "spearman_r"):
+        pairs[col] = pairs[col].round(4)
+    for col in ("pearson_p", "spearman_p", "q_varde"):
+        pairs[col] = pairs[col].round(6)
+    return pairs[PAIR_COLUMNS]
@@ -11,43 +11,45 @@ Output:
 """
 
 import pandas as pd
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
 
 from common import (
     OUTPUT_DIR,
     get_report_files,
-    read_sheet,
+    load_report_bundles,
     ensure_output_dir,
+    as_bundles,
+    save_table,
+    plots_enabled,
+    pyplot,
 )
 
 
-def collect_alarm_data(report_files):
+def collect_alarm_data(bundles):
     """Samlar larmdata per kategori och månad från Sheet13."""
     rows = []
-    for month_num, month_name, filepath in report_files:
-        df = read_sheet(filepath, "Sheet13", header_row=7)
+    for bundle in as_bundles(bundles):
+        df = bundle.sheet("Sheet13")
+        schema = bundle.schema("Sheet13")
 
-        cat_col = [c for c in df.columns if "alarm" in c.lower() or "category" in c.lower()]
-        current_col = [c for c in df.columns if "current" in c.lower() or "period" in c.lower()]
-        avg_col = [c for c in df.columns if "average" in c.lower() or "previous" in c.lower()]
+        cat_col = schema.col("category")
+        current_col = schema.col("current")
+        avg_col = schema.col("average")
 
         if not cat_col or not current_col:
             continue
 
         for _, row in df.iterrows():
-            category = str(row[cat_col[0]]).strip()
+            category = str(row[cat_col]).strip()
             if not category or category == "nan":
                 continue
 
-            current = pd.to_numeric(row[current_col[0]], errors="coerce")
-            avg = pd.to_numeric(row[avg_col[0]], errors="coerce") if avg_col else None
+            current = pd.to_numeric(row[current_col], errors="coerce")
+            avg = pd.to_numeric(row[avg_col], errors="coerce") if avg_col else None
 
             if pd.notna(current):
                 entry = {
-                    "Månad_nr": month_num,
-                    "Månad": month_name,
+                    "Månad_nr": bundle.month_num,
+                    "Månad": bundle.month_name,
                     "Kategori": category,
                     "Aktuell_period": int(current),
                 }
@@ -75,12 +77,13 @@ def create_summary_csv(alarm_df):
     pivot.columns.name = None
 
     output_path = OUTPUT_DIR / "larm.csv"
-    pivot.to_csv(output_path, index=False, encoding="utf-8-sig")
+    save_table(pivot, output_path)
     return pivot
 
 
 def create_plots(alarm_df):
     """Skapar larmgraf: kategorier per månad vs föregående snitt."""
+    plt = pyplot()
     fig, ax = plt.subplots(figsize=(12, 6))
     fig.suptitle("Larmöversikt — Sopsuganläggningen 2025", fontsize=14, fontweight="bold")
 
@@ -174,13 +177,16 @@ def main():
         return
 
     print(f"Läser {len(report_files)} rapporter...")
+    bundles = load_report_bundles(report_files)
 
-    alarm_df = collect_alarm_data(report_files)
+    alarm_df = collect_alarm_data(bundles)
 
     create_summary_csv(alarm_df)
     print(f"CSV sparad: {OUTPUT_DIR / 'larm.csv'}")
 
-    if not alarm_df.empty:
+    if not plots_enabled():
+        print("Grafer avstängda — hoppar över graf.")
+    elif not alarm_df.empty:
         plot_path = create_plots(alarm_df)
         print(f"Graf sparad: {plot_path}")
     else:
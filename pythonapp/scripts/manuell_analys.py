@@ -22,113 +22,59 @@ Output:
 
 import numpy as np
 import pandas as pd
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
-from scipy import stats
 
 from common import (
     OUTPUT_DIR,
     MANAD_NAMN,
     get_report_files,
-    read_sheet,
-    parse_valve_id,
+    FactStore,
     ensure_output_dir,
+    as_bundles,
+    save_table,
+    plots_enabled,
+    pyplot,
 )
+from ventilfakta import build_valve_facts
 
 
-def discover_columns(report_files):
+def discover_columns(bundles):
     """Loggar alla kolumner i Sheet9 och Sheet11 fran forsta filen."""
-    _, _, filepath = report_files[0]
-    for sheet, hdr in [("Sheet9", 3), ("Sheet11", 3)]:
-        df = read_sheet(filepath, sheet, header_row=hdr)
+    for sheet in ["Sheet9", "Sheet11"]:
+        df = as_bundles(bundles[:1])[0].sheet(sheet)
         print(f"  {sheet} kolumner: {list(df.columns)}")
 
 
-def collect_manual_data(report_files):
-    """Samlar MAN_OPEN_CMD, AUTO_OPEN_CMD och INLET_OPEN per ventil per manad.
+def collect_manual_data(facts):
+    """MAN_OPEN_CMD, AUTO_OPEN_CMD och INLET_OPEN per ventil per manad.
 
-    Anvander Sheet9 (kommandon) och Sheet11 (tillganglighet).
+    Vy ur ventilfaktatabellen: alla ventiler i Sheet9 (i Sheet9-ordning)
+    med tillganglighet fran Sheet11 dar den finns.
     """
-    rows = []
-    for month_num, month_name, filepath in report_files:
-        # Sheet9: kommandodetaljer
-        df9 = read_sheet(filepath, "Sheet9", header_row=3)
-        id_col9 = [c for c in df9.columns if c.lower() == "id"]
-        if not id_col9:
-            continue
-
-        # Hitta relevanta kolumner (case-insensitive)
-        col_map9 = {}
-        for c in df9.columns:
-            cl = c.strip().upper()
-            if cl == "MAN_OPEN_CMD":
-                col_map9["man_cmd"] = c
-            elif cl == "AUTO_OPEN_CMD":
-                col_map9["auto_cmd"] = c
-            elif cl == "INLET_OPEN":
-                col_map9["inlet_open"] = c
-
-        # Sheet11: tillganglighet + ev. extra data
-        df11 = read_sheet(filepath, "Sheet11", header_row=3)
-        avail_col = [c for c in df11.columns if "availability" in c.lower()]
-        id_col11 = "ID" if "ID" in df11.columns else None
-
-        # Bygg tillganglighets-lookup
-        avail_lookup = {}
-        if avail_col and id_col11:
-            for _, r11 in df11.iterrows():
-                vid = str(r11[id_col11]).strip()
-                if vid and vid != "nan":
-                    v = pd.to_numeric(r11[avail_col[0]], errors="coerce")
-                    if pd.notna(v):
-                        avail_lookup[vid] = v
-
-        for _, row in df9.iterrows():
-            vid = str(row[id_col9[0]]).strip()
-            if not vid or vid == "nan":
-                continue
-
-            man_cmd = pd.to_numeric(row.get(col_map9.get("man_cmd", ""), 0), errors="coerce")
-            auto_cmd = pd.to_numeric(row.get(col_map9.get("auto_cmd", ""), 0), errors="coerce")
-            inlet = pd.to_numeric(row.get(col_map9.get("inlet_open", ""), 0), errors="coerce")
-
-            man_cmd = int(man_cmd) if pd.notna(man_cmd) else 0
-            auto_cmd = int(auto_cmd) if pd.notna(auto_cmd) else 0
-            inlet = int(inlet) if pd.notna(inlet) else 0
-
-            total_cmd = man_cmd + auto_cmd
-            man_andel = (man_cmd / total_cmd * 100) if total_cmd > 0 else 0
-
-            try:
-                gren, ventilnr = parse_valve_id(vid)
-            except (ValueError, IndexError):
-                gren, ventilnr = -1, -1
-
-            rows.append({
-                "Manad_nr": month_num,
-                "Manad": month_name,
-                "Ventil_ID": vid,
-                "Gren": gren,
-                "MAN_OPEN_CMD": man_cmd,
-                "AUTO_OPEN_CMD": auto_cmd,
-                "INLET_OPEN": inlet,
-                "Total_CMD": total_cmd,
-                "Manuell_andel_%": round(man_andel, 2),
-                "Tillganglighet": avail_lookup.get(vid, np.nan),
-            })
-
-    return pd.DataFrame(rows)
-
-
-def collect_operation_time(report_files):
+    v = facts[facts["I_Sheet9"]].sort_values(["Manad_nr", "Rad9"], kind="stable")
+    total = v["MAN_OPEN_CMD"] + v["AUTO_OPEN_CMD"]
+    andel = (v["MAN_OPEN_CMD"] / total.where(total > 0) * 100).round(2).fillna(0)
+    return pd.DataFrame({
+        "Manad_nr": v["Manad_nr"],
+        "Manad": v["Manad"],
+        "Ventil_ID": v["Ventil_ID"],
+        "Gren": v["Gren"],
+        "MAN_OPEN_CMD": v["MAN_OPEN_CMD"],
+        "AUTO_OPEN_CMD": v["AUTO_OPEN_CMD"],
+        "INLET_OPEN": v["INLET_OPEN"],
+        "Total_CMD": total,
+        "Manuell_andel_%": andel,
+        "Tillganglighet": v["Tillganglighet"],
+    }).reset_index(drop=True)
+
+
+def collect_operation_time(bundles):
     """Samlar total drifttid per manad fran Sheet3."""
     rows = []
-    for month_num, month_name, filepath in report_files:
-        df = read_sheet(filepath, "Sheet3", header_row=3)
-        time_col = [c for c in df.columns if "operation" in c.lower() or "time" in c.lower()]
-        op_time = pd.to_numeric(df[time_col[0]], errors="coerce").sum() if time_col else 0
-        rows.append({"Manad_nr": month_num, "Manad": month_name, "Drifttid_h": round(op_time, 1)})
+    for bundle in as_bundles(bundles):
+        df = bundle.sheet("Sheet3")
+        time_col = bundle.schema("Sheet3").col("operation_time")
+        op_time = pd.to_numeric(df[time_col], errors="coerce").sum() if time_col else 0
+        rows.append({"Manad_nr": bundle.month_num, "Manad": bundle.month_name, "Drifttid_h": round(op_time, 1)})
     return pd.DataFrame(rows)
 
 
@@ -209,6 +155,8 @@ def compute_branch_manual(manual_df):
 
 def create_plots(monthly_df, valve_summary, branch_df, manual_df):
     """Skapar 4 individuella grafer for manuell analys."""
+    from scipy import stats
+    plt = pyplot()
     months = monthly_df["Manad"].values
 
     # 1. Manuella vs automatiska per manad (stacked bar + linje for MAN/drifttimme)
@@ -318,6 +266,7 @@ def create_plots(monthly_df, valve_summary, branch_df, manual_df):
 
 def print_summary(monthly_df, valve_summary, branch_df):
     """Textsammanfattning."""
+    from scipy import stats
     print("\n" + "=" * 60)
     print("MANUELL ANALYS -- Sammanfattning 2025")
     print("=" * 60)
@@ -416,18 +365,19 @@ def main():
         return
 
     print(f"Laser {len(report_files)} rapporter for manuell analys...\n")
+    store = FactStore(report_files)
 
     # Kolumninfo
     print("Kolumner i data:")
-    discover_columns(report_files)
+    discover_columns(store.bundles(report_files[:1]))
 
     # Datainsamling
     print("\nSamlar manuell/automatisk data (Sheet9+11)...")
-    manual_df = collect_manual_data(report_files)
+    manual_df = collect_manual_data(store.table("ventilfakta", build_valve_facts))
     print(f"  {len(manual_df)} rader, {manual_df['Ventil_ID'].nunique()} ventiler")
 
     print("Samlar drifttid (Sheet3)...")
-    time_df = collect_operation_time(report_files)
+    time_df = store.table("manuell_drifttid", collect_operation_time)
 
     # Berakningar
     print("\nBeraknar KPI:er...")
@@ -441,15 +391,16 @@ def main():
 
     # Spara
     csv_path = OUTPUT_DIR / "manuell_analys.csv"
-    monthly_df.to_csv(csv_path, index=False, encoding="utf-8-sig")
+    save_table(monthly_df, csv_path)
     print(f"\nCSV sparad: {csv_path}")
 
     valve_csv = OUTPUT_DIR / "manuell_ventiler.csv"
-    valve_summary.to_csv(valve_csv, index=False, encoding="utf-8-sig")
+    save_table(valve_summary, valve_csv)
     print(f"CSV sparad: {valve_csv}")
 
     # Graf
-    create_plots(monthly_df, valve_summary, branch_df, manual_df)
+    if plots_enabled():
+        create_plots(monthly_df, valve_summary, branch_df, manual_df)
 
     # Sammanfattning
     print_summary(monthly_df, valve_summary, branch_df)
@@ -37,10 +37,7 @@ def find_header_row(sheet) -> tuple[int | None, list[str]]:
     """
     max_search = min(10, sheet.nrows)
     for row_idx in range(max_search):
-        values = [
-            str(sheet.cell_value(row_idx, col)).strip()
-            for col in range(sheet.ncols)
-        ]
+        values = [str(v).strip() for v in sheet.row_values(row_idx)]
         # Räkna icke-tomma textvärden
         non_empty = [v for v in values if v]
         if len(non_empty) >= 2:
@@ -50,19 +47,19 @@ def find_header_row(sheet) -> tuple[int | None, list[str]]:
 
 def get_sheet_metadata(filepath: Path) -> list[dict]:
     """Extraherar arkmetadata: namn, dimensioner, kolumnrubriker."""
-    workbook = xlrd.open_workbook(str(filepath))
     sheets = []
 
-    for sheet in workbook.sheets():
-        header_row, headers = find_header_row(sheet)
-
-        sheets.append({
-            "arknamn": sheet.name,
-            "antal_rader": sheet.nrows,
-            "antal_kolumner": sheet.ncols,
-            "rubrik_rad": header_row,
-            "kolumnrubriker": headers,
-        })
+    with xlrd.open_workbook(str(filepath)) as workbook:
+        for sheet in workbook.sheets():
+            header_row, headers = find_header_row(sheet)
+
+            sheets.append({
+                "arknamn": sheet.name,
+                "antal_rader": sheet.nrows,
+                "antal_kolumner": sheet.ncols,
+                "rubrik_rad": header_row,
+                "kolumnrubriker": headers,
+            })
 
     return sheets
 
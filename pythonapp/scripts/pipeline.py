@@ -0,0 +1,720 @@
+#!/usr/bin/env python3
+"""Pipeline — kör alla analyser i en process, i beroendeordning.
+
+Stegen och deras beroenden deklareras i STAGES. Varje steg är ett
+analysskript vars main() körs i samma process; inlästa rapportfiler och
+faktatabeller delas mellan stegen (se common.share_datasets), så varje
+fil tolkas bara en gång per körning. Tiden för varje steg och total tid
+skrivs ut när körningen är klar.
+
+Mål kan anges som steg eller som utdatafiler: output/rekommendationer.json
+eller gren_ranking.png löses upp till steget som skapar filen (enligt
+stegens `outputs`), och bara det steget och dess beroenden körs. Beroenden
+vars indata inte har ändrats återanvänds (se nedan).
+
+Med --jobs N körs oberoende steg parallellt i N arbetsprocesser; ett
+steg startar så fort alla dess beroenden är klara. Stegens utskrifter
+samlas upp och skrivs ut när steget är klart, så de inte blandas. N
+begränsas till antalet kärnor och till antalet steg som kan köras
+samtidigt; blir det 1 körs stegen sekventiellt med delad data.
+
+Ett steg hoppas över när dess indata inte har ändrats sedan förra
+körningen. Indata sammanfattas i ett fingeravtryck: rapportfilernas
+SHA-256 (för steg som läser rapporterna), beroendenas utdatafiler,
+källkoden för steget och de gemensamma modulerna samt parametrar som
+rapportår och läsarversion. Fingeravtrycket och stegets utdatafiler
+sparas i output/.pipeline/<steg>.json. --force kör alla steg ändå.
+
+Under körningen skrivs en kontrollpunkt, output/.pipeline/checkpoint.json,
+med status per steg (väntar/klar/misslyckades). Avbryts körningen
+fortsätter --resume från första misslyckade eller inaktuella steg med
+samma steg och flaggor som förra gången; steg som redan blev klara och
+fortfarande är aktuella återanvänds, även efter en körning med --force.
+Med --jobs får steg som redan körs när ett annat steg misslyckas köra
+klart, så att deras status hamnar i kontrollpunkten.
+
+--watch bevakar rapportkatalogen och kör pipelinen igen när .xls-filer
+tillkommer eller ändras. Katalogen avläses med jämna mellanrum (storlek
+och mtime per fil); en ändring räknas först när filerna har varit
+oförändrade i --debounce sekunder, så att halvskrivna filer inte läses.
+Bara nya filer tolkas och bara steg vars indata ändrats körs om.
+
+--no-plots kör bara beräkningarna: inga grafer ritas, matplotlib
+importeras aldrig och steg som bara består av grafer (dashboard,
+PDF-rapporten) hoppas över.
+
+Varje körning skriver output/run_trace.json med väggtid, CPU-tid och
+topp-RSS per steg (och per delsteg i de steg som mäter sina delar, se
+sparning.py), i Chrome-traceformat för chrome://tracing eller Perfetto.
+
+Användning:
+
+    python scripts/pipeline.py                    # alla steg
+    python scripts/pipeline.py dashboard          # dashboard + dess beroenden
+    python scripts/pipeline.py output/rekommendationer.json   # det som filen kräver
+    python scripts/pipeline.py --jobs 4           # upp till fyra steg samtidigt
+    python scripts/pipeline.py --force            # kör om även oförändrade steg
+    python scripts/pipeline.py --no-csv           # bara typade .npz-tabeller
+    python scripts/pipeline.py --no-plots rekommendationer   # bara beräkningar
+    python scripts/pipeline.py --resume           # fortsätt en avbruten körning
+    python scripts/pipeline.py --watch            # bygg om när nya rapporter kommer
+"""
+
+import argparse
+import hashlib
+import importlib
+import io
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import redirect_stdout
+from dataclasses import dataclass
+from fnmatch import fnmatch
+from pathlib import Path
+
+import common
+import sparning
+
+# Gemensamma moduler vars källkod ingår i varje stegs fingeravtryck
+LIBRARY_MODULES = ("common", "schema", "metadata", "katalog", "ventilfakta", "sparning",
+                   "anomalier", "sasong", "korrelation")
+
+TRACE_FILE = "run_trace.json"
+
+
+@dataclass(frozen=True)
+class Stage:
+    """Ett analyssteg: modul vars main() körs, och steg som måste köras före.
+
+    `outputs` är filmönster (glob) i OUTPUT_DIR för stegets utdata.
+    `reads_reports` anger att steget läser rapportfilerna direkt.
+    `plots_only` anger att steget bara ritar (hoppas över med --no-plots).
+    `history_years` är antal tidigare års rapporter som steget också läser.
+    """
+
+    name: str
+    title: str
+    deps: tuple[str, ...] = ()
+    outputs: tuple[str, ...] = ()
+    reads_reports: bool = False
+    plots_only: bool = False
+    history_years: int = 0
+
+    @property
+    def module(self) -> str:
+        return self.name
+
+
+STAGES = [
+    Stage("energi_drift", "Energi & drift",
+          outputs=("energi_drift.*",), reads_reports=True),
+    Stage("ventiler", "Ventiler",
+          outputs=("ventiler.*",), reads_reports=True),
+    Stage("larm", "Larm",
+          outputs=("larm.*",), reads_reports=True),
+    Stage("dashboard", "Dashboard", deps=("energi_drift", "ventiler", "larm"),
+          outputs=("dashboard.png",), plots_only=True),
+    Stage("sammanfattning", "Sammanfattning (Sheet1 discovery)",
+          outputs=("sammanfattning.*", "sammanfattning_kpi_lista.*"), reads_reports=True),
+    Stage("fraktion_analys", "Fraktionsanalys",
+          outputs=("fraktion_*",), reads_reports=True),
+    Stage("gren_djupanalys", "Grendjupanalys",
+          outputs=("gren_*",), reads_reports=True),
+    Stage("manuell_analys", "Manuella körningar",
+          outputs=("manuell_*",), reads_reports=True),
+    Stage("trendanalys", "Trendanalys",
+          outputs=("trend_*",), reads_reports=True, history_years=1),
+    Stage("rekommendationer", "Rekommendationer", deps=("trendanalys",),
+          outputs=("rekommendationer.*", "kpi_mal.*", "operatorsagenda.txt")),
+    Stage("drifterfarenheter", "Drifterfarenheter", deps=("trendanalys", "manuell_analys"),
+          outputs=("drifterfarenheter.*",)),
+    Stage("rapport_pdf", "PDF-rapport", deps=(
+        "energi_drift", "ventiler", "larm", "dashboard", "sammanfattning",
+        "fraktion_analys", "gren_djupanalys", "manuell_analys", "trendanalys",
+        "rekommendationer", "drifterfarenheter",
+    ), outputs=("rapport_2025.pdf",), plots_only=True),
+]
+
+
+def execution_order(stages: list[Stage], targets=None) -> list[Stage]:
+    """Stegen i körordning: beroenden först, annars deklarationsordning.
+
+    Med `targets` tas bara de stegen och deras (transitiva) beroenden med.
+    ValueError vid okänt steg eller cykliskt beroende.
+    """
+    by_name = {s.name: s for s in stages}
+    for stage in stages:
+        for dep in stage.deps:
+            if dep not in by_name:
+                raise ValueError(f"{stage.name}: okänt beroende '{dep}'")
+
+    wanted = set(by_name)
+    if targets:
+        unknown = [t for t in targets if t not in by_name]
+        if unknown:
+            raise ValueError(f"Okända steg: {', '.join(unknown)}")
+        wanted, todo = set(), list(targets)
+        while todo:
+            name = todo.pop()
+            if name not in wanted:
+                wanted.add(name)
+                todo.extend(by_name[name].deps)
+
+    order, done = [], set()
+    remaining = [s for s in stages if s.name in wanted]
+    while remaining:
+        ready = [s for s in remaining if all(d in done for d in s.deps)]
+        if not ready:
+            names = ", ".join(s.name for s in remaining)
+            raise ValueError(f"Cykliskt beroende mellan: {names}")
+        stage = ready[0]
+        order.append(stage)
+        done.add(stage.name)
+        remaining.remove(stage)
+    return order
+
+
+def resolve_target(stages: list[Stage], target: str) -> str:
+    """Stegnamnet för ett mål: ett steg eller en utdatafil (t.ex. output/x.json).
+
+    ValueError om inget eller flera steg skapar filen.
+    """
+    if any(s.name == target for s in stages):
+        return target
+    name = Path(target).name
+    producers = [s.name for s in stages if any(fnmatch(name, pat) for pat in s.outputs)]
+    if not producers:
+        raise ValueError(f"Okänt mål: {target} (varken steg eller utdata från ett steg)")
+    if len(producers) > 1:
+        raise ValueError(f"{target} matchar utdata från flera steg: {', '.join(producers)}")
+    return producers[0]
+
+
+def run_stage(stage: Stage):
+    """Kör stegets main() i den egna processen, mätt i ett span."""
+    with sparning.span(stage.name, cat="steg", titel=stage.title) as span:
+        importlib.import_module(stage.module).main()
+        span["utdatafiler"] = len(stage_outputs(stage))
+
+
+def _skipped_span(stage: Stage):
+    """Markerar ett överhoppat steg i spårningen."""
+    with sparning.span(stage.name, cat="steg", titel=stage.title, hoppades_over=True):
+        pass
+
+
+def trace_path() -> Path:
+    return common.OUTPUT_DIR / TRACE_FILE
+
+
+# ---------------------------------------------------------------------------
+# Fingeravtryck och tillstånd
+# ---------------------------------------------------------------------------
+
+def stage_outputs(stage: Stage) -> list[Path]:
+    """Stegets befintliga utdatafiler i OUTPUT_DIR."""
+    files = set()
+    for pattern in stage.outputs:
+        files.update(p for p in common.OUTPUT_DIR.glob(pattern) if p.is_file())
+    return sorted(files)
+
+
+def _hash_files(paths) -> dict[str, str]:
+    return {p.name: common.file_sha256(p) for p in paths}
+
+
+def _source_hash(module_name: str) -> str:
+    path = getattr(importlib.import_module(module_name), "__file__", None)
+    return common.file_sha256(Path(path)) if path else ""
+
+
+def stage_fingerprint(stage: Stage, by_name: dict[str, Stage]) -> str:
+    """Fingeravtryck av allt steget läser: rapporter, beroendens utdata, kod, parametrar."""
+    inputs = {
+        "code": {m: _source_hash(m) for m in (stage.module, *LIBRARY_MODULES)},
+        "params": {"year": common.REPORT_YEAR, "reader": common.READER_VERSION,
+                   "csv": common.CSV_EXPORT, "plots": common.PLOTS_ENABLED},
+        "reports": [],
+        "upstream": {dep: _hash_files(stage_outputs(by_name[dep])) for dep in stage.deps},
+    }
+    if stage.reads_reports:
+        years = range(common.REPORT_YEAR - stage.history_years, common.REPORT_YEAR + 1)
+        inputs["reports"] = [
+            [str(path), common.file_sha256(Path(path))]
+            for year in years for _, _, path in common.get_report_files(year=year)
+        ]
+    blob = json.dumps(inputs, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(blob).hexdigest()
+
+
+def state_path(stage: Stage) -> Path:
+    return common.OUTPUT_DIR / ".pipeline" / f"{stage.name}.json"
+
+
+def is_up_to_date(stage: Stage, fingerprint: str) -> bool:
+    """Sant om steget senast kördes med samma indata och utdata är orörda."""
+    try:
+        with open(state_path(stage), encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if state.get("fingerprint") != fingerprint:
+        return False
+    return state.get("outputs") == _hash_files(stage_outputs(stage))
+
+
+def record_stage(stage: Stage, fingerprint: str):
+    """Sparar fingeravtrycket och utdatafilernas hashar efter en körning."""
+    path = state_path(stage)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    state = {"fingerprint": fingerprint, "outputs": _hash_files(stage_outputs(stage))}
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def _stale_fingerprint(stage: Stage, by_name: dict[str, Stage], force: bool) -> str | None:
+    """Stegets fingeravtryck om det behöver köras, annars None."""
+    fingerprint = stage_fingerprint(stage, by_name)
+    if not force and is_up_to_date(stage, fingerprint):
+        return None
+    return fingerprint
+
+
+class Checkpoint:
+    """Kontrollpunkt för en körning: steg, flaggor och status per steg.
+
+    Sparas i output/.pipeline/checkpoint.json efter varje statusändring.
+    """
+
+    PENDING, DONE, FAILED = "väntar", "klar", "misslyckades"
+
+    def __init__(self, stages: list[str], targets=None, force: bool = False):
+        self.stages = list(stages)
+        self.targets = list(targets or [])
+        self.force = force
+        self.status = {name: self.PENDING for name in self.stages}
+        self.error = None
+
+    @staticmethod
+    def path() -> Path:
+        return common.OUTPUT_DIR / ".pipeline" / "checkpoint.json"
+
+    @classmethod
+    def load(cls) -> "Checkpoint | None":
+        try:
+            with open(cls.path(), encoding="utf-8") as f:
+                data = json.load(f)
+            checkpoint = cls(data["stages"], data["targets"], data["force"])
+            checkpoint.status.update(data["status"])
+            checkpoint.error = data.get("error")
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        return checkpoint
+
+    @property
+    def completed(self) -> set[str]:
+        return {name for name, status in self.status.items() if status == self.DONE}
+
+    def mark(self, name: str, status: str, error: BaseException | None = None):
+        self.status[name] = status
+        if error is not None:
+            self.error = {"steg": name, "fel": f"{type(error).__name__}: {error}"}
+        self.save()
+
+    def save(self):
+        path = self.path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = {"stages": self.stages, "targets": self.targets, "force": self.force,
+                "status": self.status, "error": self.error}
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+
+
+# ---------------------------------------------------------------------------
+# Körning
+# ---------------------------------------------------------------------------
+
+def usable_cpus() -> int:
+    """Antal kärnor som processen får köra på."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # inte Linux
+        return os.cpu_count() or 1
+
+
+def max_parallel(order: list[Stage]) -> int:
+    """Största antalet steg som kan köras samtidigt (steg per beroendenivå)."""
+    level = {}
+    for stage in order:
+        level[stage.name] = 1 + max((level.get(d, 0) for d in stage.deps), default=0)
+    counts = {}
+    for lvl in level.values():
+        counts[lvl] = counts.get(lvl, 0) + 1
+    return max(counts.values(), default=0)
+
+
+def effective_jobs(order: list[Stage], jobs: int) -> int:
+    """Antal processer som lönar sig för stegen, högst `jobs`.
+
+    Fler processer än kärnor, eller än steg som kan köras samtidigt, gör
+    körningen långsammare: parallella steg delar inte inläst data och
+    läser därför rapporterna var för sig. 1 betyder sekventiellt i den
+    egna processen.
+    """
+    return max(1, min(jobs, usable_cpus(), max_parallel(order)))
+
+
+def _run_stage_task(stage: Stage, ingest_workers: int) -> tuple[float, str, list[dict]]:
+    """Arbetsfunktion för processpoolen: kör steget.
+
+    Returnerar (tid, utskrift, spans).
+    """
+    common.INGEST_WORKERS = ingest_workers
+    if common._SHARED is None:
+        # Arbetsprocessen återanvänds mellan steg; minnet delas mellan dem
+        common.share_datasets()
+    # Spans som ärvts från huvudprocessen vid fork hör inte till steget
+    sparning.take_events()
+    out = io.StringIO()
+    start = time.perf_counter()
+    with redirect_stdout(out):
+        run_stage(stage)
+    return time.perf_counter() - start, out.getvalue(), sparning.take_events()
+
+
+def _run_parallel(order: list[Stage], by_name: dict[str, Stage], jobs: int,
+                  forced: set[str], checkpoint: Checkpoint,
+                  events: list[dict]) -> dict[str, float]:
+    """Kör stegen i en processpool; ett steg startar när dess beroenden är klara.
+
+    Misslyckas ett steg startas inga nya, men steg som redan körs får
+    köra klart och deras status (klar eller misslyckades) skrivs till
+    kontrollpunkten innan det första felet kastas vidare. Arbetsprocessernas
+    spans läggs till i `events`.
+    """
+    # Dela kärnorna mellan stegen så att inläsningens processpooler
+    # inte tillsammans startar jobs × antal kärnor processer
+    ingest_workers = max(1, common.INGEST_WORKERS // jobs)
+    timings, done, running = {}, set(), {}
+    pending = list(order)
+    failure = None
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        while (pending and failure is None) or running:
+            skipped = False
+            ready = [s for s in pending if all(d in done for d in s.deps)]
+            for stage in ready if failure is None else []:
+                if len(running) >= jobs:
+                    break
+                pending.remove(stage)
+                fingerprint = _stale_fingerprint(stage, by_name, stage.name in forced)
+                if fingerprint is None:
+                    done.add(stage.name)
+                    checkpoint.mark(stage.name, Checkpoint.DONE)
+                    _skipped_span(stage)
+                    skipped = True
+                    print(f"[{len(done)}/{len(order)}] {stage.title}: oförändrat, hoppas över\n")
+                    continue
+                future = pool.submit(_run_stage_task, stage, ingest_workers)
+                running[future] = (stage, fingerprint)
+            if skipped or not running:
+                # Överhoppade steg kan ha gjort nya steg redo
+                continue
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage, fingerprint = running.pop(future)
+                try:
+                    seconds, output, stage_events = future.result()
+                except BaseException as exc:
+                    # Första felet sparas som körningens fel; övriga steg
+                    # som hann misslyckas markeras bara
+                    checkpoint.mark(stage.name, Checkpoint.FAILED,
+                                    exc if failure is None else None)
+                    failure = failure or exc
+                    if running:
+                        print(f"{stage.title} misslyckades; väntar på "
+                              f"{len(running)} steg som redan körs...")
+                    continue
+                events.extend(stage_events)
+                record_stage(stage, fingerprint)
+                checkpoint.mark(stage.name, Checkpoint.DONE)
+                done.add(stage.name)
+                timings[stage.name] = seconds
+                print(f"[{len(done)}/{len(order)}] {stage.title} ({seconds:.2f} s)")
+                print(output)
+
+    if failure is not None:
+        raise failure
+    return timings
+
+
+def run_pipeline(stages: list[Stage] | None = None, targets=None,
+                 jobs: int = 1, force: bool = False, resume: bool = False) -> dict[str, float]:
+    """Kör stegen i beroendeordning med delade dataset.
+
+    Steg vars fingeravtryck inte har ändrats hoppas över, om inte `force`.
+    jobs > 1 kör oberoende steg parallellt i separata processer (varje
+    process har då sitt eget delade minne), men aldrig fler än kärnorna
+    eller stegen som kan köras samtidigt (se effective_jobs). Med `resume` tas steg och
+    flaggor från förra körningens kontrollpunkt, och steg som då blev
+    klara körs inte om så länge de är aktuella. Returnerar väggtid
+    (sekunder) per kört steg, i den ordning stegen blev klara.
+
+    Spans från körningen (även vid fel) skrivs till output/run_trace.json.
+    """
+    stages = stages or STAGES
+    by_name = {s.name: s for s in stages}
+    completed = set()
+    if resume:
+        previous = Checkpoint.load()
+        if previous is None:
+            print("Ingen tidigare körning att återuppta — kör som vanligt.\n")
+        else:
+            targets = targets or previous.targets or None
+            force = previous.force
+            completed = previous.completed
+            if previous.error:
+                print(f"Återupptar efter fel i {previous.error['steg']}: "
+                      f"{previous.error['fel']}\n")
+
+    if targets:
+        targets = list(dict.fromkeys(resolve_target(stages, t) for t in targets))
+    order = execution_order(stages, targets)
+    if not common.PLOTS_ENABLED:
+        plots_only = [s.name for s in order if s.plots_only]
+        order = [s for s in order if not s.plots_only]
+        if plots_only:
+            print(f"Grafer avstängda — hoppar över: {', '.join(plots_only)}\n")
+    forced = {s.name for s in order if force and s.name not in completed}
+    if jobs > 1:
+        requested, jobs = jobs, effective_jobs(order, jobs)
+        if jobs < requested:
+            print(f"Kör {jobs} steg åt gången i stället för {requested} (kärnor: "
+                  f"{usable_cpus()}, steg som kan köras samtidigt: {max_parallel(order)}).\n")
+    checkpoint = Checkpoint([s.name for s in order], targets, force)
+    checkpoint.save()
+    events = []
+    try:
+        with sparning.span("pipeline", cat="körning", steg=len(order), jobs=jobs):
+            if jobs > 1:
+                return _run_parallel(order, by_name, jobs, forced, checkpoint, events)
+            return _run_sequential(order, by_name, forced, checkpoint)
+    finally:
+        sparning.write_trace(trace_path(), sparning.take_events() + events)
+
+
+def _run_sequential(order: list[Stage], by_name: dict[str, Stage],
+                    forced: set[str], checkpoint: Checkpoint) -> dict[str, float]:
+    """Kör stegen ett i taget i den egna processen."""
+    timings = {}
+    # Delningen kan redan vara påslagen (t.ex. i --watch, mellan körningar)
+    owns_shared = common._SHARED is None
+    if owns_shared:
+        common.share_datasets()
+    try:
+        for i, stage in enumerate(order, 1):
+            fingerprint = _stale_fingerprint(stage, by_name, stage.name in forced)
+            if fingerprint is None:
+                checkpoint.mark(stage.name, Checkpoint.DONE)
+                _skipped_span(stage)
+                print(f"[{i}/{len(order)}] {stage.title}: oförändrat, hoppas över\n")
+                continue
+            print(f"[{i}/{len(order)}] {stage.title}...")
+            start = time.perf_counter()
+            try:
+                run_stage(stage)
+            except BaseException as exc:
+                checkpoint.mark(stage.name, Checkpoint.FAILED, exc)
+                raise
+            timings[stage.name] = time.perf_counter() - start
+            record_stage(stage, fingerprint)
+            checkpoint.mark(stage.name, Checkpoint.DONE)
+            print()
+    finally:
+        if owns_shared:
+            common.share_datasets(False)
+    return timings
+
+
+def warm_cache() -> float:
+    """Fyller tolkningscachen med alla ark innan stegen körs parallellt.
+
+    Annars tolkar varje parallellt steg samma okända filer var för sig.
+    Returnerar tiden det tog.
+    """
+    start = time.perf_counter()
+    with sparning.span("inläsning", cat="steg") as span:
+        if common.CACHE_ENABLED:
+            new = [f for f in common.get_report_files() if not common._is_fully_cached(f[2])]
+            common.ingest_reports(new)
+            span["filer"] = len(new)
+    return time.perf_counter() - start
+
+
+# ---------------------------------------------------------------------------
+# Bevakning
+# ---------------------------------------------------------------------------
+
+def report_snapshot(root: Path | None = None) -> dict[str, tuple[int, int]]:
+    """(storlek, mtime) för varje .xls-fil under rapportkatalogen."""
+    root = Path(root or common.RAPPORT_DIR)
+    snapshot = {}
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            if name.lower().endswith(".xls"):
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue  # borttagen under avläsningen
+                snapshot[path] = (stat.st_size, stat.st_mtime_ns)
+    return snapshot
+
+
+def wait_for_change(previous: dict, interval: float, debounce: float,
+                    sleep=time.sleep) -> dict:
+    """Väntar tills rapportfilerna har ändrats och sedan legat stilla.
+
+    Returnerar den nya avläsningen när inget har ändrats på `debounce`
+    sekunder.
+    """
+    current = previous
+    while current == previous:
+        sleep(interval)
+        current = report_snapshot()
+
+    stable_since = time.monotonic()
+    while True:
+        sleep(min(interval, debounce))
+        latest = report_snapshot()
+        if latest != current:
+            current, stable_since = latest, time.monotonic()
+        elif time.monotonic() - stable_since >= debounce:
+            return current
+
+
+def _describe_changes(before: dict, after: dict) -> str:
+    added = [p for p in after if p not in before]
+    changed = [p for p in after if p in before and after[p] != before[p]]
+    removed = [p for p in before if p not in after]
+    parts = [f"{len(added)} nya", f"{len(changed)} ändrade", f"{len(removed)} borttagna"]
+    names = ", ".join(Path(p).name for p in added + changed)
+    return ", ".join(parts) + (f" ({names})" if names else "")
+
+
+def watch(targets=None, jobs: int = 1, interval: float = 2.0, debounce: float = 3.0,
+          runs: int | None = None, sleep=time.sleep):
+    """Kör pipelinen och sedan igen varje gång rapportkatalogen ändras.
+
+    Fel i en körning skrivs ut och bevakningen fortsätter (kontrollpunkten
+    visar vilket steg som fallerade). Delade dataset som en körning inte
+    använde släpps efter den (common.trim_shared). `runs` begränsar
+    antalet omkörningar.
+    """
+    common.share_datasets()
+    snapshot = report_snapshot()
+    count = 0
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                if min(jobs, usable_cpus()) > 1:
+                    warm_cache()
+                run_pipeline(targets=targets, jobs=jobs)
+                print(f"Rapporten uppdaterad på {time.perf_counter() - start:.1f} s.")
+            except Exception as exc:
+                print(f"Körningen misslyckades: {type(exc).__name__}: {exc}")
+            # Bundlar och tabeller för ändrade eller äldre filer behövs inte mer
+            common.trim_shared()
+            if runs is not None and count >= runs:
+                return
+            count += 1
+            print(f"Bevakar {common.RAPPORT_DIR} (Ctrl-C avslutar)...\n")
+            latest = wait_for_change(snapshot, interval, debounce, sleep)
+            print(f"Ändring i rapportkatalogen: {_describe_changes(snapshot, latest)}\n")
+            snapshot = latest
+    finally:
+        common.share_datasets(False)
+
+
+def print_timings(timings: dict[str, float], wall: float | None = None):
+    """Skriver tid per steg och total väggtid (standard: summan av stegen)."""
+    print("=" * 60)
+    print("TID PER STEG")
+    print("=" * 60)
+    width = max((len(name) for name in timings), default=0)
+    for name, seconds in timings.items():
+        print(f"  {name:<{width}}  {seconds:7.2f} s")
+    total = sum(timings.values()) if wall is None else wall
+    print(f"  {'Totalt':<{width}}  {total:7.2f} s")
+    print()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Kör sopsuganalysens steg i beroendeordning.")
+    parser.add_argument("steps", nargs="*", metavar="mål",
+                        help="steg eller utdatafiler att bygga (med beroenden); standard alla")
+    parser.add_argument("-j", "--jobs", type=int, default=1, metavar="N",
+                        help="antal steg som får köras samtidigt (0 = antal kärnor)")
+    parser.add_argument("-f", "--force", action="store_true",
+                        help="kör alla steg även om indata inte har ändrats")
+    parser.add_argument("--resume", action="store_true",
+                        help="fortsätt förra körningen från första misslyckade steg")
+    parser.add_argument("--watch", action="store_true",
+                        help="bevaka rapportkatalogen och bygg om vid nya filer")
+    parser.add_argument("--interval", type=float, default=2.0, metavar="S",
+                        help="sekunder mellan avläsningar i --watch (standard 2)")
+    parser.add_argument("--debounce", type=float, default=3.0, metavar="S",
+                        help="sekunder filerna ska ligga still innan omkörning (standard 3)")
+    parser.add_argument("--no-csv", action="store_true",
+                        help="skriv bara typade .npz-tabeller, inga CSV-kopior")
+    parser.add_argument("--no-plots", action="store_true",
+                        help="bara beräkningar: inga grafer, dashboard eller PDF")
+    args = parser.parse_args(argv)
+    if args.no_csv:
+        # Miljövariabeln följer med till arbetsprocesserna
+        os.environ["SOPSUG_CSV"] = "0"
+        common.CSV_EXPORT = False
+    if args.no_plots:
+        os.environ["SOPSUG_PLOTS"] = "0"
+        common.PLOTS_ENABLED = False
+    jobs = args.jobs if args.jobs > 0 else usable_cpus()
+    try:
+        targets = [resolve_target(STAGES, t) for t in args.steps] or None
+    except ValueError as exc:
+        parser.error(str(exc))
+    if not common.PLOTS_ENABLED:
+        plot_targets = [t for t, name in zip(args.steps, targets or [])
+                        if next(s for s in STAGES if s.name == name).plots_only]
+        if plot_targets:
+            parser.error(f"{', '.join(plot_targets)} kräver grafer (utan --no-plots)")
+
+    if args.watch:
+        try:
+            watch(targets=targets, jobs=jobs,
+                  interval=args.interval, debounce=args.debounce)
+        except KeyboardInterrupt:
+            print("\nBevakningen avslutad.")
+        return
+
+    start = time.perf_counter()
+    timings = {}
+    if min(jobs, usable_cpus()) > 1:
+        timings["inläsning"] = warm_cache()
+    timings.update(run_pipeline(targets=targets, jobs=jobs,
+                                 force=args.force, resume=args.resume))
+    print_timings(timings, wall=time.perf_counter() - start)
+    stage_names = {s.name for s in STAGES}
+    for target in args.steps:
+        if target not in stage_names and not (common.OUTPUT_DIR / Path(target).name).exists():
+            print(f"Varning: {target} skapades inte.")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,13 +11,13 @@ Output:
 """
 
 import json
+import os
 from pathlib import Path
 
-import matplotlib
 import pandas as pd
 from fpdf import FPDF
 
-from common import OUTPUT_DIR, ensure_output_dir
+from common import OUTPUT_DIR, ensure_output_dir, load_table
 
 
 # ---------------------------------------------------------------------------
@@ -26,6 +26,7 @@ from common import OUTPUT_DIR, ensure_output_dir
 
 def get_font_path():
     """Hittar DejaVuSans.ttf via matplotlib."""
+    import matplotlib
     mpl_data = Path(matplotlib.get_data_path())
     font_path = mpl_data / "fonts" / "ttf" / "DejaVuSans.ttf"
     if font_path.exists():
@@ -41,6 +42,7 @@ def get_font_path():
 
 def get_font_bold_path():
     """Hittar DejaVuSans-Bold.ttf."""
+    import matplotlib
     mpl_data = Path(matplotlib.get_data_path())
     font_path = mpl_data / "fonts" / "ttf" / "DejaVuSans-Bold.ttf"
     if font_path.exists():
@@ -464,13 +466,13 @@ def add_alarm_section(pdf, data):
         larm_anom = anomalier_df[anomalier_df["mal"] == "larm_manad"]
         if not larm_anom.empty:
             pdf.section_title("Larmanomalier", level=2)
-            headers = ["Månad", "Antal larm", "Z-score", "Typ"]
+            headers = ["Månad", "Antal larm", "Robust avvikelse", "Typ"]
             rows = []
             for _, a in larm_anom.iterrows():
                 rows.append([
                     str(a.get("label", "?")),
                     f"{a.get('varde', 0):.0f}",
-                    f"{a.get('z_score', 0):.1f}",
+                    f"{a.get('robust_score', 0):.1f}",
                     str(a.get("typ", "?")),
                 ])
             pdf.add_table(headers, rows, [45, 45, 45, 45])
@@ -864,8 +866,11 @@ def add_gren_djup_section(pdf, data):
         "Grentyp-cirkeldiagram. Tillgänglighetsranking."
     )
     pdf.body_text(
-        "Säsongstyp: 'Sommarsvacka' = trafiken minskar kraftigt på sommaren "
-        "(typiskt för skolor). 'Jämn' = stabil trafik hela året (bostäder). "
+        "Säsongstyp: bara grenar med ett statistiskt säkert återkommande mönster "
+        "i kommandon per månad räknas som säsongsberoende. 'Sommarsvacka' = "
+        "mönstret har låg trafik på sommaren (typiskt för skolor), 'Sommartopp' = "
+        "hög trafik på sommaren, 'Periodisk' = mönster utan sommareffekt. "
+        "'Jämn' = inget säkert mönster, även om enstaka månader avviker. "
         "Grenar med hög variationskoefficient (CV >30%) har ojämn belastning."
     )
     pdf.body_text(
@@ -1052,8 +1057,9 @@ def load_data():
     for name in ["trend_anlaggning", "trend_ventiler", "trend_grenar",
                   "trend_korrelationer", "trend_anomalier"]:
         path = OUTPUT_DIR / f"{name}.csv"
-        if path.exists():
-            data[name.replace("trend_", "")] = pd.read_csv(path)
+        df = load_table(path)
+        if df is not None:
+            data[name.replace("trend_", "")] = df
         else:
             data[name.replace("trend_", "")] = pd.DataFrame()
             print(f"  Varning: {path} saknas")
@@ -1061,8 +1067,9 @@ def load_data():
     # Manuell analys
     for name in ["manuell_analys", "manuell_ventiler"]:
         path = OUTPUT_DIR / f"{name}.csv"
-        if path.exists():
-            data[name] = pd.read_csv(path)
+        df = load_table(path)
+        if df is not None:
+            data[name] = df
         else:
             data[name] = pd.DataFrame()
             print(f"  Varning: {path} saknas")
@@ -1072,8 +1079,9 @@ def load_data():
                   "fraktion_analys",
                   "gren_djupanalys", "gren_profiler"]:
         path = OUTPUT_DIR / f"{name}.csv"
-        if path.exists():
-            data[name] = pd.read_csv(path)
+        df = load_table(path)
+        if df is not None:
+            data[name] = df
         else:
             data[name] = pd.DataFrame()
             print(f"  Varning: {path} saknas")
@@ -1153,8 +1161,12 @@ def main():
     print("  14. Bilaga: Mötesagenda")
     add_agenda_appendix(pdf)
 
+    # Skriv till en temporärfil och byt namn, så att en läsare (eller
+    # --watch-läget) aldrig ser en halvskriven PDF
     output_path = OUTPUT_DIR / "rapport_2025.pdf"
-    pdf.output(str(output_path))
+    tmp_path = output_path.with_name(f"{output_path.name}.{os.getpid()}.tmp")
+    pdf.output(str(tmp_path))
+    os.replace(tmp_path, output_path)
     print(f"\nPDF sparad: {output_path}")
     print(f"Antal sidor: {pdf.page_no()}")
 
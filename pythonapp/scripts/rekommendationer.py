@@ -19,7 +19,7 @@ from datetime import datetime
 import pandas as pd
 import numpy as np
 
-from common import OUTPUT_DIR, ensure_output_dir
+from common import OUTPUT_DIR, ensure_output_dir, load_table, save_table
 
 # ---------------------------------------------------------------------------
 # Tröskelvärden (konfigurerbara)
@@ -37,10 +37,11 @@ GREN_HALSA_KRITISK = 70    # Hälsopoäng under detta → grenåtgärd
 
 def load_csv(name):
     path = OUTPUT_DIR / name
-    if not path.exists():
+    df = load_table(path)
+    if df is None:
         print(f"  Varning: {path} saknas")
         return pd.DataFrame()
-    return pd.read_csv(path)
+    return df
 
 
 def load_all():
@@ -219,8 +220,9 @@ def generate_alarm_recs(data):
                     recs.append(make_rec(
                         1, "Larm", f"Larmanomali: {a['label']}",
                         f"Månaden {a['label']} hade anomalt höga larm "
-                        f"({a['varde']:.0f}, z-score {a['z_score']:.1f}).",
-                        f"Värde: {a['varde']:.0f}, z-score: {a['z_score']:.1f}",
+                        f"({a['varde']:.0f}, {a['robust_score']:.1f} robusta standardavvikelser "
+                        f"över baslinjen {a['baslinje']:.0f}).",
+                        f"Värde: {a['varde']:.0f}, robust avvikelse: {a['robust_score']:.1f}",
                         "Identifiera och eliminera orsaken till larmspiken",
                         [
                             "Utred specifika larmkategorier för den aktuella månaden",
@@ -487,12 +489,12 @@ def main():
         }
         for r in all_recs
     ])
-    rec_df.to_csv(csv_path, index=False, encoding="utf-8-sig")
+    save_table(rec_df, csv_path)
     print(f"  {csv_path}")
 
     kpi_path = OUTPUT_DIR / "kpi_mal.csv"
     kpi_df = pd.DataFrame(goals)
-    kpi_df.to_csv(kpi_path, index=False, encoding="utf-8-sig")
+    save_table(kpi_df, kpi_path)
     print(f"  {kpi_path}")
 
     agenda_path = OUTPUT_DIR / "operatorsagenda.txt"
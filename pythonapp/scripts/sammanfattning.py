@@ -15,22 +15,23 @@ Output:
   - stdout: Lista alla upptackta nycklar
 """
 
-import os
 import re
 
 import numpy as np
 import pandas as pd
-import xlrd
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
 
 from common import (
     OUTPUT_DIR,
     MANAD_NAMN,
     RAPPORT_DIR,
     get_report_files,
+    load_report_bundles,
+    read_sheet1_rows,
     ensure_output_dir,
+    as_bundles,
+    save_table,
+    plots_enabled,
+    pyplot,
 )
 
 
@@ -39,57 +40,20 @@ def read_sheet1(filepath):
 
     Sheet1 har ovanlig struktur: etiketter i sammanslagna celler (kol 0-5),
     varden i kolumn 6 ("Value"), kommentarer i kolumn 8 ("Comment").
-    common.read_sheet() strippar tomma kolumner sa vi anvander xlrd direkt.
+    common.read_sheet() strippar tomma kolumner sa vi anvander xlrd direkt
+    via common.parse_sheet1(). Tolkningscachen kontrolleras forst.
     """
-    wb = xlrd.open_workbook(str(filepath), logfile=open(os.devnull, "w"), on_demand=True)
-    sheet = wb.sheet_by_name("Sheet1")
-
-    rows = []
-    for row_idx in range(10, sheet.nrows):  # Data borjar efter rubrikrad 9
-        # Skanna kolumn 0-5 for etikett (sammanslagna celler)
-        label_parts = []
-        for col in range(6):
-            val = sheet.cell_value(row_idx, col)
-            if val and str(val).strip():
-                label_parts.append(str(val).strip())
-        label = " ".join(label_parts).strip()
-
-        if not label:
-            continue
-
-        # Varde i kolumn 6
-        value = None
-        if sheet.ncols > 6:
-            raw = sheet.cell_value(row_idx, 6)
-            if raw != "" and raw is not None:
-                value = raw
-
-        # Kommentar i kolumn 8
-        comment = ""
-        if sheet.ncols > 8:
-            raw = sheet.cell_value(row_idx, 8)
-            if raw and str(raw).strip():
-                comment = str(raw).strip()
-
-        if value is not None or comment:
-            rows.append({
-                "Nyckel": label,
-                "Varde": value,
-                "Kommentar": comment,
-            })
-
-    return rows
+    return read_sheet1_rows(filepath)
 
 
-def collect_all_months(report_files):
+def collect_all_months(bundles):
     """Samlar Sheet1-data fran alla manader."""
     all_rows = []
-    for month_num, month_name, filepath in report_files:
-        month_data = read_sheet1(filepath)
-        for row in month_data:
+    for bundle in as_bundles(bundles):
+        for row in bundle.sheet1:
             all_rows.append({
-                "Manad_nr": month_num,
-                "Manad": month_name,
+                "Manad_nr": bundle.month_num,
+                "Manad": bundle.month_name,
                 **row,
             })
     return pd.DataFrame(all_rows)
@@ -186,7 +150,7 @@ def create_pivoted_csv(df):
         pivot.columns = [MANAD_NAMN.get(c, str(c)) for c in pivot.columns]
 
     path = OUTPUT_DIR / "sammanfattning.csv"
-    pivot.to_csv(path, encoding="utf-8-sig")
+    save_table(pivot, path, index=True)
     print(f"CSV sparad: {path}")
     return pivot
 
@@ -197,6 +161,7 @@ def create_plots(df, kpi_df):
     Sparar varje KPI som en separat fil: sammanfattning_1.png ... sammanfattning_6.png.
     Returnerar antalet sparade filer (int).
     """
+    plt = pyplot()
     if df.empty:
         print("Ingen data att visualisera.")
         return 0
@@ -309,7 +274,8 @@ def main():
     print(f"Laser {len(report_files)} rapporter for Sheet1-discovery...\n")
 
     # Samla all data
-    df = collect_all_months(report_files)
+    bundles = load_report_bundles(report_files)
+    df = collect_all_months(bundles)
     print(f"Totalt {len(df)} rader fran {df['Manad_nr'].nunique()} manader")
 
     # Identifiera KPI:er
@@ -318,14 +284,15 @@ def main():
     # Spara KPI-lista
     if not kpi_df.empty:
         kpi_path = OUTPUT_DIR / "sammanfattning_kpi_lista.csv"
-        kpi_df.to_csv(kpi_path, index=False, encoding="utf-8-sig")
+        save_table(kpi_df, kpi_path)
         print(f"KPI-lista sparad: {kpi_path}")
 
     # Pivoterad CSV
     create_pivoted_csv(df)
 
     # Graf
-    create_plots(df, kpi_df)
+    if plots_enabled():
+        create_plots(df, kpi_df)
 
     # Discovery-utskrift
     print_discovery(df, kpi_df)
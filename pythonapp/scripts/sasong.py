@@ -0,0 +1,139 @@
+"""Säsongsmönster via autokorrelation för många serier på en gång.
+
+Serierna ges som en matris serie × period (NaN där värde saknas), t.ex.
+en pivot med en rad per ventil, gren eller fraktion och en kolumn per
+månad. Autokorrelationen för alla serier och lags räknas i ett svep med
+FFT:
+
+    acf = autocorrelation(matris, max_lag=6)
+    sasong = seasonality(matris)
+
+Autokorrelationen för lag k är samma som i trendanalys.detect_seasonal_patterns:
+sum(x[t] * x[t+k]) / sum(x[t]²) för den medelvärdesjusterade serien.
+Saknade värden räknas som seriens medelvärde, dvs. bidrar med 0.
+
+seasonality() tar först bort en linjär trend per serie; en trend ger
+annars hög autokorrelation på alla korta lags utan att vara ett mönster.
+Lag 1 räknas inte, eftersom närliggande månader liknar varandra i nästan
+alla serier. Ett mönster kräver att toppen ligger över brusgränsen
+1,96 / √n för n värden (95 % för vitt brus), som är 0,57 för ett år.
+
+season_type() sätter säsongstyp från det resultatet: bara en serie med
+signifikant mönster är säsongsberoende, och sommarmånadernas nivå mot
+medel anger då bara riktningen (Sommarsvacka/Sommartopp/Periodisk).
+"""
+
+import warnings
+
+import numpy as np
+import pandas as pd
+
+MIN_POINTS = 6
+MIN_LAG = 2
+SIGNIFICANCE = 1.96     # normalkvantil för 95 %-gränsen ±1,96/√n
+SEASON_COLUMNS = ["starkast_lag", "korrelation", "har_sasongsmonster"]
+SUMMER_MONTHS = (6, 7, 8)
+SUMMER_LOW = 0.7        # sommarnivå / medel under detta: Sommarsvacka
+SUMMER_HIGH = 1.3       # sommarnivå / medel över detta: Sommartopp
+
+
+def autocorrelation(matrix, max_lag: int = 6) -> np.ndarray:
+    """Autokorrelation för lag 1..max_lag per rad (serie × lag).
+
+    Lags som serien är för kort för, och rader utan variation, blir NaN.
+    """
+    y = np.asarray(matrix, dtype=float)
+    if y.ndim == 1:
+        y = y[None, :]
+    n_series, n = y.shape
+    lags = max(0, min(max_lag, n - 1))
+    if n_series == 0 or lags == 0:
+        return np.full((n_series, lags), np.nan)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # rader utan värden
+        centered = np.nan_to_num(y - np.nanmean(y, axis=1, keepdims=True), nan=0.0)
+
+    # Nollutfyllnad till minst 2n ger linjär (inte cirkulär) korrelation
+    size = 1 << (2 * n - 1).bit_length()
+    spectrum = np.fft.rfft(centered, n=size, axis=1)
+    acov = np.fft.irfft(spectrum * np.conj(spectrum), n=size, axis=1)[:, :lags + 1]
+    norm = np.sum(centered ** 2, axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        acf = acov[:, 1:] / norm[:, None]
+    acf[norm == 0] = np.nan
+    return acf
+
+
+def detrend(matrix) -> np.ndarray:
+    """Residualer efter en linjär trend per rad, anpassad till radens värden.
+
+    Saknade värden förblir NaN. Rader där trenden förklarar allt (inom
+    avrundningsfel) blir helt 0, så att de saknar variation.
+    """
+    y = np.asarray(matrix, dtype=float)
+    if y.ndim == 1:
+        y = y[None, :]
+    present = ~np.isnan(y)
+    count = present.sum(axis=1, keepdims=True)
+    t = np.where(present, np.arange(y.shape[1], dtype=float), 0.0)
+    values = np.where(present, y, 0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t_mean = t.sum(axis=1, keepdims=True) / count
+        y_mean = values.sum(axis=1, keepdims=True) / count
+        dt = np.where(present, t - t_mean, 0.0)
+        dy = np.where(present, values - y_mean, 0.0)
+        slope = np.nan_to_num((dt * dy).sum(axis=1, keepdims=True) / (dt ** 2).sum(axis=1, keepdims=True))
+    residual = np.where(present, dy - slope * dt, np.nan)
+    total = (dy ** 2).sum(axis=1, keepdims=True)
+    explained = np.nansum(residual ** 2, axis=1, keepdims=True) <= 1e-12 * total
+    return np.where(explained & present, 0.0, residual)
+
+
+def seasonality(matrix, max_lag: int = 6, min_points: int = MIN_POINTS,
+                significance: float = SIGNIFICANCE) -> pd.DataFrame:
+    """Starkaste lag (MIN_LAG..max_lag) och dess autokorrelation per serie.
+
+    matrix: DataFrame (index = serie) eller 2D-array. Autokorrelationen
+    räknas på den trendrensade serien och avrundas till 4 decimaler; vid
+    lika värden väljs kortaste lagen. har_sasongsmonster kräver att den
+    överstiger significance / √n, där n är antalet värden i serien.
+    Serier med färre än min_points värden eller utan variation får
+    starkast_lag = NaN och har_sasongsmonster = False.
+    """
+    index = matrix.index if isinstance(matrix, pd.DataFrame) else None
+    y = np.asarray(matrix, dtype=float)
+    if y.ndim == 1:
+        y = y[None, :]
+    count = (~np.isnan(y)).sum(axis=1)
+    acf = np.round(autocorrelation(detrend(y), max_lag), 4)[:, MIN_LAG - 1:]
+    if acf.shape[1] == 0:
+        acf = np.full((len(y), 1), np.nan)
+
+    valid = (count >= min_points) & ~np.isnan(acf).all(axis=1)
+    best = np.argmax(np.where(np.isnan(acf), -np.inf, acf), axis=1)
+    strength = np.where(valid, acf[np.arange(len(y)), best], np.nan)
+    with np.errstate(divide="ignore"):
+        bound = significance / np.sqrt(count)
+
+    return pd.DataFrame({
+        "starkast_lag": np.where(valid, best + MIN_LAG, np.nan),
+        "korrelation": strength,
+        "har_sasongsmonster": valid & (strength > bound),
+    }, index=index)
+
+
+def season_type(significant: bool, summer_ratio: float) -> str:
+    """Säsongstyp för en serie: Sommarsvacka, Sommartopp, Periodisk eller Jamn.
+
+    significant är har_sasongsmonster från seasonality(); utan signifikant
+    mönster blir serien Jamn oavsett sommarnivå. summer_ratio är
+    sommarmånadernas medel / seriens medel och avgör bara riktningen.
+    """
+    if not significant:
+        return "Jamn"
+    if summer_ratio < SUMMER_LOW:
+        return "Sommarsvacka"
+    if summer_ratio > SUMMER_HIGH:
+        return "Sommartopp"
+    return "Periodisk"
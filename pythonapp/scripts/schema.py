@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""Schemaregister för rapportarkens kolumnlayout.
+
+Varje ark identifieras av ett fingeravtryck av sina kolumnrubriker.
+Första gången en layout förekommer slås de logiska fälten (ventil-ID,
+tillgänglighet, felkoder, kommandon, fraktion, kWh m.fl.) upp mot
+rubrikerna till en karta fält → kolumnindex. Kartan återanvänds sedan
+för alla filer med samma fingeravtryck.
+
+Alla regler för hur ett fält känns igen finns i SHEET_FIELDS. När en
+ny firmwareversion ändrar rubrikerna syns det som ett nytt fingeravtryck
+för arket; kör skriptet direkt för en översikt:
+
+    python scripts/schema.py
+"""
+
+import hashlib
+from dataclasses import dataclass
+
+# Felkodskolumner i Sheet11 (fast ordning ger stabil kolumnordning i output)
+ERROR_COLS = (
+    "DOES_NOT_CLOSE",
+    "DOES_NOT_OPEN",
+    "LEVEL_ERROR",
+    "LONG_TIME_SINCE_LAST_COLLECTION",
+    "ERROR_FEEDBACK_FROM_USER",
+)
+
+
+def _contains(*words, exclude=()):
+    """Rubriken innehåller något av orden (skiftlägesokänsligt)."""
+    def match(header: str) -> bool:
+        h = header.lower()
+        return any(w in h for w in words) and not any(x in h for x in exclude)
+    return match
+
+
+def _equals(name: str):
+    """Rubriken är exakt `name` (skiftlägesokänsligt, utan blanktecken runt)."""
+    name = name.lower()
+    return lambda header: header.strip().lower() == name
+
+
+def _exact(name: str):
+    """Rubriken är exakt `name`."""
+    return lambda header: header == name
+
+
+# Logiska fält per ark. Varje fält matchar noll eller flera kolumner;
+# enkelfält använder första träffen (SheetSchema.col), flerfält alla
+# träffar i arkets kolumnordning (SheetSchema.cols).
+SHEET_FIELDS = {
+    "Sheet3": {
+        "energy": _contains("energy", "kwh"),
+        "operation_time": _contains("operation", "time"),
+    },
+    "Sheet5": {
+        "fraction": _contains("fraction"),
+        "hours": _equals("hours"),
+        "kwh": _contains("kwh"),
+        "emptyings": _contains("emptying", exclude=("minute",)),
+        "emptyings_per_minute": _contains("minute"),
+    },
+    "Sheet7": {
+        "name": _contains("name"),
+        "starts": _contains("start"),
+        "hours": _contains("hour"),
+        "kwh": _contains("kwh"),
+    },
+    "Sheet9": {
+        "valve_id": _equals("id"),
+        "info": _equals("info"),
+        "man_open_cmd": _equals("MAN_OPEN_CMD"),
+        "auto_open_cmd": _equals("AUTO_OPEN_CMD"),
+        "inlet_open": _equals("INLET_OPEN"),
+        "commands": _contains("open", "cmd"),
+    },
+    "Sheet11": {
+        "valve_id": _equals("id"),
+        "info": _equals("info"),
+        "availability": _contains("availability"),
+        "errors": lambda header: header in ERROR_COLS,
+        **{ec: _exact(ec) for ec in ERROR_COLS},
+    },
+    "Sheet13": {
+        "category": _contains("alarm", "category"),
+        "current": _contains("current", "period"),
+        "average": _contains("average", "previous"),
+    },
+}
+
+# Sheet1 består av nyckel-värde-rader och har inga logiska fält; dess
+# rubrikrad känns igen på kolumnerna Value och Comment (se common.parse_sheet1)
+SHEET1_HEADER_FIELDS = {
+    "value": _equals("value"),
+    "comment": _equals("comment"),
+}
+
+
+@dataclass(frozen=True)
+class SheetSchema:
+    """Uppslagen layout för ett ark: fält → kolumnindex."""
+
+    sheet_name: str
+    fingerprint: str
+    columns: tuple[str, ...]
+    fields: dict[str, tuple[int, ...]]
+
+    def col(self, field: str) -> str | None:
+        """Första kolumnen som matchar fältet, eller None."""
+        idx = self.fields.get(field)
+        return self.columns[idx[0]] if idx else None
+
+    def cols(self, field: str) -> list[str]:
+        """Alla kolumner som matchar fältet, i arkets ordning."""
+        return [self.columns[i] for i in self.fields.get(field, ())]
+
+    @property
+    def missing(self) -> list[str]:
+        """Fält som inte hittades i layouten."""
+        return [f for f, idx in self.fields.items() if not idx]
+
+
+def layout_fingerprint(sheet_name: str, columns) -> str:
+    """Kort, stabilt fingeravtryck av ett arks kolumnrubriker."""
+    key = "\x1f".join([sheet_name, *map(str, columns)])
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+
+
+_SCHEMAS: dict[tuple, SheetSchema] = {}
+_SOURCES: dict[str, dict[str, list[str]]] = {}
+
+
+def resolve_schema(sheet_name: str, columns, source: str | None = None) -> SheetSchema:
+    """Returnerar schemat för arket; fälten slås upp en gång per layout.
+
+    `source` (t.ex. filnamnet) registreras för layoutöversikten.
+    """
+    key = (sheet_name, tuple(columns))
+    schema = _SCHEMAS.get(key)
+    if schema is None:
+        cols = tuple(str(c) for c in key[1])
+        matchers = SHEET_FIELDS.get(sheet_name, {})
+        fields = {
+            name: tuple(i for i, c in enumerate(cols) if match(c))
+            for name, match in matchers.items()
+        }
+        schema = SheetSchema(sheet_name, layout_fingerprint(sheet_name, cols), cols, fields)
+        _SCHEMAS[key] = schema
+
+    if source is not None:
+        sources = _SOURCES.setdefault(sheet_name, {}).setdefault(schema.fingerprint, [])
+        if source not in sources:
+            sources.append(source)
+    return schema
+
+
+def known_layouts() -> dict[str, list[tuple[SheetSchema, list[str]]]]:
+    """Alla layouter som setts per ark, med filerna där de förekom."""
+    by_fp = {s.fingerprint: s for s in _SCHEMAS.values()}
+    return {
+        sheet: [(by_fp[fp], files) for fp, files in fps.items()]
+        for sheet, fps in _SOURCES.items()
+    }
+
+
+def layout_drift() -> dict[str, list[tuple[SheetSchema, list[str]]]]:
+    """Ark som förekommit med fler än en layout."""
+    return {sheet: layouts for sheet, layouts in known_layouts().items() if len(layouts) > 1}
+
+
+def print_layouts():
+    """Skriver layoutöversikt per ark till stdout."""
+    print("=" * 60)
+    print("ARKLAYOUTER — Sopsugsrapporter")
+    print("=" * 60)
+    for sheet, layouts in sorted(known_layouts().items(), key=lambda x: int(x[0][5:])):
+        flag = "  << LAYOUTDRIFT" if len(layouts) > 1 else ""
+        print(f"\n{sheet}: {len(layouts)} layout(er){flag}")
+        for schema, files in layouts:
+            print(f"  [{schema.fingerprint}] {len(files)} filer: {', '.join(files)}")
+            if schema.missing:
+                print(f"    Saknade fält: {', '.join(schema.missing)}")
+    print()
+
+
+def main():
+    from common import get_report_files, load_report_bundles
+
+    report_files = get_report_files()
+    if not report_files:
+        print("Inga rapportfiler hittades!")
+        return
+
+    for bundle in load_report_bundles(report_files):
+        for sheet_name in SHEET_FIELDS:
+            resolve_schema(sheet_name, bundle.sheet(sheet_name).columns,
+                           source=bundle.filepath.name)
+    print_layouts()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Spårning av körtid och minne per steg och delsteg.
+
+Kod som ska mätas läggs i ett span:
+
+    with span("trendanalys: grenanalys") as s:
+        branch_df = compute_branch_analysis(valve_df)
+        s["rader"] = len(branch_df)
+
+Varje span registrerar väggtid, CPU-tid, minne och de värden som sätts i
+span-objektet, t.ex. antal rader. Minnet mäts så att det kan knytas till
+spannet: rss_mb är processens RSS vid slutet och rss_andring_mb skillnaden
+mot början, topp_okning_mb hur mycket processens topp-RSS steg under
+spannet (0 om spannet inte nådde en ny topp). process_topp_rss_mb är
+processens högsta RSS under hela livstiden fram till spannets slut och
+är alltså samma för alla spans efter den största toppen.
+Spans som ligger i varandra visas nästlade.
+
+pipeline.py skriver alla spans från en körning till output/run_trace.json
+i Chrome-traceformat ("Trace Event Format"), som kan öppnas i
+chrome://tracing eller https://ui.perfetto.dev.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_EVENTS: list[dict] = []
+
+
+def peak_rss_mb() -> float | None:
+    """Processens högsta RSS hittills i MB (None om det inte går att läsa)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux rapporterar kB, macOS byte
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def current_rss_mb() -> float | None:
+    """Processens nuvarande RSS i MB (None där /proc saknas, t.ex. macOS)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+def _diff(end: float | None, start: float | None) -> float | None:
+    return round(end - start, 1) if end is not None and start is not None else None
+
+
+def _round(value: float | None) -> float | None:
+    return round(value, 1) if value is not None else None
+
+
+@contextmanager
+def span(name: str, cat: str = "delsteg", **args):
+    """Mäter blocket; värden som sätts i det returnerade dict:et sparas som args."""
+    info = dict(args)
+    start_ts = time.time()
+    start = time.perf_counter()
+    start_cpu = time.process_time()
+    start_rss = current_rss_mb()
+    start_peak = peak_rss_mb()
+    try:
+        yield info
+    finally:
+        wall = time.perf_counter() - start
+        cpu = time.process_time() - start_cpu
+        rss = current_rss_mb()
+        peak = peak_rss_mb()
+        _EVENTS.append({
+            "name": name,
+            "cat": cat,
+            "ph": "X",
+            "ts": int(start_ts * 1e6),
+            "dur": int(wall * 1e6),
+            "pid": os.getpid(),
+            "tid": threading.get_native_id(),
+            "args": {
+                "vagg_s": round(wall, 4),
+                "cpu_s": round(cpu, 4),
+                "rss_mb": _round(rss),
+                "rss_andring_mb": _diff(rss, start_rss),
+                "topp_okning_mb": _diff(peak, start_peak),
+                "process_topp_rss_mb": _round(peak),
+                **info,
+            },
+        })
+
+
+def take_events() -> list[dict]:
+    """Returnerar registrerade spans och tömmer listan."""
+    events = list(_EVENTS)
+    _EVENTS.clear()
+    return events
+
+
+def write_trace(path: Path, events: list[dict]) -> Path:
+    """Skriver spans som Chrome-trace (JSON), atomiskt via temporärfil."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = {
+        "traceEvents": sorted(events, key=lambda e: (e["ts"], -e["dur"])),
+        "displayTimeUnit": "ms",
+    }
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+    return path
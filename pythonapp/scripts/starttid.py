@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Starttid — mäter hur snabbt analysstegen startar.
+
+Varje stegs modul importeras i en ny Python-process (bästa av --repeat
+försök). Kolumnen "med grafbibl." importerar dessutom matplotlib.pyplot
+och scipy.stats, som alla skript gjorde vid start innan de blev lata;
+skillnaden är vad en körning med --no-plots sparar. Sista kolumnen visar
+vilka tunga bibliotek som ändå laddas vid import.
+
+Användning:
+
+    python scripts/starttid.py
+    python scripts/starttid.py --repeat 5 rekommendationer trendanalys
+"""
+
+import argparse
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pipeline
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+HEAVY_MODULES = ("pandas", "matplotlib", "scipy", "fpdf")
+EAGER_IMPORTS = "import matplotlib; matplotlib.use('Agg'); import matplotlib.pyplot, scipy.stats"
+
+
+def measure_import(module: str, repeat: int = 3, eager: bool = False) -> tuple[float, list[str]]:
+    """(bästa tid i sekunder, laddade tunga bibliotek) för import av modulen."""
+    code = (f"import sys, {module}\n"
+            + (f"{EAGER_IMPORTS}\n" if eager else "")
+            + f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+    best, loaded = float("inf"), []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, "-c", code], cwd=SCRIPTS_DIR,
+                                capture_output=True, text=True, check=True)
+        best = min(best, time.perf_counter() - start)
+        loaded = [m for m in result.stdout.strip().split(",") if m]
+    return best, loaded
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mäter starttiden för analysstegen.")
+    parser.add_argument("modules", nargs="*", metavar="modul",
+                        help="moduler att mäta (standard alla steg)")
+    parser.add_argument("-r", "--repeat", type=int, default=3, metavar="N",
+                        help="försök per modul; bästa tiden visas (standard 3)")
+    args = parser.parse_args(argv)
+    modules = args.modules or [s.module for s in pipeline.STAGES]
+
+    baseline, _ = measure_import("sys", args.repeat)
+    print("=" * 72)
+    print(f"STARTTID — import i ny process, bästa av {args.repeat} "
+          f"(tom Python: {baseline:.2f} s)")
+    print("=" * 72)
+    width = max(len(m) for m in modules)
+    print(f"  {'modul':<{width}}  {'lat':>7}  {'med grafbibl.':>13}  laddar")
+    for module in modules:
+        lazy, loaded = measure_import(module, args.repeat)
+        eager, _ = measure_import(module, args.repeat, eager=True)
+        print(f"  {module:<{width}}  {lazy:6.2f}s  {eager:12.2f}s  {', '.join(loaded) or '-'}")
+    print()
+
+
+if __name__ == "__main__":
+    main()
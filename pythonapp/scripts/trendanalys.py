@@ -11,13 +11,16 @@ Datakallor:
   - Sheet9  (rad 3): ID, Info, MAN_OPEN_CMD, AUTO_OPEN_CMD, INLET_OPEN
   - Sheet11 (rad 3): Availability [%], felkolumner per ventil
   - Sheet13 (rad 7): Alarm category, Current period, Average
+  - Sheet1  (rad 9): numeriska nyckeltal (korrelationer)
 
 Output:
   - output/trend_anlaggning.csv
   - output/trend_ventiler.csv
   - output/trend_grenar.csv
   - output/trend_korrelationer.csv
+  - output/trend_kpi_korrelationer.csv
   - output/trend_anomalier.csv
+  - output/trend_anomalier_ventiler.csv
   - output/trend_energi_forbrukning.png
   - output/trend_energi_effektivitet.png
   - output/trend_energi_fraktioner.png
@@ -36,126 +39,81 @@ import re
 
 import numpy as np
 import pandas as pd
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
-from scipy import stats
 
 from common import (
     OUTPUT_DIR,
     MANAD_NAMN,
+    REPORT_YEAR,
     get_report_files,
-    read_sheet,
-    parse_valve_id,
+    FactStore,
     ensure_output_dir,
+    as_bundles,
+    save_table,
+    plots_enabled,
+    pyplot,
 )
-
-ERROR_COLS = {
-    "DOES_NOT_CLOSE", "DOES_NOT_OPEN", "LEVEL_ERROR",
-    "LONG_TIME_SINCE_LAST_COLLECTION", "ERROR_FEEDBACK_FROM_USER",
-}
-
+from anomalier import ANOMALY_COLUMNS, SERIES_COLUMNS, detect_series_anomalies
+from korrelation import interpret, top_pairs
+from sasong import autocorrelation, seasonality
+from sparning import span
+from ventilfakta import ERROR_FIELDS, build_valve_facts
 
 # ---------------------------------------------------------------------------
 # Datainsamling
 # ---------------------------------------------------------------------------
 
-def collect_valve_monthly(report_files):
-    """Samlar per-ventil per-manad data fran Sheet11 + Sheet9."""
-    rows = []
-    for month_num, month_name, filepath in report_files:
-        # Sheet11: tillganglighet + felkoder
-        df11 = read_sheet(filepath, "Sheet11", header_row=3)
-        avail_col = [c for c in df11.columns if "availability" in c.lower()]
-        id_col = "ID" if "ID" in df11.columns else None
-        if not avail_col or not id_col:
-            continue
-
-        found_error_cols = [c for c in df11.columns if c in ERROR_COLS]
-
-        # Sheet9: kommandon
-        df9 = read_sheet(filepath, "Sheet9", header_row=3)
-        id_col9 = [c for c in df9.columns if c.lower() == "id"]
-        cmd_cols9 = [c for c in df9.columns if "open" in c.lower() or "cmd" in c.lower()]
-        cmd_lookup = {}
-        if id_col9:
-            for _, row9 in df9.iterrows():
-                vid9 = str(row9[id_col9[0]]).strip()
-                if vid9 and vid9 != "nan":
-                    total_cmds = 0
-                    for cc in cmd_cols9:
-                        v = pd.to_numeric(row9[cc], errors="coerce")
-                        if pd.notna(v):
-                            total_cmds += int(v)
-                    cmd_lookup[vid9] = total_cmds
-
-        for _, row in df11.iterrows():
-            vid = str(row[id_col]).strip()
-            if not vid or vid == "nan":
-                continue
-
-            avail = pd.to_numeric(row[avail_col[0]], errors="coerce")
-            if pd.isna(avail):
-                continue
-
-            total_errors = 0
-            error_detail = {}
-            for ec in found_error_cols:
-                ev = pd.to_numeric(row[ec], errors="coerce")
-                if pd.notna(ev) and ev > 0:
-                    error_detail[ec] = int(ev)
-                    total_errors += int(ev)
+def collect_valve_monthly(facts):
+    """Per-ventil per-manad data (Sheet11 + Sheet9), vy ur ventilfaktatabellen.
 
-            try:
-                gren, ventilnr = parse_valve_id(vid)
-            except (ValueError, IndexError):
-                gren, ventilnr = -1, -1
-
-            rows.append({
-                "Manad_nr": month_num,
-                "Manad": month_name,
-                "Ventil_ID": vid,
-                "Gren": gren,
-                "Ventilnr": ventilnr,
-                "Tillganglighet": avail,
-                "Totala_fel": total_errors,
-                "Kommandon": cmd_lookup.get(vid, 0),
-                **{f"Fel_{ec}": error_detail.get(ec, 0) for ec in ERROR_COLS},
-            })
-
-    return pd.DataFrame(rows)
-
-
-def collect_energy_detail(report_files):
+    En rad per ventil och manad med giltig tillganglighet, i Sheet11-ordning.
+    """
+    v = facts[facts["I_Sheet11"] & facts["Tillganglighet"].notna()]
+    errors = np.trunc(v[ERROR_FIELDS]).astype(np.int64)
+    return pd.DataFrame({
+        "Manad_nr": v["Manad_nr"],
+        "Manad": v["Manad"],
+        "Ventil_ID": v["Ventil_ID"],
+        "Gren": v["Gren"],
+        "Ventilnr": v["Ventilnr"],
+        "Tillganglighet": v["Tillganglighet"],
+        "Totala_fel": errors.sum(axis=1),
+        "Kommandon": v["Kommandon"],
+        **{f: errors[f] for f in ERROR_FIELDS},
+    }).reset_index(drop=True)
+
+
+def collect_energy_detail(bundles):
     """Samlar per-fraktion per-manad energi- och tomningsdata."""
     rows = []
-    for month_num, month_name, filepath in report_files:
+    for bundle in as_bundles(bundles):
         # Sheet3: total energi + drifttid
-        df3 = read_sheet(filepath, "Sheet3", header_row=3)
-        energy_col = [c for c in df3.columns if "energy" in c.lower() or "kwh" in c.lower()]
-        time_col = [c for c in df3.columns if "operation" in c.lower() or "time" in c.lower()]
-        total_energy = pd.to_numeric(df3[energy_col[0]], errors="coerce").sum() if energy_col else 0
-        total_time = pd.to_numeric(df3[time_col[0]], errors="coerce").sum() if time_col else 0
+        df3 = bundle.sheet("Sheet3")
+        schema3 = bundle.schema("Sheet3")
+        energy_col = schema3.col("energy")
+        time_col = schema3.col("operation_time")
+        total_energy = pd.to_numeric(df3[energy_col], errors="coerce").sum() if energy_col else 0
+        total_time = pd.to_numeric(df3[time_col], errors="coerce").sum() if time_col else 0
 
         # Sheet5: per fraktion
-        df5 = read_sheet(filepath, "Sheet5", header_row=3)
-        frac_col = [c for c in df5.columns if "fraction" in c.lower()]
-        kwh_col = [c for c in df5.columns if "kwh" in c.lower()]
-        empty_col = [c for c in df5.columns if "emptying" in c.lower() and "minute" not in c.lower()]
-        epm_col = [c for c in df5.columns if "minute" in c.lower()]
+        df5 = bundle.sheet("Sheet5")
+        schema5 = bundle.schema("Sheet5")
+        frac_col = schema5.col("fraction")
+        kwh_col = schema5.col("kwh")
+        empty_col = schema5.col("emptyings")
+        epm_col = schema5.col("emptyings_per_minute")
 
         frac_rows = []
         if frac_col:
             for _, r in df5.iterrows():
-                frac = str(r[frac_col[0]]).strip()
+                frac = str(r[frac_col]).strip()
                 if not frac or frac == "nan":
                     continue
                 # Filtrera bort historiska manad-rader
                 if frac.lower() == "month" or re.match(r"^\d{2}-\w+$", frac):
                     continue
-                kwh = pd.to_numeric(r[kwh_col[0]], errors="coerce") if kwh_col else 0
-                emptyings = pd.to_numeric(r[empty_col[0]], errors="coerce") if empty_col else 0
-                epm = pd.to_numeric(r[epm_col[0]], errors="coerce") if epm_col else 0
+                kwh = pd.to_numeric(r[kwh_col], errors="coerce") if kwh_col else 0
+                emptyings = pd.to_numeric(r[empty_col], errors="coerce") if empty_col else 0
+                epm = pd.to_numeric(r[epm_col], errors="coerce") if epm_col else 0
                 kwh_per_empty = kwh / emptyings if emptyings and emptyings > 0 else 0
                 frac_rows.append({
                     "Fraktion": frac,
@@ -169,8 +127,8 @@ def collect_energy_detail(report_files):
         kwh_per_empty_total = total_energy / total_emptyings if total_emptyings > 0 else 0
 
         rows.append({
-            "Manad_nr": month_num,
-            "Manad": month_name,
+            "Manad_nr": bundle.month_num,
+            "Manad": bundle.month_name,
             "Total_kWh": round(total_energy, 1),
             "Drifttid_h": round(total_time, 1),
             "Total_tomningar": total_emptyings,
@@ -180,31 +138,32 @@ def collect_energy_detail(report_files):
     return rows
 
 
-def collect_machine_monthly(report_files):
+def collect_machine_monthly(bundles):
     """Samlar per-maskin per-manad data fran Sheet7."""
     rows = []
-    for month_num, month_name, filepath in report_files:
-        df = read_sheet(filepath, "Sheet7", header_row=4)
-        name_col = [c for c in df.columns if "name" in c.lower()]
-        starts_col = [c for c in df.columns if "start" in c.lower()]
-        hours_col = [c for c in df.columns if "hour" in c.lower()]
-        kwh_col = [c for c in df.columns if "kwh" in c.lower()]
+    for bundle in as_bundles(bundles):
+        df = bundle.sheet("Sheet7")
+        schema = bundle.schema("Sheet7")
+        name_col = schema.col("name")
+        starts_col = schema.col("starts")
+        hours_col = schema.col("hours")
+        kwh_col = schema.col("kwh")
 
         if not name_col:
             continue
 
         for _, row in df.iterrows():
-            name = str(row[name_col[0]]).strip()
+            name = str(row[name_col]).strip()
             if not name or name == "nan":
                 continue
             if name.lower() == "total":
                 continue
-            s = pd.to_numeric(row[starts_col[0]], errors="coerce") if starts_col else 0
-            h = pd.to_numeric(row[hours_col[0]], errors="coerce") if hours_col else 0
-            k = pd.to_numeric(row[kwh_col[0]], errors="coerce") if kwh_col else 0
+            s = pd.to_numeric(row[starts_col], errors="coerce") if starts_col else 0
+            h = pd.to_numeric(row[hours_col], errors="coerce") if hours_col else 0
+            k = pd.to_numeric(row[kwh_col], errors="coerce") if kwh_col else 0
             rows.append({
-                "Manad_nr": month_num,
-                "Manad": month_name,
+                "Manad_nr": bundle.month_num,
+                "Manad": bundle.month_name,
                 "Maskin": name,
                 "Starter": int(s) if pd.notna(s) else 0,
                 "Timmar": round(h, 1) if pd.notna(h) else 0,
@@ -214,29 +173,30 @@ def collect_machine_monthly(report_files):
     return pd.DataFrame(rows)
 
 
-def collect_alarm_detail(report_files):
+def collect_alarm_detail(bundles):
     """Samlar larmdata per kategori per manad med forega arets snitt."""
     rows = []
-    for month_num, month_name, filepath in report_files:
-        df = read_sheet(filepath, "Sheet13", header_row=7)
-        cat_col = [c for c in df.columns if "alarm" in c.lower() or "category" in c.lower()]
-        current_col = [c for c in df.columns if "current" in c.lower() or "period" in c.lower()]
-        avg_col = [c for c in df.columns if "average" in c.lower() or "previous" in c.lower()]
+    for bundle in as_bundles(bundles):
+        df = bundle.sheet("Sheet13")
+        schema = bundle.schema("Sheet13")
+        cat_col = schema.col("category")
+        current_col = schema.col("current")
+        avg_col = schema.col("average")
 
         if not cat_col or not current_col:
             continue
 
         for _, row in df.iterrows():
-            cat = str(row[cat_col[0]]).strip()
+            cat = str(row[cat_col]).strip()
             if not cat or cat == "nan":
                 continue
-            current = pd.to_numeric(row[current_col[0]], errors="coerce")
-            avg = pd.to_numeric(row[avg_col[0]], errors="coerce") if avg_col else np.nan
+            current = pd.to_numeric(row[current_col], errors="coerce")
+            avg = pd.to_numeric(row[avg_col], errors="coerce") if avg_col else np.nan
 
             if pd.notna(current):
                 rows.append({
-                    "Manad_nr": month_num,
-                    "Manad": month_name,
+                    "Manad_nr": bundle.month_num,
+                    "Manad": bundle.month_name,
                     "Kategori": cat,
                     "Aktuell": int(current),
                     "Forega_snitt": round(avg, 1) if pd.notna(avg) else np.nan,
@@ -244,6 +204,21 @@ def collect_alarm_detail(report_files):
     return pd.DataFrame(rows)
 
 
+def collect_sheet1_kpis(bundles):
+    """Numeriska Sheet1-nyckeltal per manad (Nyckel, Varde)."""
+    rows = []
+    for bundle in as_bundles(bundles):
+        for row in bundle.sheet1:
+            value = pd.to_numeric(row.get("Varde"), errors="coerce")
+            if row.get("Nyckel") and pd.notna(value):
+                rows.append({
+                    "Manad_nr": bundle.month_num,
+                    "Nyckel": str(row["Nyckel"]).strip(),
+                    "Varde": float(value),
+                })
+    return pd.DataFrame(rows, columns=["Manad_nr", "Nyckel", "Varde"])
+
+
 # ---------------------------------------------------------------------------
 # Statistiska berakningar
 # ---------------------------------------------------------------------------
@@ -254,6 +229,7 @@ def compute_linear_trends(series_dict):
     series_dict: {namn: [(x, y), ...]}
     Returnerar dict med {namn: {slope, intercept, r2, p_value, trend_class}}
     """
+    from scipy import stats
     results = {}
     for name, points in series_dict.items():
         if len(points) < 3:
@@ -281,6 +257,85 @@ def compute_linear_trends(series_dict):
     return results
 
 
+def _near_rounding_tie(values, decimals, tol=1e-6):
+    """Sant dar vardet ligger sa nara en avrundningsgrans att sista biten avgor."""
+    scaled = np.abs(values) * 10.0 ** decimals
+    return np.abs(scaled - np.floor(scaled) - 0.5) < tol
+
+
+def compute_linear_trends_matrix(matrix):
+    """Linjar regression for alla rader i en matris i ett vektoriserat svep.
+
+    matrix: DataFrame med en rad per serie (t.ex. ventil) och en kolumn per
+    x-varde (manadsnummer); NaN = saknad manad. Ger samma resultat och
+    trendklassning som compute_linear_trends for varje rad, utan en
+    scipy-anrop per serie.
+
+    Summeringsordningen skiljer sig fran linregress, sa sista biten kan
+    skilja. Rader dar det kan ge en annan avrundning eller klass (varde
+    pa en avrundningsgrans, p nara 0.05, lutning nara 0, nastan konstant
+    serie) raknas om med compute_linear_trends.
+    Returnerar dict med {radnamn: {slope, intercept, r2, p_value, trend_class}}
+    """
+    from scipy import special
+    tiny = 1.0e-20  # samma som i scipy.stats.linregress
+    x = matrix.columns.to_numpy(dtype=float)
+    y = matrix.to_numpy(dtype=float)
+    present = ~np.isnan(y)
+    n = present.sum(axis=1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        xmean = np.where(present, x, 0.0).sum(axis=1) / n
+        ymean = np.where(present, y, 0.0).sum(axis=1) / n
+        xc = np.where(present, x - xmean[:, None], 0.0)
+        yc = np.where(present, y - ymean[:, None], 0.0)
+        ssxm = (xc * xc).sum(axis=1) / n
+        ssxym = (xc * yc).sum(axis=1) / n
+        ssym = (yc * yc).sum(axis=1) / n
+
+        # Som linregress: r = NaN om varians och kovarians ar noll (konstant
+        # serie), 0 om bara variansen ar det
+        r = np.clip(ssxym / np.sqrt(ssxm * ssym), -1.0, 1.0)
+        r = np.where((ssxm == 0.0) | (ssym == 0.0), np.where(ssxym == 0, np.nan, 0.0), r)
+        slope = ssxym / ssxm
+        intercept = ymean - slope * xmean
+        df = n - 2
+        t = r * np.sqrt(df / ((1.0 - r + tiny) * (1.0 + r + tiny)))
+        p_value = 2 * special.stdtr(df, -np.abs(t))
+
+        r2 = r ** 2
+        recheck = (
+            _near_rounding_tie(slope, 4) | _near_rounding_tie(intercept, 4)
+            | _near_rounding_tie(r2, 4) | _near_rounding_tie(p_value, 6)
+            | (np.abs(p_value - 0.05) < 1e-9) | (np.abs(slope) < 1e-9)
+            | (ssym <= 1e-12 * (ymean ** 2 + 1))
+        )
+
+    # Samma regel som compute_linear_trends (NaN-p ger "minskande")
+    trend_class = np.where(p_value > 0.05, "stabil",
+                           np.where(slope > 0, "okande", "minskande"))
+    slope, intercept = np.round(slope, 4), np.round(intercept, 4)
+    r2, p_value = np.round(r2, 4), np.round(p_value, 6)
+
+    results = {}
+    for i, name in enumerate(matrix.index):
+        if n[i] < 3:
+            results[name] = {"slope": 0, "r2": 0, "p_value": 1, "trend_class": "otillracklig_data"}
+            continue
+        if recheck[i]:
+            points = [(m, v) for m, v, ok in zip(x, y[i], present[i]) if ok]
+            results[name] = compute_linear_trends({name: points})[name]
+            continue
+        results[name] = {
+            "slope": slope[i],
+            "intercept": intercept[i],
+            "r2": r2[i],
+            "p_value": p_value[i],
+            "trend_class": str(trend_class[i]),
+        }
+    return results
+
+
 def compute_moving_averages(df, value_col, window=3):
     """Beraknar glidande medelvarde for en kolumn."""
     return df[value_col].rolling(window=window, min_periods=1).mean()
@@ -309,11 +364,122 @@ def detect_anomalies(values, labels=None, threshold=2.0):
     return anomalies
 
 
+def detect_anomalies_grouped(df, group_col, value_col, threshold=2.0, order_col=None):
+    """Z-score-avvikelser per grupp (t.ex. ventil) for alla rader i ett svep.
+
+    Samma regel som detect_anomalies inom varje grupp: populations-std,
+    |z| > threshold, inga avvikelser nar std=0. Returnerar en bool-Series
+    med df:s index. Grupper dar sista biten kan avgora (|z| nara threshold,
+    nastan konstant serie) raknas om med detect_anomalies i order_col-ordning.
+    """
+    if df.empty:
+        return pd.Series(False, index=df.index)
+    values = df[value_col].astype(float)
+    grouped = values.groupby(df[group_col], sort=False)
+    mean = grouped.transform("mean")
+    std = grouped.transform("std", ddof=0)
+    # Helt konstanta grupper: detect_anomalies ger std=0 eller |z|=1
+    constant = grouped.transform("min") == grouped.transform("max")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = ((values - mean) / std).abs()
+    flags = (z > threshold) & (std > 0) & ~constant
+
+    recheck = ((z - threshold).abs() < 1e-9) | ((std < 1e-9 * (mean.abs() + 1)) & ~constant)
+    if threshold < 1:
+        recheck |= constant
+    keys = df.loc[recheck, group_col].unique()
+    for _, rows in df[df[group_col].isin(keys)].groupby(group_col, sort=False):
+        if order_col is not None:
+            rows = rows.sort_values(order_col)
+        hits = [a["index"] for a in detect_anomalies(rows[value_col].values, threshold=threshold)]
+        flags[rows.index] = False
+        flags[rows.index[hits]] = True
+    return flags
+
+
+KPI_TOP_PAIRS = 25
+KPI_MIN_MONTHS = 6
+
+# Arsmedel per ventil ar ingen tidsserie: bara jamforelse mot de andra ventilerna
+ANOMALY_METHODS = {"ventil_tillganglighet": ("mad",)}
+# Minsta skala i procentenheter: ventiler nara 100 % har MAD nara 0, och
+# en dipp pa nagon tiondels procent ska inte ge ett stort utslag
+ANOMALY_MIN_SCALE = {"ventil_manad": 1.0, "gren_manad": 1.0, "ventil_tillganglighet": 1.0}
+# Manadsserier per ventil och gren halls utanfor sammanfattningen men sparas aven som utdrag
+VALVE_ANOMALY_MALS = ("ventil_manad", "gren_manad")
+
+
+def build_anomaly_series(energy_data, alarm_df, valve_df, year):
+    """Lang tabell (anomalier.SERIES_COLUMNS) med alla serier som ska granskas.
+
+    Manadsserier for anlaggningen, varje ventil och varje gren far
+    period = ar * 12 + manad, sa att flera ars data kan laggas efter
+    varandra. ventil_tillganglighet ar arsmedel per ventil, dar perioden
+    ar ventilens plats i listan.
+    """
+    parts = []
+
+    def add(mal, serie, months, labels, values):
+        parts.append(pd.DataFrame({
+            "mal": mal, "serie": serie,
+            "period": year * 12 + np.asarray(months, dtype=np.int64),
+            "label": labels, "varde": np.asarray(values, dtype=float),
+        }))
+
+    if energy_data:
+        months = [ed["Manad_nr"] for ed in energy_data]
+        labels = [ed["Manad"] for ed in energy_data]
+        for mal, key in [("energi_manad", "Total_kWh"), ("tomningar_manad", "Total_tomningar"),
+                         ("kwh_per_tomning_manad", "kWh_per_tomning")]:
+            add(mal, "anlaggning", months, labels, [ed[key] for ed in energy_data])
+
+    if not alarm_df.empty:
+        monthly = (alarm_df.groupby(["Manad_nr", "Manad"])["Aktuell"].sum()
+                   .reset_index().sort_values("Manad_nr"))
+        add("larm_manad", "anlaggning", monthly["Manad_nr"], monthly["Manad"], monthly["Aktuell"])
+
+    if not valve_df.empty:
+        add("ventil_manad", valve_df["Ventil_ID"].values, valve_df["Manad_nr"],
+            valve_df["Manad"].values, valve_df["Tillganglighet"])
+        branch = (valve_df.groupby(["Gren", "Manad_nr", "Manad"])["Tillganglighet"].mean()
+                  .reset_index())
+        add("gren_manad", branch["Gren"].astype(str).values, branch["Manad_nr"],
+            branch["Manad"].values, branch["Tillganglighet"])
+
+    series = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=SERIES_COLUMNS)
+
+    if not valve_df.empty:
+        avg_avail = valve_df.groupby("Ventil_ID")["Tillganglighet"].mean()
+        series = pd.concat([series, pd.DataFrame({
+            "mal": "ventil_tillganglighet", "serie": "alla",
+            "period": np.arange(len(avg_avail)), "label": avg_avail.index.values,
+            "varde": avg_avail.values,
+        })], ignore_index=True)
+    return series
+
+
+def collect_history(year):
+    """Manadsdata for ett tidigare ar (None om rapporterna saknas).
+
+    Anvands bara som baslinje for anomalimetoderna, t.ex. samma manad
+    foregaende ar.
+    """
+    report_files = get_report_files(year=year)
+    if not report_files:
+        return None
+    store = FactStore(report_files)
+    valve_df = collect_valve_monthly(store.table("ventilfakta", build_valve_facts))
+    energy_data = store.table("trend_energi", collect_energy_detail)
+    alarm_df = store.table("trend_larm", collect_alarm_detail)
+    return build_anomaly_series(energy_data, alarm_df, valve_df, year)
+
+
 def compute_correlations(data_pairs):
     """Beraknar Pearson och Spearman for par av serier.
 
     data_pairs: {namn: (x_array, y_array)}
     """
+    from scipy import stats
     results = {}
     for name, (x, y) in data_pairs.items():
         x = np.array(x, dtype=float)
@@ -326,40 +492,72 @@ def compute_correlations(data_pairs):
         pr, pp = stats.pearsonr(x, y)
         sr, sp = stats.spearmanr(x, y)
 
-        if abs(pr) > 0.7:
-            tolkning = "stark"
-        elif abs(pr) > 0.4:
-            tolkning = "mattlig"
-        else:
-            tolkning = "svag"
-        riktning = "positiv" if pr > 0 else "negativ"
-
         results[name] = {
             "pearson_r": round(pr, 4),
             "pearson_p": round(pp, 6),
             "spearman_r": round(sr, 4),
             "spearman_p": round(sp, 6),
-            "tolkning": f"{tolkning} {riktning}",
+            "tolkning": interpret(pr),
         }
     return results
 
 
+def build_kpi_matrix(energy_data, alarm_df, valve_df, sheet1_df):
+    """Tabell manad x nyckeltal for korrelationer mellan alla par.
+
+    Anlaggningens energi, drifttid, tomningar och larm, ventilernas
+    tillganglighet och fel, varje fraktions kWh och tomningar, varje
+    larmkategori och alla numeriska Sheet1-nyckeltal.
+    """
+    columns = {}
+    if energy_data:
+        months = [ed["Manad_nr"] for ed in energy_data]
+        for name, key in [("Energi kWh", "Total_kWh"), ("Drifttid h", "Drifttid_h"),
+                          ("Tomningar", "Total_tomningar"), ("kWh per tomning", "kWh_per_tomning")]:
+            columns[name] = pd.Series([ed[key] for ed in energy_data], index=months)
+        fractions = pd.DataFrame([{"Manad_nr": ed["Manad_nr"], **fr}
+                                  for ed in energy_data for fr in ed["Fraktioner"]])
+        if not fractions.empty:
+            for col, label in [("kWh", "kWh"), ("Tomningar", "tomningar")]:
+                wide = fractions.pivot_table(index="Manad_nr", columns="Fraktion",
+                                             values=col, aggfunc="sum")
+                for frac in wide.columns:
+                    columns[f"{frac}: {label}"] = wide[frac]
+
+    if not alarm_df.empty:
+        columns["Larm totalt"] = alarm_df.groupby("Manad_nr")["Aktuell"].sum()
+        wide = alarm_df.pivot_table(index="Manad_nr", columns="Kategori",
+                                    values="Aktuell", aggfunc="sum")
+        for cat in wide.columns:
+            columns[f"Larm: {cat}"] = wide[cat]
+
+    if not valve_df.empty:
+        columns["Tillganglighet medel"] = valve_df.groupby("Manad_nr")["Tillganglighet"].mean()
+        columns["Ventilfel totalt"] = valve_df.groupby("Manad_nr")["Totala_fel"].sum()
+
+    if not sheet1_df.empty:
+        wide = sheet1_df.pivot_table(index="Manad_nr", columns="Nyckel",
+                                     values="Varde", aggfunc="first")
+        for key in wide.columns:
+            columns[f"Sheet1: {key}"] = wide[key]
+
+    if not columns:
+        return pd.DataFrame()
+    return pd.DataFrame(columns).sort_index().astype(float)
+
+
 def detect_seasonal_patterns(values, max_lag=6):
-    """Detekterar sasongsmonster via autokorrelation."""
+    """Detekterar sasongsmonster via autokorrelation (en serie, se sasong.py)."""
     arr = np.array(values, dtype=float)
-    arr = arr - np.nanmean(arr)
-    n = len(arr)
-    if n < 6:
+    if len(arr) < 6:
         return {"har_sasongsmonster": False}
 
-    norm = np.sum(arr ** 2)
-    if norm == 0:
+    acf = autocorrelation(arr, max_lag)[0]
+    if np.isnan(acf).all():
         return {"har_sasongsmonster": False}
 
-    autocorr = []
-    for lag in range(1, min(max_lag + 1, n)):
-        c = np.sum(arr[:n-lag] * arr[lag:]) / norm
-        autocorr.append({"lag": lag, "korrelation": round(float(c), 4)})
+    autocorr = [{"lag": lag, "korrelation": round(float(c), 4)}
+                for lag, c in enumerate(acf, start=1)]
 
     peak_lag = max(autocorr, key=lambda x: x["korrelation"])
     return {
@@ -393,14 +591,9 @@ def compute_branch_analysis(valve_df):
     worst_per_branch.columns = ["Gren", "samsta_ventil"]
     grenar = grenar.merge(worst_per_branch, on="Gren", how="left")
 
-    # Trendberakning per gren
-    trend_results = {}
-    for gren in valve_df["Gren"].unique():
-        gren_data = valve_df[valve_df["Gren"] == gren]
-        monthly = gren_data.groupby("Manad_nr")["Tillganglighet"].mean()
-        points = [(m, v) for m, v in monthly.items()]
-        tr = compute_linear_trends({f"gren_{gren}": points})
-        trend_results[gren] = tr[f"gren_{gren}"]
+    # Trendberakning per gren (gren x manad, medeltillganglighet)
+    monthly = valve_df.groupby(["Gren", "Manad_nr"])["Tillganglighet"].mean().unstack()
+    trend_results = compute_linear_trends_matrix(monthly)
 
     grenar["trend_class"] = grenar["Gren"].map(lambda g: trend_results.get(g, {}).get("trend_class", "?"))
     grenar["trend_slope"] = grenar["Gren"].map(lambda g: trend_results.get(g, {}).get("slope", 0))
@@ -459,37 +652,29 @@ def save_trend_anlaggning(energy_data, alarm_df, trends):
         df[f"{col}_MA3"] = compute_moving_averages(df, col, 3).round(1)
 
     path = OUTPUT_DIR / "trend_anlaggning.csv"
-    df.to_csv(path, index=False, encoding="utf-8-sig")
+    save_table(df, path)
     print(f"  Sparad: {path}")
     return df
 
 
-def save_trend_ventiler(valve_df, trends_per_valve):
+def save_trend_ventiler(valve_df, trends_per_valve, season_valves=None):
     """Sparar per-ventil trenddata."""
     # Lagg till trendklassning
     valve_out = valve_df.copy()
-    valve_out["trend_class"] = valve_out["Ventil_ID"].map(
-        lambda vid: trends_per_valve.get(vid, {}).get("trend_class", "?")
-    )
+    trend_classes = {vid: t.get("trend_class", "?") for vid, t in trends_per_valve.items()}
+    valve_out["trend_class"] = valve_out["Ventil_ID"].map(trend_classes).fillna("?")
 
-    # Anomaliflaggor per ventil
-    anomaly_flags = {}
-    for vid in valve_df["Ventil_ID"].unique():
-        vdata = valve_df[valve_df["Ventil_ID"] == vid].sort_values("Manad_nr")
-        anomalies = detect_anomalies(
-            vdata["Tillganglighet"].values,
-            labels=vdata["Manad"].values,
-        )
-        if anomalies:
-            for a in anomalies:
-                anomaly_flags[(vid, a["label"])] = True
+    # Anomaliflaggor per ventil (z-score inom ventilens manader)
+    valve_out["anomali"] = detect_anomalies_grouped(
+        valve_df, "Ventil_ID", "Tillganglighet", order_col="Manad_nr")
 
-    valve_out["anomali"] = valve_out.apply(
-        lambda r: anomaly_flags.get((r["Ventil_ID"], r["Manad"]), False), axis=1
-    )
+    # Starkaste autokorrelation per ventil (sasong.py)
+    if season_valves is not None:
+        valve_out["sasong_lag"] = valve_out["Ventil_ID"].map(season_valves["starkast_lag"])
+        valve_out["sasong_korrelation"] = valve_out["Ventil_ID"].map(season_valves["korrelation"])
 
     path = OUTPUT_DIR / "trend_ventiler.csv"
-    valve_out.to_csv(path, index=False, encoding="utf-8-sig")
+    save_table(valve_out, path)
     print(f"  Sparad: {path}")
     return valve_out
 
@@ -497,7 +682,7 @@ def save_trend_ventiler(valve_df, trends_per_valve):
 def save_trend_grenar(branch_df):
     """Sparar grenanalys."""
     path = OUTPUT_DIR / "trend_grenar.csv"
-    branch_df.round(2).to_csv(path, index=False, encoding="utf-8-sig")
+    save_table(branch_df.round(2), path)
     print(f"  Sparad: {path}")
 
 
@@ -508,16 +693,27 @@ def save_correlations(corr_results):
         rows.append({"Par": name, **vals})
     df = pd.DataFrame(rows)
     path = OUTPUT_DIR / "trend_korrelationer.csv"
-    df.to_csv(path, index=False, encoding="utf-8-sig")
+    save_table(df, path)
     print(f"  Sparad: {path}")
 
 
-def save_anomalies(all_anomalies):
-    """Sparar alla detekterade avvikelser."""
+def save_kpi_correlations(kpi_pairs):
+    """Sparar de starkaste korrelationerna mellan alla nyckeltal."""
+    path = OUTPUT_DIR / "trend_kpi_korrelationer.csv"
+    save_table(kpi_pairs, path)
+    print(f"  Sparad: {path} ({len(kpi_pairs)} par)")
+
+
+def save_anomalies(anomaly_df):
+    """Sparar alla avvikelser och, som utdrag, ventilernas och grenarnas."""
     path = OUTPUT_DIR / "trend_anomalier.csv"
-    df = pd.DataFrame(all_anomalies)
-    df.to_csv(path, index=False, encoding="utf-8-sig")
+    df = anomaly_df.reindex(columns=ANOMALY_COLUMNS)
+    save_table(df, path)
     print(f"  Sparad: {path} ({len(df)} anomalier)")
+    valve_df = df[df["mal"].isin(VALVE_ANOMALY_MALS)].reset_index(drop=True)
+    path = OUTPUT_DIR / "trend_anomalier_ventiler.csv"
+    save_table(valve_df, path)
+    print(f"  Sparad: {path} ({len(valve_df)} anomalier)")
 
 
 # ---------------------------------------------------------------------------
@@ -526,6 +722,7 @@ def save_anomalies(all_anomalies):
 
 def create_energy_plots(anlaggning_df, energy_data, corr_results):
     """4 individuella grafer: energitrend+MA, kWh/tomning, fraktionsarea, korrelationsscatter."""
+    plt = pyplot()
     months = anlaggning_df["Manad"].values
 
     # 1. Energitrend + MA
@@ -619,6 +816,7 @@ def create_energy_plots(anlaggning_df, energy_data, corr_results):
 
 def create_valve_plots(valve_df):
     """4 individuella grafer: tillganglighetstrend, feltyper area, topp-10 spaghetti, felfordelning histogram."""
+    plt = pyplot()
 
     # 1. Medeltillganglighet per manad
     fig, ax = plt.subplots(figsize=(10, 3.5))
@@ -690,6 +888,7 @@ def create_valve_plots(valve_df):
 
 def create_branch_plots(branch_df, valve_df):
     """2 individuella grafer: halsopoang-ranking, tillganglighets-heatmap."""
+    plt = pyplot()
 
     # 1. Halsopoang ranking (horisontell bar)
     fig, ax = plt.subplots(figsize=(10, 3.5))
@@ -737,6 +936,7 @@ def create_branch_plots(branch_df, valve_df):
 
 def create_alarm_plots(alarm_df, anomalies):
     """2 individuella grafer: larmtrend med trendlinjer + anomalimarkorer, nuv vs forega ar."""
+    plt = pyplot()
 
     if alarm_df.empty:
         # Spara tomma grafer
@@ -825,138 +1025,165 @@ def main():
         return
 
     print(f"Laser {len(report_files)} rapporter for djupanalys...\n")
+    store = FactStore(report_files)
 
     # --- Datainsamling ---
-    print("1. Samlar ventildata (Sheet9+11)...")
-    valve_df = collect_valve_monthly(report_files)
-    print(f"   {len(valve_df)} rader, {valve_df['Ventil_ID'].nunique()} ventiler")
-
-    print("2. Samlar energi- och fraktionsdata (Sheet3+5)...")
-    energy_data = collect_energy_detail(report_files)
-    print(f"   {len(energy_data)} manader")
-
-    print("3. Samlar maskindata (Sheet7)...")
-    machine_df = collect_machine_monthly(report_files)
-    print(f"   {len(machine_df)} rader")
-
-    print("4. Samlar larmdata (Sheet13)...")
-    alarm_df = collect_alarm_detail(report_files)
-    print(f"   {len(alarm_df)} rader")
+    with span("trendanalys: datainsamling") as steg:
+        print("1. Samlar ventildata (Sheet9+11)...")
+        with span("trendanalys: ventildata") as s:
+            valve_df = collect_valve_monthly(store.table("ventilfakta", build_valve_facts))
+            s["rader"] = len(valve_df)
+        print(f"   {len(valve_df)} rader, {valve_df['Ventil_ID'].nunique()} ventiler")
+
+        print("2. Samlar energi- och fraktionsdata (Sheet3+5)...")
+        with span("trendanalys: energidata") as s:
+            energy_data = store.table("trend_energi", collect_energy_detail)
+            s["rader"] = len(energy_data)
+        print(f"   {len(energy_data)} manader")
+
+        print("3. Samlar maskindata (Sheet7)...")
+        with span("trendanalys: maskindata") as s:
+            machine_df = store.table("trend_maskiner", collect_machine_monthly)
+            s["rader"] = len(machine_df)
+        print(f"   {len(machine_df)} rader")
+
+        print("4. Samlar larmdata (Sheet13)...")
+        with span("trendanalys: larmdata") as s:
+            alarm_df = store.table("trend_larm", collect_alarm_detail)
+            s["rader"] = len(alarm_df)
+        print(f"   {len(alarm_df)} rader")
+        steg["rader"] = len(valve_df) + len(energy_data) + len(machine_df) + len(alarm_df)
 
     # --- Berakningar ---
-    print("\n5. Beraknar trender...")
-    # Anlaggningstrender
-    anlaggning_series = {}
-    for col_name, ed_key in [("energi", "Total_kWh"), ("tomningar", "Total_tomningar"),
-                              ("kwh_per_tomning", "kWh_per_tomning")]:
-        anlaggning_series[col_name] = [(ed["Manad_nr"], ed[ed_key]) for ed in energy_data]
-
-    if not alarm_df.empty:
-        monthly_alarms = alarm_df.groupby("Manad_nr")["Aktuell"].sum()
-        anlaggning_series["larm"] = [(m, v) for m, v in monthly_alarms.items()]
-
-    anlaggning_trends = compute_linear_trends(anlaggning_series)
-    for name, t in anlaggning_trends.items():
-        print(f"   {name}: {t['trend_class']} (R2={t['r2']:.3f}, p={t['p_value']:.4f})")
-
-    # Per-ventil trender
-    print("6. Beraknar ventiltrender...")
-    trends_per_valve = {}
-    for vid in valve_df["Ventil_ID"].unique():
-        vdata = valve_df[valve_df["Ventil_ID"] == vid].sort_values("Manad_nr")
-        points = [(r["Manad_nr"], r["Tillganglighet"]) for _, r in vdata.iterrows()]
-        tr = compute_linear_trends({vid: points})
-        trends_per_valve[vid] = tr[vid]
+    with span("trendanalys: trender") as steg:
+        print("\n5. Beraknar trender...")
+        # Anlaggningstrender
+        anlaggning_series = {}
+        for col_name, ed_key in [("energi", "Total_kWh"), ("tomningar", "Total_tomningar"),
+                                  ("kwh_per_tomning", "kWh_per_tomning")]:
+            anlaggning_series[col_name] = [(ed["Manad_nr"], ed[ed_key]) for ed in energy_data]
+
+        if not alarm_df.empty:
+            monthly_alarms = alarm_df.groupby("Manad_nr")["Aktuell"].sum()
+            anlaggning_series["larm"] = [(m, v) for m, v in monthly_alarms.items()]
+
+        anlaggning_trends = compute_linear_trends(anlaggning_series)
+        for name, t in anlaggning_trends.items():
+            print(f"   {name}: {t['trend_class']} (R2={t['r2']:.3f}, p={t['p_value']:.4f})")
+
+        # Per-ventil trender
+        print("6. Beraknar ventiltrender...")
+        availability = valve_df.pivot(index="Ventil_ID", columns="Manad_nr",
+                                      values="Tillganglighet")
+        trends_per_valve = compute_linear_trends_matrix(
+            availability.reindex(valve_df["Ventil_ID"].unique()))
+        steg["rader"] = len(valve_df)
+        steg["serier"] = len(anlaggning_trends) + len(trends_per_valve)
 
     # Grenanalys
-    print("7. Beraknar grenanalys...")
-    branch_df = compute_branch_analysis(valve_df)
-    print(f"   {len(branch_df)} grenar")
+    with span("trendanalys: grenanalys", rader=len(valve_df)) as steg:
+        print("7. Beraknar grenanalys...")
+        branch_df = compute_branch_analysis(valve_df)
+        print(f"   {len(branch_df)} grenar")
+        steg["grenar"] = len(branch_df)
 
     # Korrelationer
-    print("8. Beraknar korrelationer...")
-    corr_pairs = {}
-    if not alarm_df.empty and energy_data:
-        e_vals = [ed["Total_kWh"] for ed in energy_data]
-        t_vals = [ed["Total_tomningar"] for ed in energy_data]
-        monthly_alarms_list = []
-        for ed in energy_data:
-            m = ed["Manad_nr"]
-            a = alarm_df[alarm_df["Manad_nr"] == m]["Aktuell"].sum()
-            monthly_alarms_list.append(a)
-
-        corr_pairs["energi_vs_tomningar"] = (e_vals, t_vals)
-        corr_pairs["energi_vs_larm"] = (e_vals, monthly_alarms_list)
-        corr_pairs["tomningar_vs_larm"] = (t_vals, monthly_alarms_list)
-
-    if not valve_df.empty:
-        monthly_avail = valve_df.groupby("Manad_nr")["Tillganglighet"].mean()
-        monthly_errors = valve_df.groupby("Manad_nr")["Totala_fel"].sum()
-        common_months = sorted(set(monthly_avail.index) & set(monthly_errors.index))
-        if len(common_months) >= 3:
-            corr_pairs["tillganglighet_vs_fel"] = (
-                [monthly_avail[m] for m in common_months],
-                [monthly_errors[m] for m in common_months],
-            )
-
-    corr_results = compute_correlations(corr_pairs)
-    for name, c in corr_results.items():
-        print(f"   {name}: {c['tolkning']} (r={c['pearson_r']:.3f})")
+    with span("trendanalys: korrelationer") as steg:
+        print("8. Beraknar korrelationer...")
+        corr_pairs = {}
+        if not alarm_df.empty and energy_data:
+            e_vals = [ed["Total_kWh"] for ed in energy_data]
+            t_vals = [ed["Total_tomningar"] for ed in energy_data]
+            monthly_alarms_list = []
+            for ed in energy_data:
+                m = ed["Manad_nr"]
+                a = alarm_df[alarm_df["Manad_nr"] == m]["Aktuell"].sum()
+                monthly_alarms_list.append(a)
+
+            corr_pairs["energi_vs_tomningar"] = (e_vals, t_vals)
+            corr_pairs["energi_vs_larm"] = (e_vals, monthly_alarms_list)
+            corr_pairs["tomningar_vs_larm"] = (t_vals, monthly_alarms_list)
+
+        if not valve_df.empty:
+            monthly_avail = valve_df.groupby("Manad_nr")["Tillganglighet"].mean()
+            monthly_errors = valve_df.groupby("Manad_nr")["Totala_fel"].sum()
+            common_months = sorted(set(monthly_avail.index) & set(monthly_errors.index))
+            if len(common_months) >= 3:
+                corr_pairs["tillganglighet_vs_fel"] = (
+                    [monthly_avail[m] for m in common_months],
+                    [monthly_errors[m] for m in common_months],
+                )
+
+        corr_results = compute_correlations(corr_pairs)
+        for name, c in corr_results.items():
+            print(f"   {name}: {c['tolkning']} (r={c['pearson_r']:.3f})")
+
+        # Alla par av nyckeltal
+        kpi = build_kpi_matrix(energy_data, alarm_df, valve_df,
+                               store.table("trend_sheet1", collect_sheet1_kpis))
+        kpi_pairs = top_pairs(kpi, k=KPI_TOP_PAIRS, min_periods=KPI_MIN_MONTHS)
+        print(f"   {kpi.shape[1]} nyckeltal, {kpi.shape[1] * (kpi.shape[1] - 1) // 2} par")
+        for _, c in kpi_pairs.head(3).iterrows():
+            print(f"   {c['KPI_1']} / {c['KPI_2']}: {c['tolkning']} "
+                  f"(r={c['pearson_r']:.3f}, q={c['q_varde']:.3f})")
+        steg["par"] = len(corr_results)
+        steg["nyckeltal"] = kpi.shape[1]
 
     # Anomalier
-    print("9. Detekterar anomalier...")
-    all_anomalies = []
-
-    # Energi-anomalier
-    energy_vals = [ed["Total_kWh"] for ed in energy_data]
-    energy_labels = [ed["Manad"] for ed in energy_data]
-    for a in detect_anomalies(energy_vals, energy_labels):
-        a["mal"] = "energi_manad"
-        all_anomalies.append(a)
-
-    # Larm-anomalier
-    if not alarm_df.empty:
-        monthly_alarms_s = alarm_df.groupby(["Manad_nr", "Manad"])["Aktuell"].sum().reset_index().sort_values("Manad_nr")
-        alarm_vals = monthly_alarms_s["Aktuell"].values
-        alarm_labels = monthly_alarms_s["Manad"].values
-        for a in detect_anomalies(alarm_vals, alarm_labels):
-            a["mal"] = "larm_manad"
-            all_anomalies.append(a)
-
-    # Ventil-anomalier (arsmedelvardet)
-    if not valve_df.empty:
-        avg_avail = valve_df.groupby("Ventil_ID")["Tillganglighet"].mean()
-        for a in detect_anomalies(avg_avail.values, avg_avail.index.values):
-            a["mal"] = "ventil_tillganglighet"
-            all_anomalies.append(a)
-
-    print(f"   {len(all_anomalies)} anomalier detekterade")
+    with span("trendanalys: anomalier") as steg:
+        print("9. Detekterar anomalier...")
+        series = build_anomaly_series(energy_data, alarm_df, valve_df, REPORT_YEAR)
+        history = collect_history(REPORT_YEAR - 1)
+        if history is not None:
+            print(f"   Baslinje fran {REPORT_YEAR - 1}: {history['period'].nunique()} manader")
+            series = pd.concat([history.assign(rapport=False), series.assign(rapport=True)],
+                               ignore_index=True)
+        anomaly_df = detect_series_anomalies(series, methods=ANOMALY_METHODS,
+                                             min_scale=ANOMALY_MIN_SCALE)
+        per_valve = anomaly_df["mal"].isin(VALVE_ANOMALY_MALS)
+        all_anomalies = anomaly_df[~per_valve].to_dict("records")
+        energy_vals = [ed["Total_kWh"] for ed in energy_data]
+
+        print(f"   {len(all_anomalies)} anomalier detekterade, "
+              f"{int(per_valve.sum())} i ventilernas och grenarnas manadsserier")
+        steg["rader"] = len(anomaly_df)
 
     # Sasongsmonster
-    print("10. Kontrollerar sasongsmonster...")
-    season_energy = detect_seasonal_patterns(energy_vals)
-    print(f"    Energi: {'Ja' if season_energy['har_sasongsmonster'] else 'Nej'} "
-          f"(lag={season_energy.get('starkast_lag', '-')}, r={season_energy.get('korrelation', 0):.3f})")
+    with span("trendanalys: sasongsmonster", rader=len(energy_vals)) as steg:
+        print("10. Kontrollerar sasongsmonster...")
+        season_energy = detect_seasonal_patterns(energy_vals)
+        print(f"    Energi: {'Ja' if season_energy['har_sasongsmonster'] else 'Nej'} "
+              f"(lag={season_energy.get('starkast_lag', '-')}, r={season_energy.get('korrelation', 0):.3f})")
+        season_valves = seasonality(availability)
+        print(f"    Ventiler: {int(season_valves['har_sasongsmonster'].sum())} av "
+              f"{len(season_valves)} med sasongsmonster")
+        steg["serier"] = 1 + len(season_valves)
 
     # --- Spara output ---
-    print("\nSparar CSV:er...")
-    anlaggning_df = save_trend_anlaggning(energy_data, alarm_df, anlaggning_trends)
-    save_trend_ventiler(valve_df, trends_per_valve)
-    save_trend_grenar(branch_df)
-    save_correlations(corr_results)
-    save_anomalies(all_anomalies)
-
-    print("\nSkapar grafer...")
-    create_energy_plots(anlaggning_df, energy_data, corr_results)
-    create_valve_plots(valve_df)
-    create_branch_plots(branch_df, valve_df)
-    create_alarm_plots(alarm_df, all_anomalies)
+    with span("trendanalys: spara csv") as steg:
+        print("\nSparar CSV:er...")
+        anlaggning_df = save_trend_anlaggning(energy_data, alarm_df, anlaggning_trends)
+        save_trend_ventiler(valve_df, trends_per_valve, season_valves)
+        save_trend_grenar(branch_df)
+        save_correlations(corr_results)
+        save_kpi_correlations(kpi_pairs)
+        save_anomalies(anomaly_df)
+        steg["rader"] = len(anlaggning_df) + len(valve_df) + len(branch_df)
+
+    if plots_enabled():
+        with span("trendanalys: grafer"):
+            print("\nSkapar grafer...")
+            create_energy_plots(anlaggning_df, energy_data, corr_results)
+            create_valve_plots(valve_df)
+            create_branch_plots(branch_df, valve_df)
+            create_alarm_plots(alarm_df, all_anomalies)
 
     # Sammanfattning
     print("\n" + "=" * 60)
     print("TRENDANALYS KLAR")
     print("=" * 60)
-    print(f"\nCSV:er: trend_anlaggning, trend_ventiler, trend_grenar, trend_korrelationer, trend_anomalier")
+    print(f"\nCSV:er: trend_anlaggning, trend_ventiler, trend_grenar, trend_korrelationer, "
+          f"trend_kpi_korrelationer, trend_anomalier, trend_anomalier_ventiler")
     print(f"Grafer: 12 individuella PNG-filer (energi x4, ventiler x4, grenar x2, larm x2)")
     print(f"\nNyckelresultat:")
     for name, t in anlaggning_trends.items():
@@ -969,7 +1196,7 @@ def main():
                   f"(tillg={r['medel_tillg']:.1f}%, fel/ventil={r['fel_per_ventil']:.0f})")
     print(f"\n  Anomalier: {len(all_anomalies)} detekterade")
     for a in all_anomalies[:5]:
-        print(f"    {a['mal']}: {a['label']} = {a['varde']} (z={a['z_score']:.1f})")
+        print(f"    {a['mal']}: {a['label']} = {a['varde']} (poang={a['robust_score']:.1f})")
     if len(all_anomalies) > 5:
         print(f"    ... och {len(all_anomalies) - 5} till")
 
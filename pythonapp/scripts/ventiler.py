@@ -12,91 +12,74 @@ Output:
   - Textsammanfattning till stdout
 """
 
+import numpy as np
 import pandas as pd
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
 
 from common import (
     OUTPUT_DIR,
     get_report_files,
-    read_sheet,
+    FactStore,
     ensure_output_dir,
+    as_bundles,
+    save_table,
+    plots_enabled,
+    pyplot,
 )
+from ventilfakta import ERROR_FIELDS, build_valve_facts
 
 
-def collect_availability_and_errors(report_files):
-    """Samlar ventiltillgänglighet och felkoder per månad från Sheet11.
+def collect_availability_and_errors(facts):
+    """Ventiltillgänglighet och felkoder per månad (Sheet11).
 
-    Sheet11 innehåller både Availability [%] och felkolumner
-    (DOES_NOT_OPEN, LEVEL_ERROR, etc.) per ventil-ID.
+    Vy ur ventilfaktatabellen. Returnerar (tillgänglighet, fel) där fel är
+    en rad per ventil, månad och feltyp med positivt antal.
     """
-    ERROR_COLS = {"DOES_NOT_CLOSE", "DOES_NOT_OPEN", "LEVEL_ERROR",
-                  "LONG_TIME_SINCE_LAST_COLLECTION", "ERROR_FEEDBACK_FROM_USER"}
-
-    avail_rows = []
-    error_rows = []
-
-    for month_num, month_name, filepath in report_files:
-        df = read_sheet(filepath, "Sheet11", header_row=3)
-
-        avail_col = [c for c in df.columns if "availability" in c.lower()]
-        id_col = "ID" if "ID" in df.columns else None
-        if not avail_col or not id_col:
-            continue
-
-        # Hitta felkolumner som finns i detta ark
-        found_error_cols = [c for c in df.columns if c in ERROR_COLS]
-
-        for _, row in df.iterrows():
-            vid = str(row[id_col]).strip()
-            if not vid or vid == "nan":
-                continue
-
-            val = pd.to_numeric(row[avail_col[0]], errors="coerce")
-            if pd.notna(val):
-                avail_rows.append({
-                    "Månad_nr": month_num,
-                    "Månad": month_name,
-                    "Ventil_ID": vid,
-                    "Tillgänglighet": val,
-                })
-
-            for ec in found_error_cols:
-                err_val = pd.to_numeric(row[ec], errors="coerce")
-                if pd.notna(err_val) and err_val > 0:
-                    error_rows.append({
-                        "Månad_nr": month_num,
-                        "Månad": month_name,
-                        "Ventil_ID": vid,
-                        "Feltyp": ec,
-                        "Antal": int(err_val),
-                    })
-
-    return pd.DataFrame(avail_rows), pd.DataFrame(error_rows)
-
-
-def collect_commands(report_files):
+    v = facts[facts["I_Sheet11"]]
+
+    avail = v[v["Tillganglighet"].notna()]
+    avail_df = pd.DataFrame({
+        "Månad_nr": avail["Manad_nr"],
+        "Månad": avail["Manad"],
+        "Ventil_ID": avail["Ventil_ID"],
+        "Tillgänglighet": avail["Tillganglighet"],
+    }).reset_index(drop=True)
+
+    errors = v.melt(id_vars=["Manad_nr", "Manad", "Ventil_ID"], value_vars=ERROR_FIELDS,
+                    var_name="Feltyp", value_name="Antal")
+    errors = errors[errors["Antal"] > 0]
+    error_df = pd.DataFrame({
+        "Månad_nr": errors["Manad_nr"],
+        "Månad": errors["Manad"],
+        "Ventil_ID": errors["Ventil_ID"],
+        "Feltyp": errors["Feltyp"].str.removeprefix("Fel_"),
+        "Antal": np.trunc(errors["Antal"]).astype(np.int64),
+    }).reset_index(drop=True)
+
+    return avail_df, error_df
+
+
+def collect_commands(bundles):
     """Samlar kommandostatistik per ventil från Sheet9."""
     rows = []
-    for month_num, month_name, filepath in report_files:
-        df = read_sheet(filepath, "Sheet9", header_row=3)
-        id_col = [c for c in df.columns if c.lower() == "id"]
-        cmd_cols = [c for c in df.columns if "open" in c.lower() or "cmd" in c.lower()]
+    for bundle in as_bundles(bundles):
+        df = bundle.sheet("Sheet9")
+        schema = bundle.schema("Sheet9")
+        id_col = schema.col("valve_id")
+        cmd_cols = schema.cols("commands")
 
         if not id_col:
             continue
 
         for _, row in df.iterrows():
-            vid = str(row[id_col[0]]).strip()
+            vid = str(row[id_col]).strip()
             if not vid or vid == "nan":
                 continue
             for cc in cmd_cols:
                 val = pd.to_numeric(row[cc], errors="coerce")
                 if pd.notna(val):
                     rows.append({
-                        "Månad_nr": month_num,
-                        "Månad": month_name,
+                        "Månad_nr": bundle.month_num,
+                        "Månad": bundle.month_name,
                         "Ventil_ID": vid,
                         "Kommando": cc.strip(),
                         "Antal": int(val),
@@ -125,7 +108,7 @@ def create_summary_csv(avail_df, error_df):
 
     summary = summary.sort_values("Medel_Tillgänglighet_%")
     output_path = OUTPUT_DIR / "ventiler.csv"
-    summary.to_csv(output_path, index=False, encoding="utf-8-sig")
+    save_table(summary, output_path)
     return summary
 
 
@@ -152,6 +135,7 @@ def create_monthly_summary(avail_df, error_df):
 
 def create_plots(avail_df, error_df):
     """Skapar graf med 2 subplots."""
+    plt = pyplot()
     monthly_avail, monthly_errors = create_monthly_summary(avail_df, error_df)
 
     fig, axes = plt.subplots(2, 1, figsize=(12, 9))
@@ -230,14 +214,17 @@ def main():
         return
 
     print(f"Läser {len(report_files)} rapporter...")
+    store = FactStore(report_files)
 
-    avail_df, error_df = collect_availability_and_errors(report_files)
-    commands_df = collect_commands(report_files)
+    avail_df, error_df = collect_availability_and_errors(store.table("ventilfakta", build_valve_facts))
+    commands_df = store.table("ventiler_kommandon", collect_commands)
 
     summary_df = create_summary_csv(avail_df, error_df)
     print(f"CSV sparad: {OUTPUT_DIR / 'ventiler.csv'}")
 
-    if not avail_df.empty:
+    if not plots_enabled():
+        print("Grafer avstängda — hoppar över graf.")
+    elif not avail_df.empty:
         plot_path = create_plots(avail_df, error_df)
         print(f"Graf sparad: {plot_path}")
     else:
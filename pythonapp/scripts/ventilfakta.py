@@ -0,0 +1,157 @@
+"""Gemensam faktatabell ventil × månad (Sheet9 × Sheet11).
+
+build_valve_facts() slår ihop kommandodata (Sheet9) och tillgänglighet/
+felkoder (Sheet11) per ventil och månad, kolumnvis utan iterrows().
+trendanalys, gren_djupanalys, manuell_analys och ventiler tar fram sina
+vyer ur samma tabell, så alla avsnitt räknar på samma siffror.
+
+Kolumner:
+  Manad_nr, Manad      Månad
+  Ventil_ID            ID som text, utan blanktecken runt
+  Gren, Ventilnr       Tolkat ur ID ("XX:Y"), -1 om ID:t inte går att tolka
+  Giltigt_ID           Sant om ID:t gick att tolka
+  I_Sheet9, I_Sheet11  Ventilen finns i respektive ark
+  Rad9, Rad11          Radens position i arket (för arkets ordning)
+  Tillganglighet       Availability [%], NaN om värde saknas
+  Fel_<kod>            Felräknare per ERROR_COLS-kod, 0 om ej positiv
+  MAN_OPEN_CMD, AUTO_OPEN_CMD, INLET_OPEN
+                       Kommandon (heltal, 0 om värde saknas)
+  Kommandon            Summa av alla kommandokolumner (open/cmd) i Sheet9
+
+Finns samma ID flera gånger i ett ark används sista raden.
+"""
+
+import numpy as np
+import pandas as pd
+
+from common import ERROR_COLS, as_bundles, parse_valve_id
+
+ERROR_FIELDS = [f"Fel_{ec}" for ec in ERROR_COLS]
+COMMAND_FIELDS = ["MAN_OPEN_CMD", "AUTO_OPEN_CMD", "INLET_OPEN"]
+
+FACT_DTYPES = {
+    "Manad_nr": np.int64, "Manad": object, "Ventil_ID": object,
+    "Gren": np.int64, "Ventilnr": np.int64, "Giltigt_ID": bool,
+    "I_Sheet9": bool, "I_Sheet11": bool, "Rad9": np.float64, "Rad11": np.float64,
+    "Tillganglighet": np.float64,
+    **{f: np.float64 for f in ERROR_FIELDS},
+    **{f: np.int64 for f in COMMAND_FIELDS}, "Kommandon": np.int64,
+}
+FACT_COLUMNS = list(FACT_DTYPES)
+
+
+def _valve_ids(df: pd.DataFrame, id_col: str) -> np.ndarray:
+    """ID-kolumnen som text, på samma sätt som str(v).strip()."""
+    return np.array([str(v).strip() for v in df[id_col].to_numpy()], dtype=object)
+
+
+def _numeric(df: pd.DataFrame, col: str | None) -> pd.Series:
+    """Kolumnen som tal (NaN där värdet inte är numeriskt eller saknas)."""
+    if col is None:
+        return pd.Series(np.nan, index=df.index)
+    return pd.to_numeric(df[col], errors="coerce").astype(np.float64)
+
+
+def _keyed(df: pd.DataFrame, ids: np.ndarray, values: dict) -> pd.DataFrame:
+    """Bygger en delram indexerad på Ventil_ID, utan ogiltiga ID:n."""
+    part = pd.DataFrame(values, index=df.index)
+    part["Ventil_ID"] = ids
+    part = part[(part["Ventil_ID"] != "") & (part["Ventil_ID"] != "nan")]
+    part = part.drop_duplicates("Ventil_ID", keep="last")
+    return part.set_index("Ventil_ID")
+
+
+def _sheet11_part(bundle) -> pd.DataFrame | None:
+    """Tillgänglighet och felkoder per ventil ur Sheet11."""
+    df = bundle.sheet("Sheet11")
+    schema = bundle.schema("Sheet11")
+    id_col = schema.col("valve_id")
+    avail_col = schema.col("availability")
+    if not id_col or not avail_col:
+        return None
+
+    values = {
+        "Rad11": np.arange(len(df), dtype=np.float64),
+        "Tillganglighet": _numeric(df, avail_col),
+    }
+    for ec, field in zip(ERROR_COLS, ERROR_FIELDS):
+        ev = _numeric(df, schema.col(ec))
+        values[field] = ev.where(ev > 0, 0.0)
+    return _keyed(df, _valve_ids(df, id_col), values)
+
+
+def _sheet9_part(bundle) -> pd.DataFrame | None:
+    """Kommandon per ventil ur Sheet9."""
+    df = bundle.sheet("Sheet9")
+    schema = bundle.schema("Sheet9")
+    id_col = schema.col("valve_id")
+    if not id_col:
+        return None
+
+    values = {"Rad9": np.arange(len(df), dtype=np.float64)}
+    for field in COMMAND_FIELDS:
+        values[field] = np.trunc(_numeric(df, schema.col(field.lower())).fillna(0))
+    kommandon = pd.Series(0.0, index=df.index)
+    for cc in schema.cols("commands"):
+        kommandon += np.trunc(_numeric(df, cc).fillna(0))
+    values["Kommandon"] = kommandon
+    return _keyed(df, _valve_ids(df, id_col), values)
+
+
+def _parse_ids(ids) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(gren, ventilnr, giltig) för varje ID; varje unikt ID tolkas en gång."""
+    parsed = {}
+    for vid in pd.unique(ids):
+        try:
+            parsed[vid] = (*parse_valve_id(vid), True)
+        except (ValueError, IndexError):
+            parsed[vid] = (-1, -1, False)
+    gren, ventilnr, giltig = zip(*(parsed[v] for v in ids)) if len(ids) else ((), (), ())
+    return (np.array(gren, dtype=np.int64), np.array(ventilnr, dtype=np.int64),
+            np.array(giltig, dtype=bool))
+
+
+def _empty_facts() -> pd.DataFrame:
+    return pd.DataFrame({c: pd.Series(dtype=t) for c, t in FACT_DTYPES.items()})
+
+
+def build_valve_facts(bundles) -> pd.DataFrame:
+    """Bygger faktatabellen ventil × månad för alla bundlar (i bundlarnas ordning).
+
+    Raderna ligger per månad i Sheet11-ordning, följda av ventiler som
+    bara finns i Sheet9 (i Sheet9-ordning).
+    """
+    months = []
+    for bundle in as_bundles(bundles):
+        s11 = _sheet11_part(bundle)
+        s9 = _sheet9_part(bundle)
+        parts = [p for p in (s11, s9) if p is not None]
+        if not parts:
+            continue
+
+        month = pd.concat(parts, axis=1, join="outer") if len(parts) == 2 else parts[0]
+        month = month.reindex(columns=["Rad9", "Rad11", "Tillganglighet",
+                                       *ERROR_FIELDS, *COMMAND_FIELDS, "Kommandon"])
+        month = month.sort_values(["Rad11", "Rad9"], na_position="last", kind="stable")
+        month = month.rename_axis("Ventil_ID").reset_index()
+        month.insert(0, "Manad_nr", bundle.month_num)
+        month.insert(1, "Manad", bundle.month_name)
+        months.append(month)
+
+    if not months:
+        return _empty_facts()
+
+    facts = pd.concat(months, ignore_index=True)
+    facts["I_Sheet9"] = facts["Rad9"].notna()
+    facts["I_Sheet11"] = facts["Rad11"].notna()
+    facts[ERROR_FIELDS] = facts[ERROR_FIELDS].fillna(0.0)
+    facts[[*COMMAND_FIELDS, "Kommandon"]] = (
+        facts[[*COMMAND_FIELDS, "Kommandon"]].fillna(0).astype(np.int64))
+    facts["Gren"], facts["Ventilnr"], facts["Giltigt_ID"] = _parse_ids(facts["Ventil_ID"].to_numpy())
+    facts["Manad_nr"] = facts["Manad_nr"].astype(np.int64)
+    return facts[FACT_COLUMNS]
+
+
+def total_errors(facts: pd.DataFrame) -> pd.Series:
+    """Summa felräknare per rad (heltal per kod, som int(värde))."""
+    return np.trunc(facts[ERROR_FIELDS]).astype(np.int64).sum(axis=1)
@@ -17,6 +17,49 @@ SCRIPTS_DIR = Path(__file__).resolve().parent.parent / "scripts"
 sys.path.insert(0, str(SCRIPTS_DIR))
 
 
+class FakeSheet:
+    """Minimal ersattning for ett xlrd-ark, byggd fran en lista av rader.
+
+    Tomma celler anges som "". Alla rader fylls ut till samma bredd.
+    """
+
+    def __init__(self, rows, name="Sheet"):
+        self.name = name
+        self.ncols = max((len(r) for r in rows), default=0)
+        self._rows = [list(r) + [""] * (self.ncols - len(r)) for r in rows]
+        self.nrows = len(self._rows)
+
+    def cell_value(self, rowx, colx):
+        return self._rows[rowx][colx]
+
+    def row_values(self, rowx, start_colx=0, end_colx=None):
+        return self._rows[rowx][start_colx:end_colx]
+
+    def col_values(self, colx, start_rowx=0, end_rowx=None):
+        return [r[colx] for r in self._rows[start_rowx:end_rowx]]
+
+    def col_types(self, colx, start_rowx=0, end_rowx=None):
+        return [self._cell_type(v) for v in self.col_values(colx, start_rowx, end_rowx)]
+
+    def row_types(self, rowx, start_colx=0, end_colx=None):
+        return [self._cell_type(v) for v in self.row_values(rowx, start_colx, end_colx)]
+
+    @staticmethod
+    def _cell_type(value):
+        # Samma koder som xlrd: 0 = tom, 1 = text, 2 = tal
+        if value == "":
+            return 0
+        if isinstance(value, (int, float)):
+            return 2
+        return 1
+
+
+@pytest.fixture
+def make_sheet():
+    """Fabrik for FakeSheet-objekt."""
+    return FakeSheet
+
+
 @pytest.fixture
 def output_dir(tmp_path):
     """Temporar output-katalog."""
@@ -391,7 +434,7 @@ def drifterfarenheter_data(valve_monthly_df, manual_df, trend_anlaggning_df):
         "ventiler": valve_monthly_df,
         "anlaggning": trend_anlaggning_df,
         "grenar": pd.DataFrame(),
-        "anomalier": pd.DataFrame(columns=["mal", "label", "varde", "z_score", "typ"]),
+        "anomalier": pd.DataFrame(columns=["mal", "label", "varde", "robust_score", "typ"]),
         "manuell_analys": monthly,
         "manuell_ventiler": mv,
     }
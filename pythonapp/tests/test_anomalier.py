@@ -0,0 +1,157 @@
+"""Tester for anomalier.py — robust avvikelsedetektering over manga serier."""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from anomalier import (
+    ANOMALY_COLUMNS,
+    METHODS,
+    detect_series_anomalies,
+    mad_baseline,
+    rolling_baseline,
+    seasonal_baseline,
+)
+from trendanalys import detect_anomalies
+
+# Tomma fonster och serier utan varden ger NaN med varning fran numpy
+pytestmark = pytest.mark.filterwarnings("ignore::RuntimeWarning")
+
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "Maj", "Jun", "Jul", "Aug", "Sep", "Okt", "Nov", "Dec"]
+
+
+def long_table(series, mal="test", start=0):
+    """{serie: varden} -> lang tabell med en period per varde."""
+    rows = []
+    for name, values in series.items():
+        for i, v in enumerate(values):
+            rows.append({"mal": mal, "serie": name, "period": start + i,
+                         "label": MONTHS[(start + i) % 12], "varde": v})
+    return pd.DataFrame(rows)
+
+
+class TestBaselines:
+    def test_mad_ignores_single_spike(self):
+        y = np.array([[10.0, 11, 9, 10, 12, 10, 500]])
+        baseline, scale = mad_baseline(y)
+        assert baseline[0, 0] == 10
+        assert scale[0, 0] == pytest.approx(1.4826)
+
+    def test_mad_falls_back_to_mean_abs_deviation(self):
+        y = np.array([[100.0] * 10 + [90.0, 80.0]])
+        _, scale = mad_baseline(y)
+        assert scale[0, 0] == pytest.approx(30 / 12 * 1.2533)
+
+    def test_rolling_uses_only_earlier_periods(self):
+        y = np.array([[1.0, 2, 3, 4, 100]])
+        baseline, _ = rolling_baseline(y, window=3)
+        assert np.isnan(baseline[0, :3]).all()
+        assert baseline[0, 3] == 2
+        assert baseline[0, 4] == 3
+
+    def test_seasonal_adds_median_change(self):
+        first = np.arange(12.0)
+        y = np.concatenate([first, first + 5])[None, :]
+        baseline, _ = seasonal_baseline(y)
+        assert np.isnan(baseline[0, :12]).all()
+        np.testing.assert_allclose(baseline[0, 12:], first + 5)
+
+    def test_seasonal_needs_earlier_season(self):
+        baseline, _ = seasonal_baseline(np.arange(12.0)[None, :])
+        assert np.isnan(baseline).all()
+
+
+class TestDetectSeriesAnomalies:
+    def test_columns_compatible_with_trend_anomalier(self):
+        result = detect_series_anomalies(long_table({"a": [10, 11, 9, 10, 12, 10, 50]}))
+        assert list(result.columns) == ANOMALY_COLUMNS
+        # Tidigare kolumner forst och i samma ordning; nya kolumner sist
+        assert ANOMALY_COLUMNS[:6] == ["index", "label", "varde", "z_score", "typ", "mal"]
+        assert (result["z_score"] == result["robust_score"]).all()
+        row = result.iloc[0]
+        assert (row["index"], row["label"], row["typ"]) == (6, "Jul", "hog")
+        assert row["serie"] == "a" and row["varde"] == 50
+
+    def test_one_row_per_point_with_all_methods(self):
+        result = detect_series_anomalies(long_table({"a": [10, 11, 9, 10, 12, 10, 50]}),
+                                         methods=("mad", "rullande"))
+        assert len(result) == 1
+        assert result.iloc[0]["metod"] == "mad,rullande"
+
+    def test_robust_finds_masked_spikes(self):
+        # Tva stora spikar blaser upp std sa att z-score missar den mindre
+        values = [10, 11, 9, 10, 60, 10, 11, 9, 10, 200, 10, 11]
+        assert [a["index"] for a in detect_anomalies(values)] == [9]
+        result = detect_series_anomalies(long_table({"a": values}), methods=("mad",))
+        assert list(result["index"]) == [4, 9]
+
+    def test_zscore_method_matches_detect_anomalies(self):
+        values = [5.0, 6, 5, 7, 30, 6, 5, 6, 4, 5, 6, -12]
+        expected = detect_anomalies(values, MONTHS)
+        result = detect_series_anomalies(long_table({"a": values}), methods=("zscore",))
+        assert list(result["index"]) == [a["index"] for a in expected]
+        assert list(result["robust_score"]) == [a["z_score"] for a in expected]
+
+    def test_many_series_in_one_call(self):
+        rng = np.random.default_rng(1)
+        series = {f"v{i}": rng.normal(95, 1, 12) for i in range(200)}
+        series["v7"][3] = 40
+        series["v150"][10] = 140
+        result = detect_series_anomalies(long_table(series), methods=("mad",),
+                                         thresholds={"mad": 20})
+        assert list(zip(result["serie"], result["index"])) == [("v7", 3), ("v150", 10)]
+
+    def test_min_scale_ignores_small_dips(self):
+        # Ventiler nara 100 % har MAD 0; sma dippar ska inte ge stora utslag
+        rng = np.random.default_rng(2)
+        series = {}
+        for i in range(1000):
+            values = np.full(12, 100.0)
+            values[rng.integers(0, 12)] -= rng.uniform(0.1, 2.0)
+            series[f"v{i}"] = values
+        series["v5"][8] = 85.0
+        table = long_table(series, mal="ventil_manad")
+        assert len(detect_series_anomalies(table, methods=("mad",))) > 500
+        result = detect_series_anomalies(table, methods=("mad",),
+                                         min_scale={"ventil_manad": 1.0})
+        assert list(zip(result["serie"], result["index"])) == [("v5", 8)]
+        assert result.iloc[0]["typ"] == "lag"
+
+    def test_methods_per_mal(self):
+        table = pd.concat([long_table({"a": [1, 1, 2, 1, 30]}, mal="x"),
+                           long_table({"a": [1, 1, 2, 1, 30]}, mal="y")])
+        result = detect_series_anomalies(table, methods={"x": ("mad",), "y": ("zscore",)},
+                                         thresholds={"zscore": 5})
+        assert list(result["mal"]) == ["x"]
+
+    def test_history_only_as_baseline(self):
+        last_year = [100.0, 90, 80, 70, 60, 50, 50, 60, 70, 80, 90, 100]
+        this_year = [v + 2 for v in last_year]
+        this_year[5] = 80  # Jun: normal niva for aret, men inte for juni
+        table = pd.concat([long_table({"a": last_year}).assign(rapport=False),
+                           long_table({"a": this_year}, start=12).assign(rapport=True)])
+        table.loc[table["period"] < 12, "varde"] += np.tile([0.0, 0.5, -0.5], 4)
+        result = detect_series_anomalies(table, methods=("sasong",))
+        assert list(result["label"]) == ["Jun"]
+        assert result.iloc[0]["index"] == 5
+        assert result.iloc[0]["baslinje"] == pytest.approx(52, abs=0.5)
+
+    def test_missing_periods_and_short_series(self):
+        table = long_table({"a": [10, 11, 9, 10, 12, 10, 50], "kort": [1, 100]})
+        table = table[table["period"] != 2]
+        result = detect_series_anomalies(table, methods=("mad",))
+        assert list(result["serie"]) == ["a"]
+        assert result.iloc[0]["index"] == 5
+
+    def test_constant_series_not_flagged(self):
+        result = detect_series_anomalies(long_table({"a": [100.0] * 12}))
+        assert result.empty
+        assert list(result.columns) == ANOMALY_COLUMNS
+
+    def test_all_methods_registered(self):
+        assert set(METHODS) == {"zscore", "mad", "rullande", "sasong"}
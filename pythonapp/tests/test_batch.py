@@ -0,0 +1,143 @@
+"""Tester for batch.py — flera anlaggningar i en delad processpool."""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+import batch
+import common
+import katalog
+from pipeline import Stage
+
+
+@pytest.fixture
+def facilities(tmp_path, monkeypatch):
+    """Tre anlaggningar med 3, 1 och 2 rapportfiler."""
+    monkeypatch.setattr(common, "CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr(common, "CACHE_ENABLED", False)
+    monkeypatch.setattr(katalog, "_CATALOGS", {})
+    dirs = []
+    for name, months in [("Norra/rapporter", 3), ("Sodra", 1), ("Vastra", 2)]:
+        d = tmp_path / "data" / name
+        d.mkdir(parents=True)
+        for m in range(1, months + 1):
+            (d / f"rapport_{m}_{common.REPORT_YEAR}.xls").write_bytes(b"x" * m)
+        dirs.append(d)
+    return dirs
+
+
+@pytest.fixture
+def count_stage(tmp_path, monkeypatch):
+    """Steg som skriver antalet rapportfiler till OUTPUT_DIR/antal.txt."""
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "batch_rakna.py").write_text(
+        "import common\n"
+        "def main():\n"
+        "    common.ensure_output_dir()\n"
+        "    n = len(common.get_report_files())\n"
+        "    (common.OUTPUT_DIR / 'antal.txt').write_text(str(n))\n")
+    monkeypatch.syspath_prepend(str(src))
+    return [Stage("batch_rakna", "Räkna", outputs=("antal.txt",))]
+
+
+class TestPlan:
+    def test_facility_name(self, tmp_path):
+        assert batch.facility_name(tmp_path / "Norra" / "rapporter") == "Norra"
+        assert batch.facility_name(tmp_path / "Sodra") == "Sodra"
+
+    def test_output_dir_per_facility(self, facilities, tmp_path):
+        planned = batch.plan_facilities(facilities, tmp_path / "ut")
+        assert [f.name for f in planned] == ["Norra", "Sodra", "Vastra"]
+        assert [f.output_dir for f in planned] == [tmp_path / "ut" / n
+                                                   for n in ("Norra", "Sodra", "Vastra")]
+        assert [len(f.files) for f in planned] == [3, 1, 2]
+
+    def test_duplicate_names_get_suffix(self, facilities, tmp_path):
+        planned = batch.plan_facilities([facilities[1], facilities[1]], tmp_path / "ut")
+        assert [f.name for f in planned] == ["Sodra", "Sodra_2"]
+
+
+class TestIngestBatches:
+    def test_balanced_by_size(self, tmp_path):
+        files = []
+        for name, size in [("a", 50), ("b", 40), ("c", 30), ("d", 20), ("e", 10)]:
+            path = tmp_path / name
+            path.write_bytes(b"x" * size)
+            files.append(path)
+        batches = batch.ingest_batches(files, jobs=2)
+        assert [[p.name for p in b] for b in batches] == [["a", "d", "e"], ["b", "c"]]
+
+    def test_no_more_batches_than_files(self, tmp_path):
+        path = tmp_path / "a"
+        path.write_bytes(b"x")
+        assert batch.ingest_batches([path], jobs=8) == [[path]]
+
+
+class TestRunBatch:
+    def test_each_facility_in_own_directories(self, facilities, count_stage, tmp_path):
+        results = batch.run_batch(facilities, tmp_path / "ut", jobs=2, stages=count_stage)
+        assert sorted(r.name for r in results) == ["Norra", "Sodra", "Vastra"]
+        assert all(r.error is None and r.stages_run == 1 for r in results)
+        for name, n in [("Norra", 3), ("Sodra", 1), ("Vastra", 2)]:
+            assert (tmp_path / "ut" / name / "antal.txt").read_text() == str(n)
+            assert (tmp_path / "ut" / name / "pipeline.log").exists()
+
+    def test_constants_bound_at_import(self, facilities, tmp_path, monkeypatch):
+        # Skript som binder OUTPUT_DIR vid import, och som redan ar
+        # importerat i huvudprocessen med standardkatalogen
+        src = tmp_path / "src_bunden"
+        src.mkdir()
+        (src / "batch_bunden.py").write_text(
+            "from common import OUTPUT_DIR, RAPPORT_DIR\n"
+            "def main():\n"
+            "    (OUTPUT_DIR / 'kalla.txt').write_text(RAPPORT_DIR.name)\n")
+        monkeypatch.syspath_prepend(str(src))
+        import batch_bunden
+        assert batch_bunden.OUTPUT_DIR == common.OUTPUT_DIR
+        results = batch.run_batch(facilities, tmp_path / "ut", jobs=3,
+                                  stages=[Stage("batch_bunden", "Bunden")])
+        assert all(r.error is None for r in results)
+        for name, source in [("Norra", "rapporter"), ("Sodra", "Sodra"), ("Vastra", "Vastra")]:
+            assert (tmp_path / "ut" / name / "kalla.txt").read_text() == source
+
+    def test_failure_reported_per_facility(self, facilities, tmp_path, monkeypatch):
+        src = tmp_path / "src_fel"
+        src.mkdir()
+        (src / "batch_fel.py").write_text(
+            "import common\n"
+            "def main():\n"
+            "    if common.RAPPORT_DIR.name == 'Sodra':\n"
+            "        raise RuntimeError('trasig')\n")
+        monkeypatch.syspath_prepend(str(src))
+        results = batch.run_batch(facilities, tmp_path / "ut", jobs=2,
+                                  stages=[Stage("batch_fel", "Fel")])
+        errors = {r.name: r.error for r in results}
+        assert "trasig" in errors["Sodra"]
+        assert errors["Norra"] is None and errors["Vastra"] is None
+
+    def test_ingest_and_facilities_share_one_pool(self, facilities, count_stage, tmp_path,
+                                                  monkeypatch):
+        pools = []
+
+        class CountingPool(batch.ProcessPoolExecutor):
+            def __init__(self, *args, **kwargs):
+                pools.append(kwargs)
+                super().__init__(*args, **kwargs)
+        monkeypatch.setattr(batch, "ProcessPoolExecutor", CountingPool)
+        monkeypatch.setattr(common, "CACHE_ENABLED", True)
+        # Filerna ar inga riktiga .xls; tolkningen hoppar over dem
+        results = batch.run_batch(facilities, tmp_path / "ut", jobs=2, stages=count_stage)
+        assert len(pools) == 1 and pools[0]["max_workers"] == 2
+        assert all(r.error is None for r in results)
+
+    def test_summary_throughput(self, capsys):
+        results = [batch.FacilityResult("A", 10, 5.0, 12),
+                   batch.FacilityResult("B", 20, 8.0, 12)]
+        batch.print_summary(results, wall=10.0)
+        out = capsys.readouterr().out
+        assert "12.0 anläggningar/min" in out
+        assert "3.00 filer/s" in out
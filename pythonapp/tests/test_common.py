@@ -1,11 +1,25 @@
 """Tester for common.py — hjalpfunktioner."""
 
+import subprocess
 import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
 
-from common import parse_valve_id, MANAD_NAMN
+import numpy as np
+import pandas as pd
+import pytest
+
+import common
+from common import (
+    MANAD_NAMN,
+    ReportBundle,
+    file_sha256,
+    load_report_bundle,
+    parse_sheet1,
+    parse_valve_id,
+    sheet_to_frame,
+)
 
 
 class TestParseValveId:
@@ -28,3 +42,622 @@ class TestManadNamn:
 
     def test_dec_is_last(self):
         assert MANAD_NAMN[12] == "Dec"
+
+
+class TestSheetToFrame:
+    def test_uses_header_row(self, make_sheet):
+        sheet = make_sheet([
+            ["Rapport", "", ""],
+            ["ID", "Info", "Availability [%]"],
+            ["1:1", "Skola", 99.5],
+            ["1:2", "", 97.0],
+        ])
+        df = sheet_to_frame(sheet, header_row=1)
+        assert list(df.columns) == ["ID", "Info", "Availability [%]"]
+        assert len(df) == 2
+        assert df.iloc[0]["ID"] == "1:1"
+
+    def test_numeric_column_is_float64(self, make_sheet):
+        sheet = make_sheet([
+            ["ID", "Availability [%]"],
+            ["1:1", 99.5],
+            ["1:2", ""],
+            ["1:3", 97.0],
+        ])
+        df = sheet_to_frame(sheet, header_row=0)
+        assert df["Availability [%]"].dtype == "float64"
+        assert pd.isna(df["Availability [%]"].iloc[1])
+
+    def test_mixed_column_keeps_raw_values(self, make_sheet):
+        sheet = make_sheet([
+            ["Fraction", "kWh"],
+            ["Rest", 1200.0],
+            ["Month", "kWh"],
+        ])
+        df = sheet_to_frame(sheet, header_row=0)
+        assert df["kWh"].dtype == object
+        assert list(df["kWh"]) == [1200.0, "kWh"]
+
+    def test_drops_unnamed_columns(self, make_sheet):
+        sheet = make_sheet([
+            ["ID", "", "Value"],
+            ["1:1", "x", 1.0],
+        ])
+        df = sheet_to_frame(sheet, header_row=0)
+        assert list(df.columns) == ["ID", "Value"]
+
+
+class TestParseSheet1:
+    def _sheet(self, make_sheet, data_rows):
+        header = [["" for _ in range(9)] for _ in range(9)]
+        header.append(["Key", "", "", "", "", "", "Value", "", "Comment"])
+        return make_sheet(header + data_rows)
+
+    def test_label_value_comment(self, make_sheet):
+        sheet = self._sheet(make_sheet, [
+            ["Total", "weight", "", "", "", "", 12.5, "", "ok"],
+        ])
+        rows = parse_sheet1(sheet)
+        assert rows == [{"Nyckel": "Total weight", "Varde": 12.5, "Kommentar": "ok"}]
+
+    def test_skips_rows_without_value_or_comment(self, make_sheet):
+        sheet = self._sheet(make_sheet, [
+            ["Rubrik", "", "", "", "", "", "", "", ""],
+            ["", "", "", "", "", "", 5.0, "", ""],
+        ])
+        assert parse_sheet1(sheet) == []
+
+
+class TestHeaderRow:
+    @pytest.fixture(autouse=True)
+    def clean_memo(self, monkeypatch):
+        monkeypatch.setattr(common, "_HEADER_ROWS", {})
+
+    @staticmethod
+    def rows(offset):
+        title = [["Rapport", ""]] + [["", ""]] * offset
+        return title + [["ID", "Availability [%]"], ["1:1", 99.0], ["1:2", 97.5]]
+
+    def test_auto_detects_shifted_header(self, make_sheet):
+        df = sheet_to_frame(make_sheet(self.rows(4), "Sheet11"), "auto")
+        assert list(df.columns) == ["ID", "Availability [%]"]
+        assert len(df) == 2
+
+    def test_hint_used_when_header_like(self, make_sheet):
+        sheet = make_sheet(self.rows(2), "Sheet11")
+        assert common.resolve_header_row(sheet, 3) == 3
+
+    def test_wrong_hint_falls_back_to_detection(self, make_sheet):
+        sheet = make_sheet(self.rows(6), "Sheet11")
+        assert common.resolve_header_row(sheet, 3) == 7
+
+    def test_hint_on_data_row_rejected(self, make_sheet):
+        # Raderna har forskjutits ett steg: ledtraden pekar pa forsta dataraden
+        sheet = make_sheet(self.rows(1), "Sheet11")
+        assert common.resolve_header_row(sheet, 3) == 2
+
+    def test_hint_on_text_row_without_known_fields_rejected(self, make_sheet):
+        rows = [["Rapport", ""], ["", ""], ["ID", "Info"], ["1:1", "Skola A"], ["1:2", "Brf"]]
+        assert common.resolve_header_row(make_sheet(rows, "Sheet9"), 3) == 2
+        assert common.resolve_header_row(make_sheet(rows, "Okant"), 3) == 3
+
+    def test_no_header_gives_empty_frame(self, make_sheet):
+        assert sheet_to_frame(make_sheet([["bara en cell"]], "Sheet3"), "auto").empty
+
+    def test_detection_memoized_per_layout(self, make_sheet, monkeypatch):
+        calls = []
+        real = common.find_header_row
+        monkeypatch.setattr(common, "find_header_row", lambda sh: calls.append(sh) or real(sh))
+        for _ in range(3):
+            common.detect_header_row(make_sheet(self.rows(4), "Sheet11"))
+        common.detect_header_row(make_sheet(self.rows(5), "Sheet11"))
+        assert len(calls) == 2
+
+    def test_sheet1_shifted(self, make_sheet):
+        rows = [[""] * 9 for _ in range(5)]
+        rows.append(["Key", "", "", "", "", "", "Value", "", "Comment"])
+        rows.append(["Total", "", "", "", "", "", 3.0, "", ""])
+        assert parse_sheet1(make_sheet(rows, "Sheet1")) == [
+            {"Nyckel": "Total", "Varde": 3.0, "Kommentar": ""}]
+
+
+class TestReportBundle:
+    def test_missing_sheet_is_empty(self):
+        bundle = ReportBundle(1, "Jan", Path("x_1_2025.xls"))
+        assert bundle.sheet("Sheet11").empty
+
+    def test_returns_loaded_sheet(self):
+        df = pd.DataFrame({"ID": ["1:1"]})
+        bundle = ReportBundle(1, "Jan", Path("x_1_2025.xls"), sheets={"Sheet9": df})
+        assert bundle.sheet("Sheet9") is df
+
+
+class TestParseCache:
+    @pytest.fixture
+    def cache_dir(self, tmp_path, monkeypatch):
+        d = tmp_path / "cache"
+        monkeypatch.setattr(common, "CACHE_DIR", d)
+        monkeypatch.setattr(common, "CACHE_ENABLED", True)
+        return d
+
+    @pytest.fixture
+    def report(self, tmp_path):
+        path = tmp_path / "rapport_1_2025.xls"
+        path.write_bytes(b"inte en riktig xls")
+        return path
+
+    def test_roundtrip(self, cache_dir, report):
+        df = pd.DataFrame({"ID": ["1:1", "1:2"], "Availability [%]": [99.0, 95.5]})
+        common._cache_put(report, "Sheet11", 3, df)
+        cached = common._cache_get(report, "Sheet11", 3)
+        pd.testing.assert_frame_equal(cached, df)
+
+    def test_miss_on_changed_content(self, cache_dir, report):
+        common._cache_put(report, "Sheet11", 3, pd.DataFrame({"ID": ["1:1"]}))
+        report.write_bytes(b"ny version av filen")
+        assert common._cache_get(report, "Sheet11", 3) is None
+
+    def test_miss_on_new_reader_version(self, cache_dir, report, monkeypatch):
+        common._cache_put(report, "Sheet11", 3, pd.DataFrame({"ID": ["1:1"]}))
+        monkeypatch.setattr(common, "READER_VERSION", common.READER_VERSION + 1)
+        assert common._cache_get(report, "Sheet11", 3) is None
+
+    def test_entry_is_npz_without_pickle(self, cache_dir, report):
+        df = pd.DataFrame([{"Nyckel": "Ton", "Varde": 5.0, "Kommentar": None},
+                           {"Nyckel": "Status", "Varde": "OK", "Kommentar": "text"}],
+                          dtype=object)
+        common._cache_put(report, "Sheet1", 9, df)
+        path = common._cache_path(report, "Sheet1", 9)
+        assert path.suffix == ".npz"
+        with np.load(path, allow_pickle=False) as data:
+            assert all(data[k].dtype != object for k in data.files)
+        pd.testing.assert_frame_equal(common._cache_get(report, "Sheet1", 9), df)
+
+    def test_old_versions_removed_on_write(self, cache_dir, report):
+        digest = file_sha256(report)
+        cache_dir.mkdir()
+        old = [cache_dir / f"{digest}_Sheet11_h3_v{common.READER_VERSION - 1}.npz",
+               cache_dir / f"{digest}_Sheet11_h3_v{common.READER_VERSION - 1}.pkl"]
+        kept = [cache_dir / f"{digest}_Sheet11_h4_v1.npz",
+                cache_dir / f"{digest}_Sheet1_h3_v1.npz"]
+        for path in old + kept:
+            path.write_bytes(b"")
+        common._cache_put(report, "Sheet11", 3, pd.DataFrame({"ID": ["1:1"]}))
+        assert not any(path.exists() for path in old)
+        assert all(path.exists() for path in kept)
+        assert common._cache_path(report, "Sheet11", 3).exists()
+
+    def test_discard_cached_file(self, cache_dir, report, tmp_path):
+        other = tmp_path / "rapport_2_2025.xls"
+        other.write_bytes(b"annan rapport")
+        for path in (report, other):
+            common._cache_put(path, "Sheet11", 3, pd.DataFrame({"ID": ["1:1"]}))
+        assert common.discard_cached_file(file_sha256(report)) == 1
+        assert common._cache_get(report, "Sheet11", 3) is None
+        assert common._cache_get(other, "Sheet11", 3) is not None
+
+    def test_bundle_from_cache_does_not_open_workbook(self, cache_dir, report, monkeypatch):
+        common._cache_put(report, "Sheet1", common.SHEET1_HEADER_ROW, pd.DataFrame(
+            [{"Nyckel": "Ton", "Varde": 5.0, "Kommentar": ""}], dtype=object))
+        for sheet_name, header_row in common.REPORT_SHEETS.items():
+            common._cache_put(report, sheet_name, header_row, pd.DataFrame({"ID": [sheet_name]}))
+
+        def fail(_):
+            raise AssertionError("arbetsboken ska inte oppnas")
+        monkeypatch.setattr(common, "open_workbook", fail)
+
+        bundle = load_report_bundle(1, "Jan", report)
+        assert bundle.sheet1 == [{"Nyckel": "Ton", "Varde": 5.0, "Kommentar": ""}]
+        assert bundle.sheet("Sheet9")["ID"].iloc[0] == "Sheet9"
+
+    def test_sha256_matches_content(self, report):
+        import hashlib
+        assert file_sha256(report) == hashlib.sha256(report.read_bytes()).hexdigest()
+
+
+class TestLoadReportBundles:
+    @pytest.fixture
+    def report_files(self, tmp_path):
+        files = []
+        for month in (3, 1, 2):
+            path = tmp_path / f"rapport_{month}_2025.xls"
+            path.write_bytes(f"månad {month}".encode())
+            files.append((month, common.MANAD_NAMN[month], path))
+        return files
+
+    @pytest.fixture
+    def fake_loader(self, monkeypatch):
+        def fake(month_num, month_name, filepath):
+            return ReportBundle(month_num, month_name, filepath)
+        monkeypatch.setattr(common, "load_report_bundle", fake)
+        monkeypatch.setattr(common, "CACHE_ENABLED", False)
+
+    def test_keeps_file_order(self, report_files, fake_loader):
+        bundles = common.load_report_bundles(report_files, workers=1)
+        assert [b.month_num for b in bundles] == [3, 1, 2]
+
+    def test_cached_and_parsed_files_merged_in_order(self, report_files, fake_loader, monkeypatch):
+        cached = {report_files[1][2]}
+        monkeypatch.setattr(common, "_is_fully_cached", lambda path: path in cached)
+        bundles = common.load_report_bundles(report_files, workers=1)
+        assert [b.month_num for b in bundles] == [3, 1, 2]
+        assert [b.filepath for b in bundles] == [f[2] for f in report_files]
+
+    def test_empty_file_list(self):
+        assert common.load_report_bundles([]) == []
+
+    def test_shared_bundles_loaded_once_per_process(self, report_files, monkeypatch):
+        calls = []
+
+        def fake(month_num, month_name, filepath):
+            calls.append(month_num)
+            return ReportBundle(month_num, month_name, filepath)
+        monkeypatch.setattr(common, "load_report_bundle", fake)
+        monkeypatch.setattr(common, "CACHE_ENABLED", False)
+        common.share_datasets()
+        try:
+            first = common.load_report_bundles(report_files, workers=1)
+            second = common.load_report_bundles(report_files[:2], workers=1)
+            report_files[0][2].write_bytes(b"korrigerad rapport")
+            common.load_report_bundles(report_files, workers=1)
+        finally:
+            common.share_datasets(False)
+        assert second == first[:2]
+        assert calls == [3, 1, 2, 3]
+
+    def test_trim_drops_unused_shared_bundles(self, report_files, monkeypatch):
+        monkeypatch.setattr(common, "load_report_bundle",
+                            lambda m, name, path: ReportBundle(m, name, path))
+        monkeypatch.setattr(common, "CACHE_ENABLED", False)
+        common.share_datasets()
+        try:
+            common.load_report_bundles(report_files, workers=1)
+            assert common.trim_shared() == 0
+            report_files[0][2].write_bytes(b"korrigerad rapport")
+            common.load_report_bundles(report_files, workers=1)
+            assert len(common._SHARED["bundles"]) == 4
+            assert common.trim_shared() == 1
+            assert len(common._SHARED["bundles"]) == 3
+            assert common.trim_shared() == 3
+        finally:
+            common.share_datasets(False)
+        assert common.trim_shared() == 0
+
+
+class TestFactStore:
+    @pytest.fixture
+    def cache_dir(self, tmp_path, monkeypatch):
+        d = tmp_path / "cache"
+        monkeypatch.setattr(common, "CACHE_DIR", d)
+        monkeypatch.setattr(common, "CACHE_ENABLED", True)
+        return d
+
+    @pytest.fixture
+    def report_dir(self, tmp_path):
+        d = tmp_path / "rapporter"
+        d.mkdir()
+        for month in (1, 2):
+            (d / f"rapport_{month}_2025.xls").write_bytes(f"månad {month}".encode())
+        return d
+
+    @pytest.fixture
+    def loaded(self, monkeypatch):
+        """Registrerar vilka filer som faktiskt läses in."""
+        seen = []
+
+        def fake(report_files, workers=None):
+            seen.extend(f[0] for f in report_files)
+            return [ReportBundle(m, n, p) for m, n, p in report_files]
+        monkeypatch.setattr(common, "load_report_bundles", fake)
+        return seen
+
+    @staticmethod
+    def files(report_dir):
+        return [(int(p.stem.split("_")[1]), "", p) for p in sorted(report_dir.glob("*.xls"))]
+
+    @staticmethod
+    def collect(bundles):
+        return pd.DataFrame([{"Manad_nr": b.month_num, "Varde": b.month_num * 10}
+                             for b in bundles])
+
+    def test_first_run_reads_all(self, cache_dir, report_dir, loaded):
+        df = common.FactStore(self.files(report_dir)).table("t", self.collect)
+        assert list(df["Manad_nr"]) == [1, 2]
+        assert loaded == [1, 2]
+
+    def test_only_new_file_is_read(self, cache_dir, report_dir, loaded):
+        common.FactStore(self.files(report_dir)).table("t", self.collect)
+        (report_dir / "rapport_3_2025.xls").write_bytes(b"ny")
+        loaded.clear()
+        df = common.FactStore(self.files(report_dir)).table("t", self.collect)
+        assert loaded == [3]
+        assert list(df["Manad_nr"]) == [1, 2, 3]
+
+    def test_changed_file_is_reread(self, cache_dir, report_dir, loaded):
+        common.FactStore(self.files(report_dir)).table("t", self.collect)
+        (report_dir / "rapport_1_2025.xls").write_bytes(b"korrigerad rapport")
+        loaded.clear()
+        common.FactStore(self.files(report_dir)).table("t", self.collect)
+        assert loaded == [1]
+
+    def test_changed_file_drops_old_parse_cache(self, cache_dir, report_dir, loaded):
+        report = report_dir / "rapport_1_2025.xls"
+        common._cache_put(report, "Sheet11", 3, pd.DataFrame({"ID": ["1:1"]}))
+        common.FactStore(self.files(report_dir)).table("t", self.collect)
+        report.write_bytes(b"korrigerad rapport")
+        common.FactStore(self.files(report_dir)).table("t", self.collect)
+        assert list(cache_dir.glob("*_Sheet11_*")) == []
+
+    def test_store_is_npz_and_replaces_old_versions(self, cache_dir, report_dir, loaded):
+        files = self.files(report_dir)
+        common.FactStore(files).table("t", self.collect)
+        common.FactStore(files).table("t_extra", self.collect)
+        common.FactStore(files).table("t", self.collect, version=2)
+        store_dir = common.FactStore(files).store_dir
+        assert sorted(p.name for p in store_dir.iterdir()) == [
+            f"t_extra_v1_r{common.READER_VERSION}.npz", f"t_v2_r{common.READER_VERSION}.npz"]
+        loaded.clear()
+        df = common.FactStore(files).table("t", self.collect, version=2)
+        assert loaded == []
+        pd.testing.assert_frame_equal(df, self.collect(common.FactStore(files).bundles()))
+
+    def test_same_file_name_in_two_directories(self, cache_dir, tmp_path, loaded):
+        files = []
+        for month, facility in ((1, "norra"), (2, "sodra")):
+            d = tmp_path / facility
+            d.mkdir()
+            path = d / "rapport_1_2025.xls"
+            path.write_bytes(facility.encode())
+            files.append((month, "", path))
+        df = common.FactStore(files).table("t", self.collect)
+        assert list(df["Manad_nr"]) == [1, 2]
+        loaded.clear()
+        df = common.FactStore(files).table("t", self.collect)
+        assert loaded == []
+        assert list(df["Manad_nr"]) == [1, 2]
+
+    def test_removed_file_is_dropped(self, cache_dir, report_dir, loaded):
+        common.FactStore(self.files(report_dir)).table("t", self.collect)
+        (report_dir / "rapport_2_2025.xls").unlink()
+        df = common.FactStore(self.files(report_dir)).table("t", self.collect)
+        assert list(df["Manad_nr"]) == [1]
+
+    def test_bundles_loaded_once_per_store(self, cache_dir, report_dir, loaded, monkeypatch):
+        monkeypatch.setattr(common, "CACHE_ENABLED", False)
+        store = common.FactStore(self.files(report_dir))
+        store.table("a", self.collect)
+        store.table("b", self.collect)
+        assert loaded == [1, 2]
+
+    def test_shared_table_copied_between_stores(self, cache_dir, report_dir, loaded):
+        common.share_datasets()
+        try:
+            first = common.FactStore(self.files(report_dir)).table("t", self.collect)
+            first.loc[0, "Varde"] = -1
+            loaded.clear()
+            second = common.FactStore(self.files(report_dir)).table("t", self.collect)
+        finally:
+            common.share_datasets(False)
+        assert loaded == []
+        assert list(second["Varde"]) == [10, 20]
+
+    def test_trim_drops_tables_for_old_file_list(self, cache_dir, report_dir, loaded):
+        common.share_datasets()
+        try:
+            files = self.files(report_dir)
+            common.FactStore(files[:1]).table("t", self.collect)
+            common.trim_shared()
+            common.FactStore(files).table("t", self.collect)
+            assert len(common._SHARED["tables"]) == 2
+            common.trim_shared()
+            assert len(common._SHARED["tables"]) == 1
+        finally:
+            common.share_datasets(False)
+
+    def test_list_tables_and_empty_input(self, cache_dir, report_dir, loaded):
+        def collect_list(bundles):
+            return [{"Manad_nr": b.month_num} for b in bundles]
+        store = common.FactStore(self.files(report_dir))
+        assert store.table("l", collect_list) == [{"Manad_nr": 1}, {"Manad_nr": 2}]
+        assert common.FactStore([]).table("t", self.collect).empty
+
+    def test_list_tables_reloaded_from_store(self, cache_dir, report_dir, loaded):
+        def collect_list(bundles):
+            return [{"Manad_nr": b.month_num, "kWh": np.float64(1.5),
+                     "Fraktioner": [{"Fraktion": "Rest", "Tomningar": np.int64(2)}]}
+                    for b in bundles]
+        first = common.FactStore(self.files(report_dir)).table("l", collect_list)
+        loaded.clear()
+        second = common.FactStore(self.files(report_dir)).table("l", collect_list)
+        assert loaded == []
+        assert second == first
+
+
+class TestResultTables:
+    @pytest.fixture
+    def df(self):
+        return pd.DataFrame({
+            "Ventil_ID": ["1:1", "2:3", None],
+            "Gren": [1, 2, 3],
+            "anomali": [True, False, True],
+            "Varde": [1.5, float("nan"), 3.0],
+            "Blandat": [1, "x", None],
+        })
+
+    def test_roundtrip_keeps_dtypes(self, df, tmp_path):
+        common.save_table(df, tmp_path / "t.csv")
+        loaded = common.load_table(tmp_path / "t.csv")
+        assert list(loaded.columns) == list(df.columns)
+        assert loaded["Gren"].dtype == "int64"
+        assert loaded["anomali"].dtype == bool
+        assert loaded["Ventil_ID"].tolist()[:2] == ["1:1", "2:3"]
+        assert pd.isna(loaded["Ventil_ID"].iloc[2])
+        assert pd.isna(loaded["Varde"].iloc[1])
+        assert loaded["Blandat"].tolist()[:2] == [1, "x"]
+        pd.testing.assert_series_equal(loaded.dtypes, df.dtypes)
+
+    def test_roundtrip_extension_dtypes(self, tmp_path):
+        df = pd.DataFrame({
+            "Gren": pd.array([1, None, 3], dtype="Int64"),
+            "Larm": pd.array([True, None, False], dtype="boolean"),
+            "Andel": pd.array([0.5, None, 1.0], dtype="Float64"),
+            "Namn": pd.array(["a", None, "c"], dtype="string"),
+            "Typ": pd.Categorical(["hog", "lag", None], categories=["lag", "hog"],
+                                  ordered=True),
+            "Manad": pd.Categorical([3, 1, 3]),
+            "Tid": pd.to_datetime(["2025-01-01", "2025-02-01", None]).tz_localize(
+                "Europe/Stockholm"),
+        })
+        common.save_table(df, tmp_path / "t.csv")
+        loaded = common.load_table(tmp_path / "t.csv")
+        pd.testing.assert_series_equal(loaded.dtypes, df.dtypes)
+        pd.testing.assert_frame_equal(loaded, df)
+
+    def test_roundtrip_fact_dtypes(self, tmp_path):
+        from ventilfakta import FACT_DTYPES
+        samples = {"int64": [1, 2], "float64": [1.5, np.nan], "bool": [True, False],
+                   "object": ["1:1", None]}
+        df = pd.DataFrame({col: pd.Series(samples[str(np.dtype(t))], dtype=t)
+                           for col, t in FACT_DTYPES.items()})
+        common.save_table(df, tmp_path / "fakta.csv")
+        loaded = common.load_table(tmp_path / "fakta.csv")
+        pd.testing.assert_series_equal(loaded.dtypes, df.dtypes)
+        pd.testing.assert_frame_equal(loaded, df)
+
+    def test_file_has_no_pickled_objects(self, df, tmp_path):
+        path = common.save_table(df, tmp_path / "t.csv")
+        with np.load(path, allow_pickle=False) as data:
+            assert all(data[k].dtype != object for k in data.files)
+
+    def test_old_pickled_file_falls_back_to_csv(self, df, tmp_path):
+        df.to_csv(tmp_path / "t.csv", index=False)
+        np.savez(tmp_path / "t.npz", __columns__=np.array(["Blandat"]),
+                 __dtypes__=np.array(["object"]), o0=np.array([1, "x"], dtype=object))
+        assert len(common.load_table(tmp_path / "t.csv")) == 3
+
+    def test_csv_export_optional(self, df, tmp_path, monkeypatch):
+        monkeypatch.setattr(common, "CSV_EXPORT", False)
+        path = common.save_table(df, tmp_path / "t.csv")
+        assert path == tmp_path / "t.npz"
+        assert not (tmp_path / "t.csv").exists()
+        assert len(common.load_table(tmp_path / "t.csv")) == 3
+
+    def test_index_becomes_first_column(self, tmp_path):
+        pivot = pd.DataFrame({"Jan": [1.0], "Feb": [2.0]},
+                             index=pd.Index(["Antal"], name="Nyckel"))
+        common.save_table(pivot, tmp_path / "p.csv", index=True)
+        loaded = common.load_table(tmp_path / "p.csv")
+        assert list(loaded.columns) == ["Nyckel", "Jan", "Feb"]
+        assert loaded.equals(pd.read_csv(tmp_path / "p.csv"))
+
+    def test_falls_back_to_csv(self, df, tmp_path):
+        df.to_csv(tmp_path / "gammal.csv", index=False)
+        assert len(common.load_table(tmp_path / "gammal.csv")) == 3
+
+    def test_missing_table(self, tmp_path):
+        assert common.load_table(tmp_path / "saknas.csv") is None
+
+    def test_empty_table(self, tmp_path):
+        common.save_table(pd.DataFrame(), tmp_path / "tom.csv")
+        assert common.load_table(tmp_path / "tom.csv").empty
+
+
+class TestSetDirectories:
+    SCRIPTS = Path(__file__).resolve().parent.parent / "scripts"
+
+    def test_sets_directories_for_process(self, tmp_path):
+        # Kors i en ny process sa att inga analysskript redan ar importerade
+        code = (
+            "import sys; sys.path.insert(0, sys.argv[1])\n"
+            "import common\n"
+            "common.set_directories(sys.argv[2], sys.argv[3])\n"
+            "import sammanfattning\n"
+            "print(sammanfattning.OUTPUT_DIR, common.RAPPORT_DIR)\n")
+        out = subprocess.run(
+            [sys.executable, "-c", code, str(self.SCRIPTS), str(tmp_path / "rapporter"),
+             str(tmp_path / "output")],
+            capture_output=True, text=True, check=True).stdout.split()
+        assert out == [str(tmp_path / "output"), str(tmp_path / "rapporter")]
+
+    def test_refused_after_scripts_imported(self, tmp_path):
+        import sammanfattning  # noqa: F401  binder OUTPUT_DIR vid import
+        old_output = common.OUTPUT_DIR
+        with pytest.raises(RuntimeError, match="sammanfattning"):
+            common.set_directories(tmp_path, tmp_path)
+        assert common.OUTPUT_DIR == old_output
+
+
+class TestLazyPlotting:
+    SCRIPTS = Path(__file__).resolve().parent.parent / "scripts"
+
+    @pytest.mark.parametrize("module", ["trendanalys", "manuell_analys", "drifterfarenheter",
+                                        "rekommendationer", "dashboard"])
+    def test_import_does_not_load_plot_libraries(self, module):
+        code = (f"import sys, {module}\n"
+                "print('matplotlib' in sys.modules, 'scipy' in sys.modules)")
+        result = subprocess.run([sys.executable, "-c", code], cwd=self.SCRIPTS,
+                                capture_output=True, text=True, check=True)
+        assert result.stdout.split() == ["False", "False"]
+
+    def test_plots_enabled_follows_flag(self, monkeypatch):
+        monkeypatch.setattr(common, "PLOTS_ENABLED", False)
+        assert not common.plots_enabled()
+
+    def test_pyplot_uses_agg(self):
+        plt = common.pyplot()
+        assert plt.get_backend().lower() == "agg"
+
+
+class TestWorkbookHandle:
+    def test_released_on_exit_and_error(self, tmp_path, monkeypatch):
+        released = []
+
+        class FakeBook:
+            def release_resources(self):
+                released.append(True)
+
+        monkeypatch.setattr(common.xlrd, "open_workbook", lambda *a, **k: FakeBook())
+        with common.open_workbook(tmp_path / "a.xls"):
+            pass
+        with pytest.raises(RuntimeError):
+            with common.open_workbook(tmp_path / "a.xls"):
+                raise RuntimeError("fel")
+        assert released == [True, True]
+
+
+class TestMemoryBatches:
+    @pytest.fixture
+    def report_files(self, tmp_path):
+        files = []
+        for month in range(1, 6):
+            path = tmp_path / f"rapport_{month}_2025.xls"
+            path.write_bytes(b"x" * 100_000)
+            files.append((month, common.MANAD_NAMN[month], path))
+        return files
+
+    def test_no_ceiling_single_batch(self, report_files, monkeypatch):
+        monkeypatch.setattr(common, "MAX_MEMORY_MB", None)
+        assert common.memory_batches(report_files) == [report_files]
+
+    def test_batches_fit_under_ceiling(self, report_files, monkeypatch):
+        monkeypatch.setattr(common, "BUNDLE_MEMORY_FACTOR", 5)  # 0,5 MB per fil
+        batches = common.memory_batches(report_files, max_memory_mb=1)
+        assert [len(b) for b in batches] == [2, 2, 1]
+        assert [f for b in batches for f in b] == report_files
+
+    def test_oversized_file_gets_own_batch(self, report_files):
+        batches = common.memory_batches(report_files[:2], max_memory_mb=0.01)
+        assert [len(b) for b in batches] == [1, 1]
+
+    def test_iter_keeps_order(self, report_files, monkeypatch):
+        monkeypatch.setattr(common, "BUNDLE_MEMORY_FACTOR", 5)
+        seen = []
+
+        def fake(files, workers=None):
+            seen.append(len(files))
+            return [ReportBundle(m, n, p) for m, n, p in files]
+        monkeypatch.setattr(common, "load_report_bundles", fake)
+        months = [b.month_num for b in common.iter_report_bundles(report_files, 1)]
+        assert months == [1, 2, 3, 4, 5]
+        assert seen == [2, 2, 1]
+        assert common.ingest_reports(report_files, 1) == 5
@@ -37,6 +37,26 @@ class TestComputeSeasonalAnalysis:
             h1_expected = frac_data[frac_data["Manad_nr"] <= 6]["Tomningar"].sum()
             assert info["H1_tomningar"] == h1_expected
 
+    def test_autocorrelation_per_fraction(self, fraction_full_df):
+        df = fraction_full_df.copy()
+        # Rest: hogt varannan manad, tydligt monster med lag 2
+        rest = df["Fraktion"] == "Rest"
+        df.loc[rest, "Tomningar"] = np.where(df.loc[rest, "Manad_nr"] % 2 == 0, 400, 100)
+        result = compute_seasonal_analysis(df)
+        assert result["Rest"]["Sasongsmonster"]
+        assert result["Rest"]["Sasong_lag"] == 2
+        assert result["Rest"]["Sasong_acf"] > 0.5
+        assert result["Rest"]["Sasongstyp"] == "Periodisk"
+
+    def test_summer_ratio_alone_is_not_seasonal(self, fraction_full_df):
+        df = fraction_full_df.copy()
+        rest = df["Fraktion"] == "Rest"
+        df.loc[rest, "Tomningar"] = np.where(df.loc[rest, "Manad_nr"].isin([6, 7, 8]), 50, 300)
+        result = compute_seasonal_analysis(df)
+        assert result["Rest"]["Sommar_medel"] / result["Rest"]["Vinter_medel"] < 0.7
+        assert not result["Rest"]["Sasongsmonster"]
+        assert result["Rest"]["Sasongstyp"] == "Jamn"
+
 
 class TestComputeFillAnalysis:
     def test_basic_fill(self, fraction_full_df):
@@ -23,7 +23,7 @@ class TestIdentifyBranchCharacteristics:
 
     def test_season_types(self, valve_info_df, branch_deep_df):
         result = identify_branch_characteristics(valve_info_df, branch_deep_df)
-        valid_types = {"Sommarsvacka", "Sommartopp", "Jamn", "?"}
+        valid_types = {"Sommarsvacka", "Sommartopp", "Periodisk", "Jamn", "?"}
         for _, row in result.iterrows():
             assert row["Sasongstyp"] in valid_types
 
@@ -46,22 +46,43 @@ class TestIdentifyBranchCharacteristics:
         result = identify_branch_characteristics(pd.DataFrame(), pd.DataFrame())
         assert result.empty
 
+    @staticmethod
+    def branch(cmds):
+        return pd.DataFrame([
+            {"Manad_nr": m, "Manad": "X", "Gren": 1, "Medel_tillganglighet": 99.0,
+             "Totala_fel": 3, "MAN_CMD": 5, "AUTO_CMD": c, "Total_CMD": c,
+             "Manuell_andel_%": 1.0, "Antal_ventiler": 1}
+            for m, c in zip(range(1, 13), cmds)
+        ])
+
     def test_summer_dip_detection(self):
-        """Testar att sommarsvacka detekteras nar sommar-CMD ar mycket lagre."""
-        info_df = pd.DataFrame([
-            {"Ventil_ID": "1:1", "Gren": 1, "Ventilnr": 1, "Info": "Test"},
+        """Aterkommande svacka med signifikant monster och lag sommar blir Sommarsvacka."""
+        info_df = pd.DataFrame([{"Ventil_ID": "1:1", "Gren": 1, "Ventilnr": 1, "Info": "Test"}])
+        # Lag niva tre av fyra manader, bl.a. jun-aug
+        cmds = [300, 50, 50, 50] * 3
+        result = identify_branch_characteristics(info_df, self.branch(cmds))
+        assert result.iloc[0]["Sasongstyp"] == "Sommarsvacka"
+        assert result.iloc[0]["Sasong_lag"] == 4
+
+    def test_summer_ratio_without_significant_acf_is_not_seasonal(self):
+        """En enstaka sommarsvacka ger stark sommar/vinter-kvot men inget signifikant monster."""
+        info_df = pd.DataFrame([{"Ventil_ID": "1:1", "Gren": 1, "Ventilnr": 1, "Info": "Skola"}])
+        cmds = [50 if m in [6, 7, 8] else 300 for m in range(1, 13)]
+        result = identify_branch_characteristics(info_df, self.branch(cmds))
+        row = result.iloc[0]
+        assert row["Sommar_CMD"] / row["Vinter_CMD"] < 0.7
+        assert row["Sasongstyp"] == "Jamn"
+
+    def test_alternating_is_periodic(self):
+        """Varannan manad hog ger monster med lag 2 som inte beror pa sommaren."""
+        info_df = pd.DataFrame([{"Ventil_ID": "1:1", "Gren": 1, "Ventilnr": 1, "Info": ""}])
+        cmds = [300, 120, 310, 140, 290, 200, 320, 130, 300, 110, 330, 150]
+        branch_df = pd.DataFrame([
+            {"Manad_nr": m, "Manad": "X", "Gren": 1, "Medel_tillganglighet": 99.0,
+             "Totala_fel": 3, "MAN_CMD": 5, "AUTO_CMD": c, "Total_CMD": c,
+             "Manuell_andel_%": 1.0, "Antal_ventiler": 1}
+            for m, c in zip(range(1, 13), cmds)
         ])
-        rows = []
-        for m in range(1, 13):
-            # Sommar (jun-aug) har manga farre kommandon
-            cmd = 50 if m in [6, 7, 8] else 300
-            rows.append({
-                "Manad_nr": m, "Manad": "X", "Gren": 1,
-                "Medel_tillganglighet": 99.0, "Totala_fel": 3,
-                "MAN_CMD": 5, "AUTO_CMD": cmd,
-                "Total_CMD": cmd + 5, "Manuell_andel_%": 1.0,
-                "Antal_ventiler": 1,
-            })
-        branch_df = pd.DataFrame(rows)
         result = identify_branch_characteristics(info_df, branch_df)
-        assert result.iloc[0]["Sasongstyp"] == "Sommarsvacka"
+        assert result.iloc[0]["Sasongstyp"] == "Periodisk"
+        assert result.iloc[0]["Sasong_lag"] == 2
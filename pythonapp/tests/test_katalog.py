@@ -0,0 +1,117 @@
+"""Tester for katalog.py — rapportkatalog per anlaggning, ar och manad."""
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+import common
+import katalog
+from katalog import Catalog, open_catalog
+
+
+@pytest.fixture
+def tree(tmp_path, monkeypatch):
+    """rapporter/ med filer i roten och i tva anlaggningskataloger."""
+    monkeypatch.setattr(common, "CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr(common, "CACHE_ENABLED", True)
+    monkeypatch.setattr(katalog, "_CATALOGS", {})
+    root = tmp_path / "rapporter"
+    files = [
+        "Servicerapport_2_2025.xls",
+        "Servicerapport_1_2025.xls",
+        "Norra/2021/Servicerapport_12_2021.xls",
+        "Norra/2022/Servicerapport_3_2022.xls",
+        "Norra/2025/Servicerapport_12_2025.xls",
+        "Sodra/Servicerapport_6_2024.xls",
+        "Sodra/anteckningar.txt",
+        "Sodra/Servicerapport_13_2024.xls",
+    ]
+    for rel in files:
+        path = root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"x")
+    return root
+
+
+class TestScan:
+    def test_indexes_facility_year_month(self, tree):
+        keys = [e.key for e in Catalog.scan(tree).entries]
+        assert keys == [
+            ("", 2025, 1), ("", 2025, 2),
+            ("Norra", 2021, 12), ("Norra", 2022, 3), ("Norra", 2025, 12),
+            ("Sodra", 2024, 6),
+        ]
+
+    def test_missing_root(self, tmp_path):
+        assert Catalog.scan(tmp_path / "finns_inte").entries == []
+
+
+class TestQuery:
+    def test_range_inclusive(self, tree):
+        q = Catalog.scan(tree).query("Norra", "2021-12", "2022-03")
+        assert [(e.year, e.month) for e in q.entries] == [(2021, 12), (2022, 3)]
+
+    def test_year_only_bounds(self, tree):
+        q = Catalog.scan(tree).query("Norra", start="2022")
+        assert [e.year for e in q.entries] == [2022, 2025]
+
+    def test_iterates_like_report_files(self, tree):
+        q = Catalog.scan(tree).query("", year=2025)
+        assert list(q) == [(1, "Jan", tree / "Servicerapport_1_2025.xls"),
+                           (2, "Feb", tree / "Servicerapport_2_2025.xls")]
+        assert q[:1][0][0] == 1
+
+    def test_all_facilities(self, tree):
+        assert Catalog.scan(tree).query().facilities == ["", "Norra", "Sodra"]
+
+
+class TestPersistence:
+    def test_index_reused_without_scan(self, tree, monkeypatch):
+        open_catalog(tree)
+        monkeypatch.setattr(katalog, "_CATALOGS", {})
+
+        def fail(root):
+            raise AssertionError("ska inte skanna om")
+        monkeypatch.setattr(Catalog, "scan", classmethod(lambda cls, root: fail(root)))
+        assert len(open_catalog(tree).entries) == 6
+
+    def test_new_file_triggers_rescan(self, tree):
+        open_catalog(tree)
+        (tree / "Norra" / "2022" / "Servicerapport_4_2022.xls").write_bytes(b"y")
+        q = open_catalog(tree).query("Norra", year=2022)
+        assert [e.month for e in q.entries] == [3, 4]
+
+    def test_overwritten_file_triggers_rescan(self, tree):
+        path = tree / "Sodra" / "Servicerapport_6_2024.xls"
+        dir_mtime = os.stat(path.parent).st_mtime_ns
+        open_catalog(tree)
+        path.write_bytes(b"ny rapport")
+        os.utime(path.parent, ns=(dir_mtime, dir_mtime))
+        assert open_catalog(tree).query("Sodra").entries[0].size == len(b"ny rapport")
+        # Aven det sparade indexet kontrolleras mot filen
+        path.write_bytes(b"ny rapport igen")
+        os.utime(path.parent, ns=(dir_mtime, dir_mtime))
+        katalog._CATALOGS.clear()
+        assert open_catalog(tree).query("Sodra").entries[0].size == len(b"ny rapport igen")
+
+    def test_fingerprints_stored(self, tree):
+        entry = open_catalog(tree).query("Sodra").entries[0]
+        assert entry.size == 1 and entry.mtime_ns > 0
+
+
+class TestGetReportFiles:
+    def test_root_files_for_report_year(self, tree, monkeypatch):
+        monkeypatch.setattr(common, "RAPPORT_DIR", tree)
+        files = common.get_report_files()
+        assert [m for m, _, _ in files] == [1, 2]
+        assert [m for m, _, _ in common.get_report_files(2025, "Norra")] == [12]
+
+    def test_query_accepted_as_bundles(self, tree, monkeypatch):
+        monkeypatch.setattr(common, "load_report_bundles",
+                            lambda files: [common.ReportBundle(m, n, p) for m, n, p in files])
+        bundles = common.as_bundles(open_catalog(tree).query("Norra"))
+        assert [b.month_num for b in bundles] == [12, 3, 12]
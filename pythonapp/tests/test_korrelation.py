@@ -0,0 +1,103 @@
+"""Tester for korrelation.py — korrelationer mellan alla par av nyckeltal."""
+
+import sys
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from korrelation import PAIR_COLUMNS, correlation_matrix, interpret, top_pairs
+
+
+@pytest.fixture
+def kpi():
+    """24 manader, 15 nyckeltal med luckor, lika varden och ett konstant."""
+    rng = np.random.default_rng(7)
+    df = pd.DataFrame(rng.normal(size=(24, 15)), columns=[f"k{i}" for i in range(15)])
+    df["k1"] = df["k0"] * 3 + rng.normal(scale=0.1, size=24)
+    df["k2"] = -df["k0"]
+    df["k3"] = df["k3"].round(0)
+    for i, col in enumerate(df.columns[4:]):
+        df.loc[rng.integers(0, 24, i % 4), col] = np.nan
+    df["konstant"] = 5.0
+    return df
+
+
+def scipy_pair(df, a, b, func):
+    both = df[[a, b]].dropna()
+    if len(both) < 3 or both.nunique().min() < 2:
+        return np.nan, np.nan
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        r, p = func(both[a], both[b])
+    return r, p
+
+
+class TestCorrelationMatrix:
+    @pytest.mark.parametrize("method", ["pearson", "spearman"])
+    def test_matches_pandas(self, kpi, method):
+        r, _, _ = correlation_matrix(kpi, method)
+        expected = kpi.corr(method, min_periods=3)
+        np.testing.assert_allclose(r.to_numpy(), expected.to_numpy(), atol=1e-12)
+
+    @pytest.mark.parametrize("method, func", [("pearson", stats.pearsonr),
+                                              ("spearman", stats.spearmanr)])
+    def test_p_values_match_scipy(self, kpi, method, func):
+        r, p, _ = correlation_matrix(kpi, method)
+        for a, b in [("k0", "k1"), ("k3", "k5"), ("k6", "k9"), ("k4", "k12")]:
+            expected_r, expected_p = scipy_pair(kpi, a, b, func)
+            assert r.loc[a, b] == pytest.approx(expected_r, abs=1e-12)
+            assert p.loc[a, b] == pytest.approx(expected_p, abs=1e-10)
+
+    def test_pairwise_counts(self, kpi):
+        _, _, n = correlation_matrix(kpi)
+        assert n.loc["k0", "k1"] == 24
+        assert n.loc["k6", "k9"] == len(kpi[["k6", "k9"]].dropna())
+
+    def test_constant_and_short_pairs_are_nan(self, kpi):
+        r, p, _ = correlation_matrix(kpi)
+        assert r["konstant"].isna().all() and p["konstant"].isna().all()
+        r, _, _ = correlation_matrix(kpi.head(5), min_periods=6)
+        assert r.isna().all().all()
+
+    def test_perfect_correlation(self, kpi):
+        r, p, _ = correlation_matrix(kpi)
+        assert r.loc["k0", "k2"] == -1
+        assert p.loc["k0", "k2"] == 0
+
+    def test_unknown_method(self, kpi):
+        with pytest.raises(ValueError, match="Okänd metod"):
+            correlation_matrix(kpi, "kendall")
+
+
+class TestTopPairs:
+    def test_strongest_first(self, kpi):
+        pairs = top_pairs(kpi, k=3)
+        assert list(pairs.columns) == PAIR_COLUMNS
+        assert len(pairs) == 3
+        assert {frozenset(p) for p in zip(pairs["KPI_1"], pairs["KPI_2"])} == {
+            frozenset({"k0", "k1"}), frozenset({"k0", "k2"}), frozenset({"k1", "k2"})}
+        assert pairs.iloc[0]["tolkning"] == "stark negativ"
+
+    def test_all_pairs_without_constant(self, kpi):
+        pairs = top_pairs(kpi, k=None)
+        assert len(pairs) == 15 * 14 // 2
+        assert "konstant" not in set(pairs["KPI_1"]) | set(pairs["KPI_2"])
+        assert (pairs["q_varde"] >= pairs["pearson_p"]).all()
+        assert pairs["q_varde"].max() <= 1
+
+    def test_empty(self):
+        assert top_pairs(pd.DataFrame(), k=5).empty
+
+
+class TestInterpret:
+    @pytest.mark.parametrize("r, expected", [
+        (0.9, "stark positiv"), (-0.5, "mattlig negativ"), (0.1, "svag positiv"),
+    ])
+    def test_interpret(self, r, expected):
+        assert interpret(r) == expected
@@ -0,0 +1,493 @@
+"""Tester for pipeline.py — stegordning och korning i en process."""
+
+import json
+import sys
+import time
+import types
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+import common
+import pipeline
+from pipeline import STAGES, Stage, execution_order, run_pipeline
+
+
+def names(stages):
+    return [s.name for s in stages]
+
+
+class TestExecutionOrder:
+    def test_all_stages_once(self):
+        order = names(execution_order(STAGES))
+        assert sorted(order) == sorted(s.name for s in STAGES)
+
+    def test_dependencies_run_first(self):
+        order = names(execution_order(STAGES))
+        for stage in STAGES:
+            for dep in stage.deps:
+                assert order.index(dep) < order.index(stage.name)
+
+    def test_pdf_is_last(self):
+        assert execution_order(STAGES)[-1].name == "rapport_pdf"
+
+    def test_declared_order_kept_when_free(self):
+        stages = [Stage("b", "B"), Stage("a", "A"), Stage("c", "C", deps=("b",))]
+        assert names(execution_order(stages)) == ["b", "a", "c"]
+
+    def test_dependency_declared_later(self):
+        stages = [Stage("c", "C", deps=("b",)), Stage("b", "B")]
+        assert names(execution_order(stages)) == ["b", "c"]
+
+    def test_targets_include_transitive_deps(self):
+        order = names(execution_order(STAGES, ["dashboard"]))
+        assert order == ["energi_drift", "ventiler", "larm", "dashboard"]
+
+    def test_unknown_target(self):
+        with pytest.raises(ValueError, match="Okända steg"):
+            execution_order(STAGES, ["finns_inte"])
+
+    def test_unknown_dependency(self):
+        with pytest.raises(ValueError, match="okänt beroende"):
+            execution_order([Stage("a", "A", deps=("x",))])
+
+    def test_cycle(self):
+        stages = [Stage("a", "A", deps=("b",)), Stage("b", "B", deps=("a",))]
+        with pytest.raises(ValueError, match="Cykliskt"):
+            execution_order(stages)
+
+
+class TestResolveTarget:
+    def test_stage_name(self):
+        assert pipeline.resolve_target(STAGES, "larm") == "larm"
+
+    @pytest.mark.parametrize("target, stage", [
+        ("output/rekommendationer.json", "rekommendationer"),
+        ("gren_ranking.png", "gren_djupanalys"),
+        ("output/trend_anomalier.csv", "trendanalys"),
+        ("sammanfattning_kpi_lista.csv", "sammanfattning"),
+        ("operatorsagenda.txt", "rekommendationer"),
+        ("rapport_2025.pdf", "rapport_pdf"),
+    ])
+    def test_artifact(self, target, stage):
+        assert pipeline.resolve_target(STAGES, target) == stage
+
+    def test_unknown_artifact(self):
+        with pytest.raises(ValueError, match="Okänt mål"):
+            pipeline.resolve_target(STAGES, "output/finns_inte.png")
+
+    def test_ambiguous_artifact(self):
+        stages = [Stage("a", "A", outputs=("x_*",)), Stage("b", "B", outputs=("x_y.*",))]
+        with pytest.raises(ValueError, match="flera steg"):
+            pipeline.resolve_target(stages, "x_y.csv")
+
+    def test_cli_rejects_plot_target_without_plots(self, monkeypatch, capsys):
+        monkeypatch.setattr(common, "PLOTS_ENABLED", False)
+        with pytest.raises(SystemExit):
+            pipeline.main(["output/dashboard.png"])
+        assert "kräver grafer" in capsys.readouterr().err
+
+    def test_minimal_subset(self):
+        target = pipeline.resolve_target(STAGES, "output/rekommendationer.json")
+        assert names(execution_order(STAGES, [target])) == ["trendanalys", "rekommendationer"]
+
+
+@pytest.fixture(autouse=True)
+def output_dir(tmp_path, monkeypatch):
+    d = tmp_path / "output"
+    d.mkdir()
+    monkeypatch.setattr(common, "OUTPUT_DIR", d)
+    return d
+
+
+@pytest.fixture(autouse=True)
+def four_cpus(monkeypatch):
+    """Parallellkörningen testas oavsett hur många kärnor maskinen har."""
+    monkeypatch.setattr(pipeline, "usable_cpus", lambda: 4)
+
+
+@pytest.fixture
+def no_job_limit(monkeypatch):
+    """Kör parallellt även när stegen inte kan köras samtidigt."""
+    monkeypatch.setattr(pipeline, "effective_jobs", lambda order, jobs: jobs)
+
+
+class TestRunPipeline:
+    @pytest.fixture
+    def fake_modules(self, monkeypatch):
+        """Registrerar moduler vars main() loggar att de korts."""
+        ran = []
+        for name in ("steg_a", "steg_b"):
+            module = types.ModuleType(name)
+            module.main = lambda name=name: ran.append((name, common._SHARED is not None))
+            monkeypatch.setitem(sys.modules, name, module)
+        return ran
+
+    def test_runs_in_order_with_shared_datasets(self, fake_modules):
+        stages = [Stage("steg_b", "B", deps=("steg_a",)), Stage("steg_a", "A")]
+        timings = run_pipeline(stages)
+        assert fake_modules == [("steg_a", True), ("steg_b", True)]
+        assert list(timings) == ["steg_a", "steg_b"]
+        assert all(t >= 0 for t in timings.values())
+        assert common._SHARED is None
+
+    def test_sharing_turned_off_after_failure(self, monkeypatch):
+        module = types.ModuleType("steg_fel")
+        module.main = lambda: 1 / 0
+        monkeypatch.setitem(sys.modules, "steg_fel", module)
+        with pytest.raises(ZeroDivisionError):
+            run_pipeline([Stage("steg_fel", "Fel")])
+        assert common._SHARED is None
+
+    def test_parallel_respects_dependencies(self, tmp_path, monkeypatch, capsys):
+        # Riktiga moduler på disk, så att arbetsprocesserna kan importera dem
+        log = tmp_path / "logg.txt"
+        for name in ("par_a", "par_b", "par_c"):
+            (tmp_path / f"{name}.py").write_text(
+                "def main():\n"
+                f"    print('kor {name}')\n"
+                f"    with open({str(log)!r}, 'a') as f:\n"
+                f"        f.write('{name}\\n')\n")
+        monkeypatch.syspath_prepend(str(tmp_path))
+        stages = [Stage("par_a", "A"), Stage("par_b", "B"),
+                  Stage("par_c", "C", deps=("par_a", "par_b"))]
+        timings = run_pipeline(stages, jobs=2)
+        ran = log.read_text().split()
+        assert sorted(ran[:2]) == ["par_a", "par_b"]
+        assert ran[2] == "par_c"
+        assert set(timings) == {"par_a", "par_b", "par_c"}
+        assert "kor par_c" in capsys.readouterr().out
+
+    @staticmethod
+    def sleeping_stages(tmp_path, monkeypatch, seconds):
+        """Tre oberoende steg som väntar (I/O-bundna, ingen CPU) och ett sista."""
+        for name in ("vila_a", "vila_b", "vila_c", "vila_slut"):
+            (tmp_path / f"{name}.py").write_text(
+                f"import time\ndef main():\n    time.sleep({seconds})\n")
+        monkeypatch.syspath_prepend(str(tmp_path))
+        return [Stage("vila_a", "A"), Stage("vila_b", "B"), Stage("vila_c", "C"),
+                Stage("vila_slut", "Slut", deps=("vila_a", "vila_b", "vila_c"))]
+
+    def test_parallel_speedup_for_independent_stages(self, tmp_path, monkeypatch):
+        stages = self.sleeping_stages(tmp_path, monkeypatch, 0.4)
+        start = time.perf_counter()
+        run_pipeline(stages, force=True)
+        sequential = time.perf_counter() - start
+        start = time.perf_counter()
+        run_pipeline(stages, jobs=3, force=True)
+        parallel = time.perf_counter() - start
+        # 4 × 0,4 s sekventiellt mot 2 × 0,4 s plus processtart parallellt
+        assert sequential >= 1.6
+        assert parallel < 0.75 * sequential
+
+    def test_jobs_limited_to_cpus_and_width(self, tmp_path, monkeypatch, capsys):
+        stages = self.sleeping_stages(tmp_path, monkeypatch, 0)
+        assert pipeline.max_parallel(stages) == 3
+        assert pipeline.effective_jobs(stages, 8) == 3
+        assert pipeline.effective_jobs(execution_order(stages, ["vila_a"]), 8) == 1
+        monkeypatch.setattr(pipeline, "usable_cpus", lambda: 1)
+        assert pipeline.effective_jobs(stages, 4) == 1
+        monkeypatch.setattr(pipeline, "_run_parallel", None)  # får inte anropas
+        assert set(run_pipeline(stages, jobs=4)) == {"vila_a", "vila_b", "vila_c", "vila_slut"}
+        assert "Kör 1 steg åt gången i stället för 4" in capsys.readouterr().out
+
+    def test_parallel_failure_raises(self, tmp_path, monkeypatch, no_job_limit):
+        (tmp_path / "par_fel.py").write_text("def main():\n    raise RuntimeError('fel')\n")
+        monkeypatch.syspath_prepend(str(tmp_path))
+        with pytest.raises(RuntimeError, match="fel"):
+            run_pipeline([Stage("par_fel", "Fel")], jobs=2)
+
+    def test_no_plots_skips_plot_only_stages(self, fake_modules, monkeypatch, capsys):
+        monkeypatch.setattr(common, "PLOTS_ENABLED", False)
+        stages = [Stage("steg_a", "A"), Stage("steg_b", "B", deps=("steg_a",), plots_only=True)]
+        assert list(run_pipeline(stages)) == ["steg_a"]
+        assert "hoppar över: steg_b" in capsys.readouterr().out
+
+    def test_plot_stages_in_stage_list(self):
+        assert {s.name for s in STAGES if s.plots_only} == {"dashboard", "rapport_pdf"}
+
+    def test_print_timings(self, capsys):
+        pipeline.print_timings({"a": 1.0, "bb": 2.5})
+        out = capsys.readouterr().out
+        assert "bb" in out and "3.50 s" in out
+
+    def test_print_timings_wall_time(self, capsys):
+        pipeline.print_timings({"a": 1.0, "b": 2.0}, wall=2.25)
+        assert "2.25 s" in capsys.readouterr().out
+
+
+@pytest.fixture
+def modules(tmp_path, output_dir, monkeypatch):
+    """Två steg: upp skriver upp.csv (innehåll från data.txt), ner läser den.
+
+    ner misslyckas så länge filen fel.txt finns.
+    """
+    src = tmp_path / "src"
+    src.mkdir()
+    (tmp_path / "data.txt").write_text("1")
+    (src / "utd_upp.py").write_text(
+        "import common\n"
+        "RAN = []\n"
+        "def main():\n"
+        "    RAN.append(1)\n"
+        f"    text = open({str(tmp_path / 'data.txt')!r}).read()\n"
+        "    (common.OUTPUT_DIR / 'upp.csv').write_text(text)\n")
+    (src / "utd_ner.py").write_text(
+        "import os\n"
+        "import common\n"
+        "RAN = []\n"
+        "def main():\n"
+        "    RAN.append(1)\n"
+        f"    if os.path.exists({str(tmp_path / 'fel.txt')!r}):\n"
+        "        raise RuntimeError('trasig')\n"
+        "    text = (common.OUTPUT_DIR / 'upp.csv').read_text()\n"
+        "    (common.OUTPUT_DIR / 'ner.csv').write_text(text * 2)\n")
+    monkeypatch.syspath_prepend(str(src))
+    for name in ("utd_upp", "utd_ner"):
+        monkeypatch.delitem(sys.modules, name, raising=False)
+    stages = [Stage("utd_upp", "Upp", outputs=("upp.csv",)),
+              Stage("utd_ner", "Ner", deps=("utd_upp",), outputs=("ner.csv",))]
+    return stages, tmp_path
+
+
+
+class TestUpToDate:
+    @staticmethod
+    def ran(name):
+        return len(sys.modules[name].RAN)
+
+    def test_second_run_skips_everything(self, modules):
+        stages, _ = modules
+        assert list(run_pipeline(stages)) == ["utd_upp", "utd_ner"]
+        assert run_pipeline(stages) == {}
+        assert self.ran("utd_upp") == 1 and self.ran("utd_ner") == 1
+
+    def test_force_reruns(self, modules):
+        stages, _ = modules
+        run_pipeline(stages)
+        assert list(run_pipeline(stages, force=True)) == ["utd_upp", "utd_ner"]
+
+    def test_deleted_output_reruns_stage_only(self, modules, output_dir):
+        stages, _ = modules
+        run_pipeline(stages)
+        (output_dir / "ner.csv").unlink()
+        assert list(run_pipeline(stages)) == ["utd_ner"]
+
+    def test_changed_upstream_output_reruns_downstream(self, modules, output_dir):
+        stages, tmp_path = modules
+        run_pipeline(stages)
+        (tmp_path / "data.txt").write_text("2")
+        # upp:s indata syns inte i fingeravtrycket, så upp körs tvingat
+        run_pipeline(stages[:1], force=True)
+        assert list(run_pipeline(stages)) == ["utd_ner"]
+        assert (output_dir / "ner.csv").read_text() == "22"
+
+    def test_code_change_reruns_stage(self, modules):
+        stages, tmp_path = modules
+        run_pipeline(stages)
+        path = tmp_path / "src" / "utd_ner.py"
+        path.write_text(path.read_text() + "# ändrad\n")
+        assert list(run_pipeline(stages)) == ["utd_ner"]
+
+    def test_parallel_skips_too(self, modules, no_job_limit):
+        stages, _ = modules
+        run_pipeline(stages)
+        assert run_pipeline(stages, jobs=2) == {}
+
+    def test_artifact_target_runs_only_its_stages(self, modules):
+        stages, _ = modules
+        assert list(run_pipeline(stages, targets=["output/upp.csv"])) == ["utd_upp"]
+        assert list(run_pipeline(stages, targets=["ner.csv"])) == ["utd_ner"]
+        assert self.ran("utd_upp") == 1
+
+    def test_history_reports_in_fingerprint(self, tmp_path, monkeypatch):
+        files = {}
+        for year in (common.REPORT_YEAR - 1, common.REPORT_YEAR):
+            files[year] = tmp_path / f"rapport_{year}.xls"
+            files[year].write_text("a")
+        monkeypatch.setattr(common, "get_report_files",
+                            lambda year=common.REPORT_YEAR: [(1, "Jan", files[year])])
+        plain = Stage("starttid", "P", reads_reports=True)
+        history = Stage("starttid", "H", reads_reports=True, history_years=1)
+        before = [pipeline.stage_fingerprint(s, {}) for s in (plain, history)]
+        files[common.REPORT_YEAR - 1].write_text("b")
+        after = [pipeline.stage_fingerprint(s, {}) for s in (plain, history)]
+        assert before[0] == after[0]
+        assert before[1] != after[1]
+
+    def test_state_written_per_stage(self, modules, output_dir):
+        stages, _ = modules
+        run_pipeline(stages)
+        state = pipeline.state_path(stages[1])
+        assert state.parent == output_dir / ".pipeline"
+        assert "ner.csv" in state.read_text()
+
+
+class TestResume:
+    @staticmethod
+    def ran(name):
+        return len(sys.modules[name].RAN)
+
+    def test_checkpoint_records_failure(self, modules):
+        stages, tmp_path = modules
+        (tmp_path / "fel.txt").write_text("")
+        with pytest.raises(RuntimeError):
+            run_pipeline(stages)
+        checkpoint = pipeline.Checkpoint.load()
+        assert checkpoint.status == {"utd_upp": "klar", "utd_ner": "misslyckades"}
+        assert checkpoint.error["steg"] == "utd_ner"
+        assert "trasig" in checkpoint.error["fel"]
+
+    def test_resume_after_forced_run_continues_at_failure(self, modules):
+        stages, tmp_path = modules
+        run_pipeline(stages)
+        (tmp_path / "fel.txt").write_text("")
+        with pytest.raises(RuntimeError):
+            run_pipeline(stages, force=True)
+        (tmp_path / "fel.txt").unlink()
+        assert list(run_pipeline(stages, resume=True)) == ["utd_ner"]
+        assert self.ran("utd_upp") == 2
+        assert pipeline.Checkpoint.load().completed == {"utd_upp", "utd_ner"}
+
+    def test_resume_keeps_targets_of_interrupted_run(self, modules):
+        stages, tmp_path = modules
+        (tmp_path / "fel.txt").write_text("")
+        with pytest.raises(RuntimeError):
+            run_pipeline(stages, targets=["utd_ner"], force=True)
+        (tmp_path / "fel.txt").unlink()
+        run_pipeline(stages, resume=True)
+        assert pipeline.Checkpoint.load().targets == ["utd_ner"]
+
+    def test_resume_without_checkpoint_runs_normally(self, modules, capsys):
+        stages, _ = modules
+        assert list(run_pipeline(stages, resume=True)) == ["utd_upp", "utd_ner"]
+        assert "Ingen tidigare körning" in capsys.readouterr().out
+
+    def test_parallel_failure_recorded(self, modules, no_job_limit):
+        stages, tmp_path = modules
+        (tmp_path / "fel.txt").write_text("")
+        with pytest.raises(RuntimeError):
+            run_pipeline(stages, jobs=2)
+        assert pipeline.Checkpoint.load().status["utd_ner"] == "misslyckades"
+
+    def test_parallel_failure_waits_for_running_stages(self, tmp_path, monkeypatch,
+                                                        output_dir, no_job_limit):
+        runs = tmp_path / "korningar.txt"
+        (tmp_path / "par_langsam.py").write_text(
+            "import time\n"
+            "import common\n"
+            "def main():\n"
+            "    time.sleep(0.5)\n"
+            f"    with open({str(runs)!r}, 'a') as f:\n"
+            "        f.write('x')\n"
+            "    (common.OUTPUT_DIR / 'langsam.csv').write_text('1')\n")
+        (tmp_path / "par_snabbfel.py").write_text(
+            "import os\n"
+            "def main():\n"
+            f"    if os.path.exists({str(tmp_path / 'fel.txt')!r}):\n"
+            "        raise RuntimeError('trasig')\n")
+        (tmp_path / "par_sist.py").write_text("def main():\n    pass\n")
+        monkeypatch.syspath_prepend(str(tmp_path))
+        stages = [Stage("par_langsam", "Langsam", outputs=("langsam.csv",)),
+                  Stage("par_snabbfel", "Snabbfel"),
+                  Stage("par_sist", "Sist", deps=("par_langsam",))]
+        (tmp_path / "fel.txt").write_text("")
+        with pytest.raises(RuntimeError, match="trasig"):
+            run_pipeline(stages, jobs=2)
+        checkpoint = pipeline.Checkpoint.load()
+        assert checkpoint.status == {"par_langsam": "klar", "par_snabbfel": "misslyckades",
+                                     "par_sist": "väntar"}
+        assert checkpoint.error["steg"] == "par_snabbfel"
+        assert (output_dir / "langsam.csv").exists()
+
+        # Det langsamma steget blev klart och kors inte om vid --resume
+        (tmp_path / "fel.txt").unlink()
+        assert set(run_pipeline(stages, jobs=2, resume=True)) == {"par_snabbfel", "par_sist"}
+        assert runs.read_text() == "x"
+
+
+class TestWatch:
+    def test_snapshot_lists_xls_files(self, tmp_path):
+        (tmp_path / "Norra").mkdir()
+        (tmp_path / "Norra" / "r_1_2025.xls").write_bytes(b"abc")
+        (tmp_path / "r_2_2025.xls").write_bytes(b"a")
+        (tmp_path / "notes.txt").write_text("x")
+        snapshot = pipeline.report_snapshot(tmp_path)
+        assert sorted(Path(p).name for p in snapshot) == ["r_1_2025.xls", "r_2_2025.xls"]
+        assert snapshot[str(tmp_path / "Norra" / "r_1_2025.xls")][0] == 3
+
+    def test_wait_for_change_debounces_partial_writes(self, monkeypatch):
+        before = {"a.xls": (1, 1)}
+        readings = iter([
+            before,                                   # ingen ändring än
+            {**before, "b.xls": (10, 2)},             # b skrivs...
+            {**before, "b.xls": (20, 3)},             # ...fortfarande
+            {**before, "b.xls": (20, 3)},             # stilla
+        ])
+        monkeypatch.setattr(pipeline, "report_snapshot", lambda root=None: next(readings))
+        result = pipeline.wait_for_change(before, interval=0, debounce=0, sleep=lambda s: None)
+        assert result == {**before, "b.xls": (20, 3)}
+        assert next(readings, None) is None
+
+    def test_watch_reruns_after_change_and_survives_failure(self, monkeypatch, capsys):
+        calls = []
+
+        def fake_run(targets=None, jobs=1):
+            calls.append(common._SHARED is not None)
+            if len(calls) == 1:
+                raise RuntimeError("trasig rapport")
+            return {}
+        monkeypatch.setattr(pipeline, "run_pipeline", fake_run)
+        monkeypatch.setattr(common, "trim_shared", lambda: calls.append("trim"))
+        monkeypatch.setattr(pipeline, "report_snapshot", lambda root=None: {})
+        monkeypatch.setattr(pipeline, "wait_for_change",
+                            lambda prev, interval, debounce, sleep: {"ny.xls": (1, 1)})
+        pipeline.watch(runs=1)
+        out = capsys.readouterr().out
+        assert calls == [True, "trim", True, "trim"]
+        assert "misslyckades" in out and "(ny.xls)" in out
+        assert common._SHARED is None
+
+
+class TestTrace:
+    @staticmethod
+    def trace(output_dir):
+        return json.loads((output_dir / "run_trace.json").read_text(encoding="utf-8"))
+
+    def test_trace_has_span_per_stage(self, modules, output_dir):
+        stages, _ = modules
+        run_pipeline(stages)
+        events = self.trace(output_dir)["traceEvents"]
+        by_name = {e["name"]: e for e in events}
+        assert {"pipeline", "utd_upp", "utd_ner"} <= set(by_name)
+        upp = by_name["utd_upp"]
+        assert upp["ph"] == "X" and upp["cat"] == "steg"
+        assert upp["args"]["utdatafiler"] == 1
+        assert {"vagg_s", "cpu_s", "rss_mb", "rss_andring_mb", "topp_okning_mb",
+                "process_topp_rss_mb"} <= set(upp["args"])
+
+    def test_skipped_stages_marked(self, modules, output_dir):
+        stages, _ = modules
+        run_pipeline(stages)
+        run_pipeline(stages)
+        events = [e for e in self.trace(output_dir)["traceEvents"] if e["cat"] == "steg"]
+        assert len(events) == 2
+        assert all(e["args"]["hoppades_over"] for e in events)
+
+    def test_trace_written_on_failure(self, modules, output_dir):
+        stages, tmp_path = modules
+        (tmp_path / "fel.txt").write_text("")
+        with pytest.raises(RuntimeError):
+            run_pipeline(stages)
+        names = {e["name"] for e in self.trace(output_dir)["traceEvents"]}
+        assert "utd_ner" in names
+
+    def test_parallel_spans_come_from_workers(self, modules, output_dir, no_job_limit):
+        stages, _ = modules
+        run_pipeline(stages, jobs=2)
+        events = self.trace(output_dir)["traceEvents"]
+        pids = {e["name"]: e["pid"] for e in events}
+        assert pids["utd_upp"] != pids["pipeline"]
+        assert [e["name"] for e in events].count("utd_upp") == 1
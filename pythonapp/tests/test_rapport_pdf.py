@@ -88,7 +88,7 @@ def _make_minimal_data(tmp_path):
         "mal": ["larm_manad", "ventil_tillganglighet"],
         "label": ["Jan", "3:2"],
         "varde": [1500, 92.0],
-        "z_score": [3.3, -5.0],
+        "robust_score": [3.3, -5.0],
         "typ": ["hog", "lag"],
     })
 
@@ -99,7 +99,8 @@ class TestGenerateAlarmRecs:
     def test_alarm_anomaly(self):
         data = {
             "anomalier": pd.DataFrame([
-                {"mal": "larm_manad", "label": "Jan", "varde": 5000, "z_score": 3.5, "typ": "hog"},
+                {"mal": "larm_manad", "label": "Jan", "varde": 5000, "robust_score": 3.5, "typ": "hog",
+                 "baslinje": 2000},
             ]),
             "anlaggning": pd.DataFrame({"Manad_nr": [1], "Larm_totalt_trend_class": ["stabil"]}),
         }
@@ -109,7 +110,7 @@ class TestGenerateAlarmRecs:
 
     def test_no_anomalies(self):
         data = {
-            "anomalier": pd.DataFrame(columns=["mal", "label", "varde", "z_score", "typ"]),
+            "anomalier": pd.DataFrame(columns=["mal", "label", "varde", "robust_score", "typ"]),
             "anlaggning": pd.DataFrame(),
         }
         recs = generate_alarm_recs(data)
@@ -9,7 +9,8 @@ import pytest
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
 
-from sammanfattning import identify_kpis, create_pivoted_csv, _guess_unit
+from common import ReportBundle
+from sammanfattning import identify_kpis, create_pivoted_csv, _guess_unit, collect_all_months
 
 
 class TestIdentifyKpis:
@@ -50,6 +51,20 @@ class TestIdentifyKpis:
         assert result.empty
 
 
+class TestCollectAllMonths:
+    def test_tags_rows_with_month(self):
+        bundles = [
+            ReportBundle(1, "Jan", Path("a_1_2025.xls"),
+                         sheet1=[{"Nyckel": "Ton", "Varde": 5.0, "Kommentar": ""}]),
+            ReportBundle(2, "Feb", Path("a_2_2025.xls"),
+                         sheet1=[{"Nyckel": "Ton", "Varde": 7.0, "Kommentar": ""}]),
+        ]
+        df = collect_all_months(bundles)
+        assert list(df["Manad_nr"]) == [1, 2]
+        assert list(df["Manad"]) == ["Jan", "Feb"]
+        assert list(df["Varde"]) == [5.0, 7.0]
+
+
 class TestGuessUnit:
     def test_kwh(self):
         assert _guess_unit("Energy kWh") == "kWh"
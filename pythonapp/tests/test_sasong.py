@@ -0,0 +1,116 @@
+"""Tester for sasong.py — autokorrelation for manga serier."""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from sasong import SEASON_COLUMNS, autocorrelation, detrend, season_type, seasonality
+
+
+def loop_acf(values, max_lag):
+    """Referens: autokorrelation lag for lag, som detect_seasonal_patterns gjorde."""
+    arr = np.asarray(values, dtype=float)
+    arr = arr - arr.mean()
+    n = len(arr)
+    norm = np.sum(arr ** 2)
+    return [np.sum(arr[:n - lag] * arr[lag:]) / norm for lag in range(1, min(max_lag + 1, n))]
+
+
+class TestAutocorrelation:
+    def test_matches_loop(self):
+        rng = np.random.default_rng(3)
+        matrix = rng.normal(size=(50, 12))
+        acf = autocorrelation(matrix, max_lag=6)
+        assert acf.shape == (50, 6)
+        for row, values in zip(acf, matrix):
+            np.testing.assert_allclose(row, loop_acf(values, 6), atol=1e-12)
+
+    def test_short_series_limits_lags(self):
+        acf = autocorrelation(np.arange(4.0), max_lag=6)
+        assert acf.shape == (1, 3)
+        np.testing.assert_allclose(acf[0], loop_acf(np.arange(4.0), 6))
+
+    def test_constant_series_is_nan(self):
+        assert np.isnan(autocorrelation(np.full((2, 12), 5.0))).all()
+
+    def test_missing_values_count_as_mean(self):
+        values = np.array([1.0, 3, np.nan, 3, 1, 3, 1, 3])
+        filled = np.where(np.isnan(values), np.nanmean(values), values)
+        np.testing.assert_allclose(autocorrelation(values, 4)[0], loop_acf(filled, 4))
+
+
+class TestSeasonality:
+    def test_strongest_lag_per_series(self):
+        months = np.arange(12)
+        matrix = pd.DataFrame(
+            [np.where(months % 2 == 0, 10.0, 1.0),
+             np.where(months % 3 == 0, 10.0, 1.0) + months],
+            index=["varannan", "var_tredje_med_trend"])
+        result = seasonality(matrix)
+        assert list(result.columns) == SEASON_COLUMNS
+        assert result.loc["varannan", "starkast_lag"] == 2
+        assert result.loc["var_tredje_med_trend", "starkast_lag"] == 3
+        assert result["har_sasongsmonster"].all()
+
+    def test_trend_is_not_seasonal(self):
+        months = np.arange(12.0)
+        result = seasonality(np.array([months, 100 - 3 * months, months ** 2]))
+        assert not result["har_sasongsmonster"].any()
+        assert result["starkast_lag"].iloc[:2].isna().all()
+
+    def test_lag_one_excluded(self):
+        # Langsam svangning: starkast pa lag 1, men den raknas inte
+        smooth = np.sin(np.arange(24) * 2 * np.pi / 24)
+        assert autocorrelation(smooth, 6)[0].argmax() == 0
+        assert seasonality(smooth).loc[0, "starkast_lag"] >= 2
+
+    def test_noise_within_bound(self):
+        rng = np.random.default_rng(0)
+        result = seasonality(rng.normal(size=(2000, 12)))
+        assert result["har_sasongsmonster"].mean() < 0.05
+        assert (result.loc[result["har_sasongsmonster"], "korrelation"] > 1.96 / np.sqrt(12)).all()
+
+    def test_too_few_points(self):
+        matrix = np.array([[1.0, 5, 1, 5, np.nan, np.nan, np.nan]])
+        result = seasonality(matrix)
+        assert not result.loc[0, "har_sasongsmonster"]
+        assert np.isnan(result.loc[0, "starkast_lag"])
+        assert not seasonality(matrix, min_points=4).isna().loc[0, "starkast_lag"]
+
+    def test_significance(self):
+        rng = np.random.default_rng(0)
+        result = seasonality(rng.normal(size=(200, 12)), significance=10)
+        assert not result["har_sasongsmonster"].any()
+        assert result["korrelation"].notna().all()
+
+    def test_empty(self):
+        assert seasonality(np.empty((0, 12))).empty
+
+    @pytest.mark.parametrize("n_series", [1, 3000])
+    def test_shape(self, n_series):
+        result = seasonality(np.random.default_rng(1).normal(size=(n_series, 12)))
+        assert len(result) == n_series
+        assert set(result["starkast_lag"].dropna()) <= set(range(2, 7))
+
+
+class TestDetrend:
+    def test_removes_line_with_gaps(self):
+        values = np.array([[1.0, 3, np.nan, 7, 9], [2.0, 1, 2, 1, 2]])
+        residual = detrend(values)
+        np.testing.assert_allclose(residual[0], [0, 0, np.nan, 0, 0], atol=1e-12)
+        np.testing.assert_allclose(residual[1], np.polyval(np.polyfit(range(5), values[1], 1),
+                                                           range(5)) * -1 + values[1])
+
+
+class TestSeasonType:
+    @pytest.mark.parametrize("significant, ratio, expected", [
+        (True, 0.4, "Sommarsvacka"), (True, 1.5, "Sommartopp"), (True, 1.0, "Periodisk"),
+        (False, 0.4, "Jamn"), (False, 1.5, "Jamn"), (False, 1.0, "Jamn"),
+    ])
+    def test_ratio_only_gives_direction(self, significant, ratio, expected):
+        assert season_type(significant, ratio) == expected
@@ -0,0 +1,86 @@
+"""Tester for schema.py — schemaregister for arklayouter."""
+
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+import schema
+from common import ReportBundle
+from schema import ERROR_COLS, layout_drift, layout_fingerprint, resolve_schema
+
+
+SHEET11 = ["ID", "Info", "Availability [%]", "DOES_NOT_OPEN", "LEVEL_ERROR"]
+
+
+@pytest.fixture(autouse=True)
+def clean_registry(monkeypatch):
+    monkeypatch.setattr(schema, "_SCHEMAS", {})
+    monkeypatch.setattr(schema, "_SOURCES", {})
+
+
+class TestResolveSchema:
+    def test_valve_fields(self):
+        s = resolve_schema("Sheet11", SHEET11)
+        assert s.col("valve_id") == "ID"
+        assert s.col("availability") == "Availability [%]"
+        assert s.cols("errors") == ["DOES_NOT_OPEN", "LEVEL_ERROR"]
+        assert s.col("LEVEL_ERROR") == "LEVEL_ERROR"
+        assert s.col("DOES_NOT_CLOSE") is None
+        assert "DOES_NOT_CLOSE" in s.missing
+
+    def test_field_map_is_column_indices(self):
+        s = resolve_schema("Sheet11", SHEET11)
+        assert s.fields["availability"] == (2,)
+
+    def test_emptyings_excludes_per_minute(self):
+        s = resolve_schema("Sheet5", ["Fraction", "Hours", "kWh", "Emptyings", "Emptying/minute"])
+        assert s.col("emptyings") == "Emptyings"
+        assert s.col("emptyings_per_minute") == "Emptying/minute"
+        assert s.col("hours") == "Hours"
+
+    def test_command_fields_case_insensitive(self):
+        s = resolve_schema("Sheet9", [" id ", "man_open_cmd", "AUTO_OPEN_CMD", "INLET_OPEN"])
+        assert s.col("valve_id") == " id "
+        assert s.col("man_open_cmd") == "man_open_cmd"
+        assert s.cols("commands") == ["man_open_cmd", "AUTO_OPEN_CMD", "INLET_OPEN"]
+
+    def test_same_layout_resolved_once(self):
+        a = resolve_schema("Sheet11", SHEET11)
+        b = resolve_schema("Sheet11", list(SHEET11))
+        assert a is b
+
+    def test_unknown_sheet_has_no_fields(self):
+        assert resolve_schema("Sheet2", ["A", "B"]).fields == {}
+
+    def test_error_cols_order_is_stable(self):
+        assert ERROR_COLS[0] == "DOES_NOT_CLOSE"
+        assert len(set(ERROR_COLS)) == len(ERROR_COLS) == 5
+
+
+class TestLayoutDrift:
+    def test_fingerprint_depends_on_headers(self):
+        assert layout_fingerprint("Sheet11", SHEET11) == layout_fingerprint("Sheet11", SHEET11)
+        assert layout_fingerprint("Sheet11", SHEET11) != layout_fingerprint("Sheet11", SHEET11[:-1])
+        assert layout_fingerprint("Sheet9", SHEET11) != layout_fingerprint("Sheet11", SHEET11)
+
+    def test_drift_reported_with_sources(self):
+        resolve_schema("Sheet11", SHEET11, source="r_1_2025.xls")
+        resolve_schema("Sheet11", SHEET11, source="r_2_2025.xls")
+        assert layout_drift() == {}
+
+        resolve_schema("Sheet11", ["ID", "Availability"], source="r_3_2025.xls")
+        drift = layout_drift()
+        assert list(drift) == ["Sheet11"]
+        files = [f for _, f in drift["Sheet11"]]
+        assert files == [["r_1_2025.xls", "r_2_2025.xls"], ["r_3_2025.xls"]]
+
+    def test_bundle_schema_registers_file(self):
+        bundle = ReportBundle(1, "Jan", Path("r_1_2025.xls"),
+                              sheets={"Sheet11": pd.DataFrame(columns=SHEET11)})
+        assert bundle.schema("Sheet11").col("availability") == "Availability [%]"
+        assert bundle.schema("Sheet9").missing  # arket saknas → inga fält
+        assert schema.known_layouts()["Sheet11"][0][1] == ["r_1_2025.xls"]
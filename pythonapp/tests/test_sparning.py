@@ -0,0 +1,99 @@
+"""Tester for sparning.py — spans och Chrome-trace."""
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+import sparning
+from sparning import span, take_events, write_trace
+
+
+@pytest.fixture(autouse=True)
+def clean_events():
+    take_events()
+    yield
+    take_events()
+
+
+class TestSpan:
+    def test_records_complete_event(self):
+        with span("steg", rader=3):
+            pass
+        (event,) = take_events()
+        assert event["name"] == "steg" and event["ph"] == "X"
+        assert event["dur"] >= 0 and event["ts"] > 0
+        assert event["args"]["rader"] == 3
+        assert event["args"]["vagg_s"] >= 0 and event["args"]["cpu_s"] >= 0
+
+    def test_values_set_inside_block(self):
+        with span("steg") as s:
+            s["rader"] = 42
+        assert take_events()[0]["args"]["rader"] == 42
+
+    def test_nested_spans_inside_parent(self):
+        with span("yttre"):
+            with span("inre"):
+                pass
+        inner, outer = take_events()
+        assert inner["name"] == "inre" and outer["name"] == "yttre"
+        assert outer["ts"] <= inner["ts"]
+        assert inner["ts"] + inner["dur"] <= outer["ts"] + outer["dur"] + 1
+
+    def test_recorded_on_exception(self):
+        with pytest.raises(ValueError):
+            with span("fel"):
+                raise ValueError("x")
+        assert take_events()[0]["name"] == "fel"
+
+    def test_peak_rss(self):
+        rss = sparning.peak_rss_mb()
+        assert rss is None or rss > 0
+
+    def test_memory_attributed_to_span(self):
+        with span("forst"):
+            pass
+        with span("stor"):
+            block = bytearray(200 * 1024 * 1024)
+            block[::4096] = b"x" * len(block[::4096])
+        with span("efter"):
+            pass
+        del block
+        first, big, after = (e["args"] for e in take_events())
+        if sparning.current_rss_mb() is None:
+            pytest.skip("RSS kan inte lasas pa den har plattformen")
+        assert big["rss_andring_mb"] > 150
+        assert big["topp_okning_mb"] > 150
+        # Processens topp ar densamma efterat, men spannet okade den inte
+        assert after["process_topp_rss_mb"] >= big["process_topp_rss_mb"]
+        assert after["topp_okning_mb"] == 0
+        assert abs(after["rss_andring_mb"]) < 50
+
+    def test_take_events_clears(self):
+        with span("a"):
+            pass
+        assert len(take_events()) == 1
+        assert take_events() == []
+
+
+class TestWriteTrace:
+    def test_chrome_trace_format(self, tmp_path):
+        with span("a"):
+            pass
+        path = write_trace(tmp_path / "ut" / "run_trace.json", take_events())
+        data = json.loads(path.read_text(encoding="utf-8"))
+        assert data["displayTimeUnit"] == "ms"
+        assert [e["name"] for e in data["traceEvents"]] == ["a"]
+        assert list(path.parent.iterdir()) == [path]
+
+    def test_parent_sorted_before_child(self, tmp_path):
+        events = [
+            {"name": "barn", "ts": 10, "dur": 5},
+            {"name": "förälder", "ts": 10, "dur": 20},
+        ]
+        path = write_trace(tmp_path / "t.json", events)
+        data = json.loads(path.read_text(encoding="utf-8"))
+        assert [e["name"] for e in data["traceEvents"]] == ["förälder", "barn"]
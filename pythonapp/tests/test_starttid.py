@@ -0,0 +1,25 @@
+"""Tester for starttid.py — matning av importtid."""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+import starttid
+
+
+class TestMeasureImport:
+    def test_lazy_module_loads_no_plot_libraries(self):
+        seconds, loaded = starttid.measure_import("rekommendationer", repeat=1)
+        assert seconds > 0
+        assert "pandas" in loaded
+        assert "matplotlib" not in loaded and "scipy" not in loaded
+
+    def test_eager_loads_plot_libraries(self):
+        _, loaded = starttid.measure_import("common", repeat=1, eager=True)
+        assert {"matplotlib", "scipy"} <= set(loaded)
+
+    def test_main_prints_table(self, capsys):
+        starttid.main(["--repeat", "1", "larm"])
+        out = capsys.readouterr().out
+        assert "STARTTID" in out and "larm" in out
@@ -11,12 +11,17 @@ sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
 
 from trendanalys import (
     compute_linear_trends,
+    compute_linear_trends_matrix,
     compute_moving_averages,
     detect_anomalies,
+    detect_anomalies_grouped,
     compute_correlations,
     detect_seasonal_patterns,
     compute_branch_analysis,
+    build_anomaly_series,
+    build_kpi_matrix,
 )
+from anomalier import detect_series_anomalies
 
 
 class TestComputeLinearTrends:
@@ -54,6 +59,57 @@ class TestComputeLinearTrends:
         assert "down" in result
 
 
+
+class TestComputeLinearTrendsMatrix:
+    @staticmethod
+    def reference(matrix):
+        result = {}
+        for name, row in matrix.iterrows():
+            points = [(m, v) for m, v in row.items() if not np.isnan(v)]
+            result[name] = compute_linear_trends({name: points})[name]
+        return result
+
+    @staticmethod
+    def assert_same(got, expected):
+        assert list(got) == list(expected)
+        for name in expected:
+            a, b = expected[name], got[name]
+            assert a.keys() == b.keys()
+            for key in a:
+                if isinstance(a[key], float) and np.isnan(a[key]):
+                    assert np.isnan(b[key]), (name, key)
+                else:
+                    assert a[key] == b[key], (name, key, a[key], b[key])
+
+    def test_matches_per_series_regression(self):
+        rng = np.random.default_rng(7)
+        values = rng.normal(95, 4, (400, 12)).round(2)
+        values[rng.random(values.shape) < 0.2] = np.nan
+        matrix = pd.DataFrame(values, columns=range(1, 13))
+        self.assert_same(compute_linear_trends_matrix(matrix), self.reference(matrix))
+
+    def test_special_series(self):
+        matrix = pd.DataFrame(
+            [
+                [10, 20, 30, 40, np.nan],          # perfekt okande
+                [50, 40, np.nan, 20, 10],          # perfekt minskande, saknad manad
+                [100, 100, 100, 100, 100],         # konstant
+                [1, np.nan, np.nan, np.nan, 2],    # for fa punkter
+                [0.1, 0.1, 0.1, np.nan, 0.1],      # konstant med avrundningsfel i medel
+            ],
+            index=["upp", "ner", "konstant", "fa", "tiondel"],
+            columns=[1, 2, 3, 4, 5],
+        )
+        result = compute_linear_trends_matrix(matrix)
+        self.assert_same(result, self.reference(matrix))
+        assert result["upp"]["trend_class"] == "okande"
+        assert result["ner"]["slope"] == -10.0
+        assert result["fa"]["trend_class"] == "otillracklig_data"
+
+    def test_empty(self):
+        assert compute_linear_trends_matrix(pd.DataFrame()) == {}
+
+
 class TestComputeMovingAverages:
     def test_basic_ma(self):
         df = pd.DataFrame({"val": [10, 20, 30, 40, 50]})
@@ -101,6 +157,49 @@ class TestDetectAnomalies:
         assert len(anomalies_low) >= len(anomalies_high)
 
 
+
+class TestDetectAnomaliesGrouped:
+    @staticmethod
+    def per_group(df, threshold=2.0):
+        flags = pd.Series(False, index=df.index)
+        for _, g in df.groupby("id"):
+            g = g.sort_values("m")
+            for a in detect_anomalies(g["v"].values, threshold=threshold):
+                flags[g.index[a["index"]]] = True
+        return flags
+
+    @pytest.fixture
+    def df(self):
+        rng = np.random.default_rng(3)
+        rows = []
+        for i in range(200):
+            months = sorted(rng.choice(np.arange(1, 13), rng.integers(1, 13), replace=False))
+            for m in months:
+                if i % 4 == 0:
+                    v = 99.7                           # konstant
+                elif i % 4 == 1:
+                    v = 40.0 if m == months[-1] else 100.0  # en dipp, ibland z=2 exakt
+                else:
+                    v = round(rng.normal(95, 5), 2)
+                rows.append((f"v{i}", m, v))
+        return pd.DataFrame(rows, columns=["id", "m", "v"]).sample(frac=1, random_state=0)
+
+    @pytest.mark.parametrize("threshold", [2.0, 1.5, 0.8])
+    def test_matches_detect_anomalies(self, df, threshold):
+        got = detect_anomalies_grouped(df, "id", "v", threshold=threshold, order_col="m")
+        pd.testing.assert_series_equal(got, self.per_group(df, threshold), check_names=False)
+
+    def test_flags_spike_row(self):
+        df = pd.DataFrame({"id": ["a"] * 10 + ["b"] * 3,
+                           "v": [100] * 5 + [500] + [100] * 4 + [50, 50, 50]})
+        flags = detect_anomalies_grouped(df, "id", "v")
+        assert list(flags[flags].index) == [5]
+
+    def test_empty(self):
+        df = pd.DataFrame({"id": [], "v": []})
+        assert detect_anomalies_grouped(df, "id", "v").empty
+
+
 class TestComputeCorrelations:
     def test_perfect_positive(self):
         data = {"test": ([1, 2, 3, 4, 5], [2, 4, 6, 8, 10])}
@@ -174,3 +273,46 @@ class TestComputeBranchAnalysis:
     def test_sorted_by_health(self, valve_monthly_df):
         result = compute_branch_analysis(valve_monthly_df)
         assert list(result["halsopoang"]) == sorted(result["halsopoang"])
+
+
+class TestBuildAnomalySeries:
+    def test_series_per_target(self, valve_monthly_df):
+        series = build_anomaly_series([], pd.DataFrame(), valve_monthly_df, 2025)
+        counts = series.groupby("mal")["serie"].nunique()
+        assert counts["ventil_manad"] == 25
+        assert counts["gren_manad"] == 5
+        assert counts["ventil_tillganglighet"] == 1
+        monthly = series[series["mal"] == "ventil_manad"]
+        assert monthly["period"].min() == 2025 * 12 + 1
+
+    def test_weak_valve_flagged_by_annual_mean(self, valve_monthly_df):
+        series = build_anomaly_series([], pd.DataFrame(), valve_monthly_df, 2025)
+        result = detect_series_anomalies(series, methods={"ventil_tillganglighet": ("mad",)})
+        annual = result[result["mal"] == "ventil_tillganglighet"]
+        assert set(annual["label"]) == {"3:2", "5:4"}
+        assert (annual["typ"] == "lag").all()
+
+
+class TestBuildKpiMatrix:
+    def test_columns_from_all_sources(self, valve_monthly_df):
+        energy_data = [
+            {"Manad_nr": m, "Manad": "X", "Total_kWh": 100.0 * m, "Drifttid_h": 10.0,
+             "Total_tomningar": 50 + m, "kWh_per_tomning": 2.0,
+             "Fraktioner": [{"Fraktion": "Rest", "kWh": 60.0, "Tomningar": 30},
+                            {"Fraktion": "Papper", "kWh": 40.0, "Tomningar": 20 + m}]}
+            for m in range(1, 13)
+        ]
+        alarm_df = pd.DataFrame([{"Manad_nr": m, "Kategori": kat, "Aktuell": m}
+                                 for m in range(1, 13) for kat in ("Ventil", "System")])
+        sheet1_df = pd.DataFrame([{"Manad_nr": m, "Nyckel": "Vacuum kPa", "Varde": 40.0 + m}
+                                  for m in range(2, 13)])
+        kpi = build_kpi_matrix(energy_data, alarm_df, valve_monthly_df, sheet1_df)
+        assert list(kpi.index) == list(range(1, 13))
+        for col in ["Energi kWh", "Papper: tomningar", "Rest: kWh", "Larm totalt",
+                    "Larm: System", "Tillganglighet medel", "Sheet1: Vacuum kPa"]:
+            assert col in kpi.columns
+        assert kpi["Larm totalt"].tolist() == [2.0 * m for m in range(1, 13)]
+        assert np.isnan(kpi.loc[1, "Sheet1: Vacuum kPa"])
+
+    def test_empty(self):
+        assert build_kpi_matrix([], pd.DataFrame(), pd.DataFrame(), pd.DataFrame()).empty
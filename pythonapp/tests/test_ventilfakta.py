@@ -0,0 +1,110 @@
+"""Tester for ventilfakta.py — faktatabell ventil x manad."""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from common import ReportBundle
+from ventilfakta import FACT_COLUMNS, build_valve_facts
+from gren_djupanalys import collect_branch_data
+from manuell_analys import collect_manual_data
+from trendanalys import collect_valve_monthly
+from ventiler import collect_availability_and_errors
+
+
+def _bundle(month, sheet9_rows, sheet11_rows):
+    sheet9 = pd.DataFrame(sheet9_rows, columns=["ID", "Info", "MAN_OPEN_CMD",
+                                                "AUTO_OPEN_CMD", "INLET_OPEN"])
+    sheet11 = pd.DataFrame(sheet11_rows, columns=["ID", "Availability [%]",
+                                                  "LEVEL_ERROR", "DOES_NOT_OPEN"])
+    return ReportBundle(month, f"M{month}", Path(f"r_{month}_2025.xls"),
+                        sheets={"Sheet9": sheet9, "Sheet11": sheet11})
+
+
+@pytest.fixture
+def bundles():
+    return [
+        _bundle(1,
+                [["1:1", "A", 4.0, 6.0, 10.0], ["1:2", "", np.nan, 5.0, 1.0],
+                 ["2:1", "B", 0.0, 0.0, 0.0], ["9:9", "", 2.0, 2.0, 2.0]],
+                [["1:2", 95.0, 2.0, np.nan], ["1:1", 99.0, np.nan, 1.0],
+                 ["2:1", "n/a", 3.0, 0.0], ["bad", 90.0, 0.0, 0.0], ["", 80.0, 1.0, 1.0]]),
+        _bundle(2,
+                [["1:1", "A", 1.0, 1.0, 1.0]],
+                [["1:1", 97.0, 0.0, 0.0]]),
+    ]
+
+
+class TestBuildValveFacts:
+    def test_columns_and_types(self, bundles):
+        facts = build_valve_facts(bundles)
+        assert list(facts.columns) == FACT_COLUMNS
+        assert facts["Gren"].dtype == np.int64
+        assert facts["Tillganglighet"].dtype == np.float64
+
+    def test_outer_join_sheet11_order_first(self, bundles):
+        jan = build_valve_facts(bundles).query("Manad_nr == 1")
+        assert list(jan["Ventil_ID"]) == ["1:2", "1:1", "2:1", "bad", "9:9"]
+        assert list(jan["I_Sheet11"]) == [True, True, True, True, False]
+        assert list(jan["I_Sheet9"]) == [True, True, True, False, True]
+
+    def test_parsed_ids(self, bundles):
+        facts = build_valve_facts(bundles).set_index(["Manad_nr", "Ventil_ID"])
+        assert facts.loc[(1, "2:1"), ["Gren", "Ventilnr"]].tolist() == [2, 1]
+        assert facts.loc[(1, "bad"), "Gren"] == -1
+        assert not facts.loc[(1, "bad"), "Giltigt_ID"]
+
+    def test_values(self, bundles):
+        facts = build_valve_facts(bundles).set_index(["Manad_nr", "Ventil_ID"])
+        row = facts.loc[(1, "1:2")]
+        assert row["MAN_OPEN_CMD"] == 0  # saknat varde -> 0
+        assert row["Kommandon"] == 6
+        assert row["Fel_LEVEL_ERROR"] == 2.0
+        assert np.isnan(facts.loc[(1, "2:1"), "Tillganglighet"])
+        assert facts.loc[(1, "9:9"), "Fel_DOES_NOT_OPEN"] == 0
+
+    def test_no_bundles(self):
+        facts = build_valve_facts([])
+        assert facts.empty
+        assert list(facts.columns) == FACT_COLUMNS
+
+
+class TestViews:
+    def test_trend_view(self, bundles):
+        df = collect_valve_monthly(build_valve_facts(bundles))
+        assert list(df["Ventil_ID"]) == ["1:2", "1:1", "bad", "1:1"]
+        assert df.loc[0, "Totala_fel"] == 2
+        assert df.loc[2, "Gren"] == -1
+
+    def test_branch_view(self, bundles):
+        df = collect_branch_data(build_valve_facts(bundles))
+        jan = df[df["Manad_nr"] == 1].iloc[0]
+        assert jan["Gren"] == 1
+        assert jan["Medel_tillganglighet"] == 97.0
+        assert jan["MAN_CMD"] == 4 and jan["AUTO_CMD"] == 11
+        assert jan["Antal_ventiler"] == 2
+        assert len(df) == 2  # ogiltigt ID och saknad tillganglighet raknas inte
+
+    def test_manual_view_in_sheet9_order(self, bundles):
+        df = collect_manual_data(build_valve_facts(bundles))
+        jan = df[df["Manad_nr"] == 1]
+        assert list(jan["Ventil_ID"]) == ["1:1", "1:2", "2:1", "9:9"]
+        assert jan["Manuell_andel_%"].tolist() == [40.0, 0.0, 0.0, 50.0]
+        assert np.isnan(jan.iloc[3]["Tillganglighet"])
+
+    def test_ventiler_view(self, bundles):
+        avail_df, error_df = collect_availability_and_errors(build_valve_facts(bundles))
+        assert len(avail_df) == 4
+        totals = error_df.groupby("Feltyp")["Antal"].sum().to_dict()
+        assert totals == {"DOES_NOT_OPEN": 1, "LEVEL_ERROR": 5}
+
+    def test_views_agree(self, bundles):
+        facts = build_valve_facts(bundles)
+        trend = collect_valve_monthly(facts)
+        avail_df, _ = collect_availability_and_errors(facts)
+        assert trend["Tillganglighet"].sum() == avail_df["Tillgänglighet"].sum()